@@ -1,94 +1,79 @@
-from random import sample, shuffle
 from fastapi import APIRouter, Depends, HTTPException, Query
 from app.api.deps import get_current_user
-from sqlmodel import Session
-from app.db.session import get_session
-from app.crud import vocabulary as crud_vocab
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.db.session import get_async_session
+from app.crud import async_review as crud_review, async_vocabulary as crud_vocab
+from app.core import quiz_engine, quiz_pool, serialization
+from app.core.config import get_settings
 from pydantic import BaseModel
 from enum import Enum
+from typing import Optional
 import logging
 
 logger = logging.getLogger(__name__)
+settings = get_settings()
 
 router = APIRouter(prefix="/quiz", tags=["quiz"])
 
 # Removed the QuizType enum as we're letting users choose number of questions directly
 
+class QuizSource(str, Enum):
+    random = "random"  # Uniform sample of the whole vocabulary
+    due = "due"        # Words due for spaced-repetition review, the longest overdue first
+
 class QuizQuestion(BaseModel):
     question     : str  # We'll format this as "What is the meaning of 'word'?"
     answer       : str  # The correct answer
     choices      : list[str]  # All possible choices including the correct answer
+    vocabulary_id: Optional[int] = None  # Set for due-review questions; send it back to POST /review/answers
 
 class QuizResponse(BaseModel):
     questions: list[QuizQuestion]
     total_vocabulary: int
 
 @router.get("/generate/", response_model=QuizResponse)
-def generate(
-    num_questions: int = Query(10, description="Number of questions for the quiz (default: 10)"),
-    db: Session = Depends(get_session),
+async def generate(
+    num_questions: int = Query(10, ge=1, le=settings.QUIZ_MAX_QUESTIONS, description="Number of questions for the quiz (default: 10)"),
+    source: QuizSource = Query(QuizSource.random, description="Draw questions at random or from due review cards"),
+    db: AsyncSession = Depends(get_async_session),
     current = Depends(get_current_user)
 ):
     try:
-        # Using the num_questions parameter directly
-        
-        # Get user's vocabulary
-        vocab = crud_vocab.list_for_user(db, current.id)
-        
+        due_cards = None
+        if source == QuizSource.due:
+            # Questions come from the due queue; a random sample only lends distractor meanings
+            due_cards = await crud_review.due_cards(db, current.id, num_questions)
+            rows = await crud_vocab.cached_rows(db, current.id)
+            quiz_sample = await crud_vocab.sample_for_quiz(
+                db, current.id, len(due_cards) * quiz_engine.DEFAULT_DISTRACTORS, num_distractors=0, rows=rows)
+            pool = quiz_engine.build_pool([(card[1], card[2]) for card in due_cards],
+                                          [meaning for _, meaning in quiz_sample.questions] + quiz_sample.distractors)
+            questions = quiz_engine.generate_questions(pool, len(due_cards), indices=range(len(due_cards)))
+            for question, card in zip(questions, due_cards):
+                question["vocabulary_id"] = card[0]
+            quiz = {"questions": questions, "total_vocabulary": quiz_sample.total}
+        else:
+            # A quiz pre-built by the background pool, or built now when the pool is empty
+            quiz = quiz_pool.pop(current.id, num_questions)
+            if quiz is None:
+                quiz = await quiz_pool.build_batch(db, current.id, num_questions)
+
+        # Get the total vocabulary count for the user
+        total_vocabulary = quiz["total_vocabulary"]
+
         # Check if user has enough vocabulary for the requested quiz
-        if len(vocab) < 2:
+        if total_vocabulary < 2:
             raise HTTPException(400, "Need at least 2 words in your vocabulary to generate a quiz")
-        
-        # Get the total vocabulary count for the user
-        total_vocabulary = len(vocab)
 
-        # If we have fewer words than requested, adjust the number of questions
+        # If we have fewer words than requested, the quiz is smaller than asked for
         if total_vocabulary < num_questions:
             logger.warning(f"User {current.id} has only {total_vocabulary} words but requested {num_questions} questions - adjusting quiz size")
-            num_questions = total_vocabulary
 
-        # If we have fewer than 2 words, we can't create a quiz
-        if total_vocabulary < 2:
-            return QuizResponse(questions=[], total_vocabulary=total_vocabulary)
-        
-        # Randomly select vocabulary for the quiz
-        quiz_vocabulary = sample(vocab, num_questions)
-        
-        # Create quiz questions
-        quiz_questions = []
-        
-        for item in quiz_vocabulary:
-            # Format the question
-            question = f"What is the meaning of '{item.word}'?"
-            
-            # The correct answer is the Vietnamese translation
-            answer = item.meaning
-            
-            # Get distractors (incorrect answers) from other vocabulary
-            # We need to make sure we don't include the correct answer
-            other_vocab = [v for v in vocab if v.id != item.id]
-            
-            # If we have fewer than 3 other vocabulary items, we'll have fewer distractors
-            num_distractors = min(3, len(other_vocab))
-            
-            if num_distractors > 0:
-                distractors = sample([v.meaning for v in other_vocab], num_distractors)
-            else:
-                distractors = []
-                
-            # Combine correct answer and distractors, then shuffle
-            choices = [answer] + distractors
-            shuffle(choices)
-            
-            # Create the quiz question
-            quiz_questions.append(QuizQuestion(
-                question=question,
-                answer=answer,
-                choices=choices
-            ))
-        
-        logger.info(f"Generated {len(quiz_questions)} quiz questions for user {current.id}")
-        return QuizResponse(questions=quiz_questions, total_vocabulary=total_vocabulary)
+        logger.info(f"Generated {len(quiz['questions'])} quiz questions for user {current.id}")
+        # The engine already returns QuizQuestion-shaped dicts; encode them without re-validating
+        return serialization.FastJSONResponse(quiz)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error generating quiz: {str(e)}")
         raise HTTPException(500, f"Error generating quiz: {str(e)}")
@@ -0,0 +1,47 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import List
+import logging
+from app.api.deps import get_current_user
+from app.db.session import get_async_session
+from app.schemas import review as schema_review
+from app.crud import async_review as crud_review
+from app.core import serialization
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+router = APIRouter(prefix="/review", tags=["review"])
+
+@router.get("/due", response_model=List[schema_review.DueCard])
+async def due(
+    limit: int = Query(20, ge=1, le=settings.REVIEW_DUE_MAX_LIMIT, description="Most cards to return"),
+    db: AsyncSession = Depends(get_async_session),
+    current = Depends(get_current_user)
+):
+    """Cards due for review now, the longest overdue first"""
+    rows = await crud_review.due_cards(db, current.id, limit)
+    return serialization.rows_response(rows, crud_review.DUE_COLUMNS)
+
+@router.post("/answers", response_model=schema_review.ReviewAnswersReport)
+async def answers(
+    data: schema_review.ReviewAnswers,
+    db: AsyncSession = Depends(get_async_session),
+    current = Depends(get_current_user)
+):
+    """Grade a batch of reviews (SM-2 quality 0-5) and reschedule every card in one transaction"""
+    if len(data.answers) > settings.REVIEW_MAX_ANSWERS:
+        raise HTTPException(status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            f"At most {settings.REVIEW_MAX_ANSWERS} answers per request")
+    states, not_found = await crud_review.apply_answers(
+        db, current.id, [(answer.vocabulary_id, answer.quality) for answer in data.answers])
+    logger.info(f"Rescheduled {len(states)} cards for user {current.id}")
+    return serialization.FastJSONResponse({
+        "updated": [
+            {"vocabulary_id": vocabulary_id,
+             **{name: getattr(state, name) for name in crud_review.STATE_FIELDS}}
+            for vocabulary_id, state in states.items()
+        ],
+        "not_found": not_found,
+    })
@@ -1,30 +1,96 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
-from sqlmodel import Session, select
-from typing import List, Optional
+from fastapi.responses import StreamingResponse
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import List, Optional, Union
 import logging
 from app.api.deps import get_current_user, security
-from app.db.session import get_session
+from app.db.session import async_session_factory, get_async_session
 from app.schemas import vocabulary as schema_vocab
-from app.crud import vocabulary as crud_vocab
-from app.models.vocabulary import Vocabulary
-from firebase_admin import auth
+from app.crud import async_vocabulary as crud_vocab
+from app.models.dictionary import DictionaryEntry
+from app.core import (identity, pagination, search_index, serialization, token_cache, vocab_cache, vocab_export,
+                      vocab_import)
+from app.core.config import get_settings
+from pydantic import ValidationError
+from sqlalchemy.exc import IntegrityError
 
 logger = logging.getLogger(__name__)
+settings = get_settings()
 
 router = APIRouter(prefix="/vocabulary", tags=["vocabulary"])
 
-@router.get("/", response_model=List[schema_vocab.VocabOut])
-def list_vocab(db: Session = Depends(get_session), current = Depends(get_current_user)):
-    return crud_vocab.list_for_user(db, current.id)
+CURSOR_DESCRIPTION = ("Opaque keyset cursor from a previous page's next_cursor; send it empty for the "
+                      "first page. Omit it to get a plain list (offset mode); a truncated list names "
+                      "the next page's cursor in its X-Next-Cursor header.")
 
-@router.get("/user", response_model=List[schema_vocab.VocabOut])
+def _decode_cursor(cursor: Optional[str]) -> Optional[int]:
+    if cursor is None:
+        return None
+    try:
+        return pagination.decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, "Invalid cursor")
+
+async def _keyset_page(db: AsyncSession, user_id: int, after_id: int, limit: int):
+    """One page after `after_id`, from the snapshot cache when possible"""
+    rows = await crud_vocab.cached_rows(db, user_id)
+    if rows is not None:
+        page, next_cursor = pagination.page_after(rows, after_id, limit)
+    else:
+        # Fetch one extra row to learn whether another page exists
+        page = await crud_vocab.list_rows_for_user(db, user_id, after_id=after_id, limit=limit + 1)
+        next_cursor = pagination.encode_cursor(page[limit - 1][0]) if len(page) > limit else None
+        page = page[:limit]
+    # Rows are trusted and already in VocabOut's shape: encode them directly
+    return serialization.page_response(page, vocab_cache.COLUMNS, next_cursor)
+
+def _offset_response(request: Request, rows, limit: int):
+    """
+    A plain list of the first `limit` rows (fetched with one extra). When more
+    follow, X-Next-Cursor carries the keyset cursor of the next page and Link its URL.
+    """
+    response = serialization.rows_response(rows[:limit], vocab_cache.COLUMNS)
+    if len(rows) > limit:
+        next_cursor = pagination.encode_cursor(rows[limit - 1][0])
+        next_url = request.url.remove_query_params("skip").include_query_params(cursor=next_cursor)
+        response.headers["X-Next-Cursor"] = next_cursor
+        response.headers["Link"] = f'<{next_url}>; rel="next"'
+    return response
+
+@router.get("/", response_model=Union[schema_vocab.VocabPage, List[schema_vocab.VocabOut]])
+async def list_vocab(
+    request: Request,
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
+    skip: int = Query(0, ge=0, description="Words to skip in offset mode"),
+    limit: int = Query(100, ge=1, le=500),
+    db: AsyncSession = Depends(get_async_session),
+    current = Depends(get_current_user)
+):
+    """
+    List the user's words in id order: a VocabPage with a cursor, else a plain
+    list (offset mode) whose X-Next-Cursor/Link headers point at the next page
+    """
+    after_id = _decode_cursor(cursor)
+    if after_id is not None:
+        return await _keyset_page(db, current.id, after_id, limit)
+    rows = await crud_vocab.cached_rows(db, current.id)
+    if rows is None:
+        rows = await crud_vocab.list_rows_for_user(db, current.id, skip=skip, limit=limit + 1)
+    else:
+        rows = rows[skip:skip + limit + 1]
+    return _offset_response(request, rows, limit)
+
+@router.get("/user", response_model=Union[schema_vocab.VocabPage, List[schema_vocab.VocabOut]])
 async def get_user_vocabulary(
     request: Request,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
-    db: Session = Depends(get_session)
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
+    db: AsyncSession = Depends(get_async_session)
 ):
-    """Get vocabulary items for the current user with pagination"""
+    """Get vocabulary items for the current user with pagination (offset or keyset)"""
+    after_id = _decode_cursor(cursor)
     try:
         # Get the token from the Authorization header
         auth_header = request.headers.get("Authorization")
@@ -35,16 +101,16 @@ async def get_user_vocabulary(
         
         # Verify the Firebase token
         try:
-            decoded_token = auth.verify_id_token(token)
+            decoded_token = await token_cache.verify_id_token_async(token)
             uid = decoded_token.get("uid")
             email = decoded_token.get("email")
             
-            # Try to get user by email
-            from app.crud import user as crud_user
-            user = crud_user.get_by_email(db, email)
-            
-            if user is None:
-                # Create a temporary user if not found
+            # Map the Firebase uid to the local user (cached, provisioned on first login)
+            try:
+                user = await identity.resolve_user(db, decoded_token)
+            except Exception as resolve_error:
+                logger.error(f"Error resolving user: {str(resolve_error)}")
+                # Continue with a temporary user
                 from app.models.user import User
                 user = User(
                     id=1,  # Temporary ID for demo purposes
@@ -53,28 +119,23 @@ async def get_user_vocabulary(
                     full_name=email.split('@')[0],
                     hashed_pw="firebase_auth"
                 )
-                
-                # Try to create the user in the database
-                try:
-                    user = crud_user.create_without_firebase_uid(db, 
-                                                          username=email,
-                                                          email=email,
-                                                          full_name=email.split('@')[0],
-                                                          hashed_pw="firebase_auth")
-                except Exception as create_error:
-                    logger.error(f"Error creating user: {str(create_error)}")
-                    # Continue with temporary user
-                    pass
             
             # Try to get the user's vocabulary items
             try:
                 # If we have a valid user ID, use it to fetch vocabulary items
                 if user and user.id:
-                    return crud_vocab.list_for_user(db, user.id, skip=skip, limit=limit)
+                    if after_id is not None:
+                        return await _keyset_page(db, user.id, after_id, limit)
+                    rows = await crud_vocab.cached_rows(db, user.id)
+                    if rows is None:
+                        rows = await crud_vocab.list_rows_for_user(db, user.id, skip=skip, limit=limit + 1)
+                    else:
+                        rows = rows[skip:skip + limit + 1]
+                    return _offset_response(request, rows, limit)
                 else:
                     # Try to get all vocabulary items (for testing/demo purposes)
                     # In a production environment, you would want to restrict this
-                    all_vocab = db.exec(select(Vocabulary)).all()
+                    all_vocab = (await db.exec(select(DictionaryEntry))).all()
                     logger.info(f"Found {len(all_vocab)} vocabulary items in total")
                     return all_vocab
             except Exception as vocab_error:
@@ -90,13 +151,103 @@ async def get_user_vocabulary(
         logger.error(f"Error in get_user_vocabulary: {str(e)}")
         raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, "Internal server error")
 
+@router.get("/search", response_model=List[schema_vocab.VocabSearchHit])
+async def search_vocab(
+    q: str = Query(..., min_length=1, max_length=settings.SEARCH_MAX_QUERY_LENGTH,
+                   description="Word or meaning prefix; near misses (typos) are matched too"),
+    limit: int = Query(10, ge=1, le=settings.SEARCH_MAX_LIMIT),
+    db: AsyncSession = Depends(get_async_session),
+    current = Depends(get_current_user)
+):
+    """Autocomplete over the user's words and meanings: exact and prefix matches first, then similar ones"""
+    if not q.strip():
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, "Empty search")
+    rows = await crud_vocab.search(db, current.id, q, limit)
+    return serialization.rows_response(rows, search_index.COLUMNS)
+
 @router.post("/", response_model=schema_vocab.VocabOut, status_code=201)
-def add_vocab(data: schema_vocab.VocabIn,
-              db=Depends(get_session), current=Depends(get_current_user)):
-    return crud_vocab.add(db, current.id, **data.dict())
+async def add_vocab(data: schema_vocab.VocabIn,
+                    db=Depends(get_async_session), current=Depends(get_current_user)):
+    try:
+        return await crud_vocab.add(db, current.id, **data.dict())
+    except IntegrityError:
+        raise HTTPException(status.HTTP_409_CONFLICT, "Word already exists")
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_vocab(
+    format: str = Query(vocab_export.FORMAT_NDJSON, pattern="^(ndjson|csv)$"),
+    current = Depends(get_current_user)
+):
+    """
+    Stream the user's whole vocabulary as NDJSON or CSV.
+
+    Rows come from a server-side cursor and are encoded directly, so memory stays
+    constant however large the vocabulary is.
+    """
+    user_id = current.id
+
+    async def body():
+        # The stream outlives the request's dependencies, so it owns its session
+        async with async_session_factory() as db:
+            async for chunk in vocab_export.encode(crud_vocab.stream_rows(db, user_id), format):
+                yield chunk
+
+    return StreamingResponse(
+        body(),
+        media_type=vocab_export.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="vocabulary.{format}"'},
+    )
+
+@router.post("/import", response_model=schema_vocab.VocabImportReport)
+async def import_vocab(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(json|ndjson|csv)$",
+                                  description="Body format; defaults to the Content-Type (JSON array if unknown)"),
+    db: AsyncSession = Depends(get_async_session),
+    current = Depends(get_current_user)
+):
+    """
+    Bulk-import words from a JSON array, NDJSON or CSV body (columns word, meaning, example).
+
+    The body is parsed as it streams in and inserted in batches of VOCAB_IMPORT_BATCH_SIZE,
+    each committed on its own, so memory stays flat for any upload size. Rows that fail
+    to parse or validate are reported and skipped; words the user already has are
+    counted as duplicates and skipped.
+    """
+    fmt = format or vocab_import.detect_format(request.headers.get("content-type"))
+    report = vocab_import.ImportReport(settings.VOCAB_IMPORT_MAX_ERRORS)
+    batch = []
+
+    async def flush(items):
+        inserted = await crud_vocab.bulk_add(db, current.id, items)
+        report.inserted += inserted
+        report.duplicates += len(items) - inserted
+
+    try:
+        async for number, record in vocab_import.iter_records(request.stream(), fmt):
+            report.received += 1
+            if isinstance(record, str):
+                report.error(number, record)
+                continue
+            try:
+                batch.append(schema_vocab.VocabIn.model_validate(record).dict())
+            except ValidationError as e:
+                report.error(number, "; ".join(
+                    f"{'.'.join(str(loc) for loc in err['loc']) or 'row'}: {err['msg']}" for err in e.errors()))
+                continue
+            if len(batch) >= settings.VOCAB_IMPORT_BATCH_SIZE:
+                await flush(batch)
+                batch = []
+    except vocab_import.ImportFormatError as e:
+        report.error(report.received + 1, str(e))
+    await flush(batch)
+    if report.inserted:
+        await vocab_cache.invalidate(current.id)
+    logger.info(f"Imported {report.inserted} of {report.received} words for user {current.id}")
+    return report.as_dict()
 
 @router.delete("/{vocab_id}", status_code=204)
-def delete_vocab(vocab_id: int,
-                 db=Depends(get_session), current=Depends(get_current_user)):
-    if not crud_vocab.delete(db, current.id, vocab_id):
+async def delete_vocab(vocab_id: int,
+                       db=Depends(get_async_session), current=Depends(get_current_user)):
+    if not await crud_vocab.delete(db, current.id, vocab_id):
         raise HTTPException(status.HTTP_404_NOT_FOUND, "Word not found")
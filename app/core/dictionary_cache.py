@@ -0,0 +1,55 @@
+"""
+Process-wide cache of shared dictionary entries
+
+A dictionary entry (word, meaning, example) is stored once however many
+learners saved it, and never changes once written. Entries are therefore cached
+by id for everyone, with no invalidation: in each worker's L1, where the hot
+TOEIC words stay resident, and in L2 for cold workers. Per-user vocabulary
+snapshots only hold entry ids and are resolved through here.
+"""
+import logging
+from typing import Awaitable, Callable, Dict, Iterable, List, Sequence
+
+from app.core import tiered_cache
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+ENTRY_NAMESPACE = "dictionary_entry"
+
+# Entry values are compact lists in this column order
+COLUMNS = ("word", "meaning", "example")
+
+# Takes entry ids, returns (id, word, meaning, example) rows
+Loader = Callable[[List[int]], Awaitable[Sequence[Sequence]]]
+
+# str(entry id) -> [word, meaning, example]
+entry_cache = tiered_cache.TwoTierCache(
+    ENTRY_NAMESPACE,
+    max_entries=settings.DICTIONARY_CACHE_LOCAL_MAX_ENTRIES,
+    max_bytes=settings.DICTIONARY_CACHE_LOCAL_MAX_BYTES,
+    local_ttl=settings.DICTIONARY_CACHE_LOCAL_TTL_SECONDS,
+)
+
+
+async def get_entries(entry_ids: Iterable[int], load: Loader) -> Dict[int, list]:
+    """
+    Resolve entry ids: L1, then one L2 round trip, then one database query for the rest
+
+    Args:
+        entry_ids: Entries wanted (duplicates are fine)
+        load: Fetches the entries neither tier holds
+
+    Returns:
+        entry id -> [word, meaning, example] for every id that exists
+    """
+    wanted = set(entry_ids)
+    entries = {int(key): value for key, value in (await entry_cache.get_many([str(i) for i in wanted])).items()}
+    missing = [entry_id for entry_id in wanted if entry_id not in entries]
+    if missing:
+        loaded = {row[0]: [row[1], row[2], row[3]] for row in await load(missing)}
+        entries.update(loaded)
+        await entry_cache.set_many({str(entry_id): value for entry_id, value in loaded.items()},
+                                   settings.DICTIONARY_CACHE_TTL_SECONDS)
+    return entries
@@ -0,0 +1,160 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+T = TypeVar("T")
+
+
+class Lane:
+    """
+    A bounded route from the event loop into a pool of workers
+
+    At most `max_pending` calls are handed to the pool at once; further callers
+    wait on the event loop, so a burst cannot grow the pool's internal queue
+    without limit and the wait shows up in the lane's stats.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], Executor], workers: int, max_pending: int):
+        self.name = name
+        self.workers = workers
+        self.max_pending = max(max_pending, workers)
+        self._factory = factory
+        self._executor: Optional[Executor] = None
+        self._executor_lock = threading.Lock()
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._slots_loop: Optional[asyncio.AbstractEventLoop] = None
+        self.waiting = 0
+        self.in_flight = 0
+        self.submitted_total = 0
+        self.completed_total = 0
+        self.failed_total = 0
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = self._factory()
+        return self._executor
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        loop = asyncio.get_running_loop()
+        if self._slots_loop is not loop:
+            self._slots = asyncio.Semaphore(self.max_pending)
+            self._slots_loop = loop
+        slots = self._slots
+        self.waiting += 1
+        try:
+            await slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        self.submitted_total += 1
+        try:
+            future = loop.run_in_executor(self.executor, functools.partial(fn, *args, **kwargs))
+        except BaseException:
+            self._finish(slots, failed=True)
+            raise
+        # A cancelled caller stops waiting but the call keeps its worker busy, so the
+        # slot is only released once the call itself is done
+        future.add_done_callback(functools.partial(self._on_done, slots))
+        return await asyncio.shield(future)
+
+    def _on_done(self, slots: asyncio.Semaphore, future: asyncio.Future) -> None:
+        # Retrieving the exception also keeps a caller-less failure from being logged as unretrieved
+        self._finish(slots, failed=future.cancelled() or future.exception() is not None)
+
+    def _finish(self, slots: asyncio.Semaphore, failed: bool) -> None:
+        self.in_flight -= 1
+        self.completed_total += 1
+        if failed:
+            self.failed_total += 1
+        slots.release()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            # Calls blocked on admission plus calls admitted but not yet on a worker
+            "queue_depth": self.waiting + max(0, self.in_flight - self.workers),
+            "waiting": self.waiting,
+            "in_flight": self.in_flight,
+            "submitted_total": self.submitted_total,
+            "completed_total": self.completed_total,
+            "failed_total": self.failed_total,
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+io_lane = Lane(
+    "io",
+    lambda: ThreadPoolExecutor(max_workers=settings.EXECUTOR_IO_WORKERS, thread_name_prefix="io-lane"),
+    settings.EXECUTOR_IO_WORKERS,
+    settings.EXECUTOR_IO_MAX_PENDING,
+)
+
+if settings.EXECUTOR_CPU_WORKERS > 0:
+    cpu_lane = Lane(
+        "cpu",
+        lambda: ProcessPoolExecutor(max_workers=settings.EXECUTOR_CPU_WORKERS),
+        settings.EXECUTOR_CPU_WORKERS,
+        settings.EXECUTOR_CPU_MAX_PENDING,
+    )
+else:
+    # No process pool configured: CPU-bound work shares the thread lane
+    cpu_lane = io_lane
+
+
+async def run_io(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Run a blocking, network-bound call (Firebase Admin, sync Redis, ...) off the event loop
+
+    Args:
+        fn: The blocking callable
+        *args: Positional arguments for fn
+        **kwargs: Keyword arguments for fn
+
+    Returns:
+        Whatever fn returns
+    """
+    return await io_lane.run(fn, *args, **kwargs)
+
+
+async def run_cpu(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Run a CPU-bound call (password hashing, ...) in the process pool
+
+    Args:
+        fn: A picklable, module-level callable
+        *args: Positional arguments for fn
+        **kwargs: Keyword arguments for fn
+
+    Returns:
+        Whatever fn returns
+    """
+    return await cpu_lane.run(fn, *args, **kwargs)
+
+
+def stats() -> Dict[str, Dict[str, int]]:
+    """Queue depth and throughput counters for every lane"""
+    lanes = {io_lane.name: io_lane.stats()}
+    if cpu_lane is not io_lane:
+        lanes[cpu_lane.name] = cpu_lane.stats()
+    return lanes
+
+
+def shutdown() -> None:
+    """Release worker threads and processes (call on application shutdown)"""
+    io_lane.shutdown()
+    if cpu_lane is not io_lane:
+        cpu_lane.shutdown()
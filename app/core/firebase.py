@@ -0,0 +1,74 @@
+"""
+Firebase Admin app setup, done once per worker at application startup
+
+Importing this module has no side effects; main's lifespan calls init_app()
+before serving and prefetch_public_keys() during warm-up.
+"""
+import logging
+
+import firebase_admin
+from dotenv import load_dotenv
+from firebase_admin import _token_gen, auth, credentials
+
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_KEYS = ("type", "project_id", "private_key", "client_email")
+
+
+def init_app() -> bool:
+    """
+    Initialize the default Firebase app from the service account settings
+
+    Returns:
+        True if an app is available (also when it was already initialized),
+        False when credentials are missing
+    """
+    if firebase_admin._apps:
+        return True
+    # Load environment variables
+    load_dotenv()
+    settings = get_settings()
+
+    # Create a credentials dictionary only with non-None values
+    cred_dict = {
+        "type": settings.TYPE,
+        "project_id": settings.PROJECT_ID,
+        "private_key_id": settings.PRIVATE_KEY_ID,
+        "private_key": settings.PRIVATE_KEY.replace("\\n", "\n") if settings.PRIVATE_KEY else None,
+        "client_email": settings.CLIENT_EMAIL,
+        "client_id": settings.CLIENT_ID,
+        "auth_uri": settings.AUTH_URI,
+        "token_uri": settings.TOKEN_URI,
+        "auth_provider_x509_cert_url": settings.AUTH_PROVIDER_X509_CERT_URL,
+        "client_x509_cert_url": settings.CLIENT_X509_CERT_URL,
+        "universe_domain": settings.UNIVERSE_DOMAIN
+    }
+    cred_dict = {k: v for k, v in cred_dict.items() if v is not None}
+
+    # Initialize Firebase only if we have all required credentials
+    if not all(key in cred_dict for key in REQUIRED_KEYS):
+        logger.warning("Firebase initialization skipped - missing required credentials")
+        return False
+    firebase_admin.initialize_app(credentials.Certificate(cred_dict))
+    return True
+
+
+def prefetch_public_keys() -> bool:
+    """
+    Fetch the ID token signing certificates into firebase_admin's HTTP cache, so
+    the first verify_id_token doesn't pay for the round trip. Blocking: run it on
+    the I/O executor lane.
+
+    Returns:
+        True if the certificates were fetched, False without a Firebase app
+    """
+    if not firebase_admin._apps:
+        return False
+    # The verifier keeps its certificates in a cache-control aware session; warm that one
+    verifier = auth._get_client(firebase_admin.get_app())._token_verifier
+    response = verifier.request(url=_token_gen.ID_TOKEN_CERT_URI)
+    if response.status != 200:
+        raise RuntimeError(f"Fetching Firebase public keys returned HTTP {response.status}")
+    return True
@@ -0,0 +1,136 @@
+import asyncio
+import logging
+from typing import Any, Dict
+
+from sqlalchemy.exc import IntegrityError
+
+from app.core import tiered_cache
+from app.core.config import get_settings
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+IDENTITY_NAMESPACE = "identity"
+# Placeholder password hash for users that authenticate through Firebase only
+FIREBASE_PASSWORD_PLACEHOLDER = "firebase_auth"
+
+# Fields kept in the cache; never the password hash
+CACHED_FIELDS = ("id", "username", "email", "full_name", "firebase_uid")
+
+# uid -> user fields
+identity_cache = tiered_cache.TwoTierCache(
+    IDENTITY_NAMESPACE,
+    max_entries=settings.IDENTITY_CACHE_MAX_ENTRIES,
+    max_bytes=settings.IDENTITY_CACHE_MAX_BYTES,
+    local_ttl=settings.IDENTITY_CACHE_TTL_SECONDS,
+)
+# uid -> in-flight resolution, so concurrent first requests share one lookup/insert
+_inflight: Dict[str, asyncio.Future] = {}
+
+
+def _to_fields(user: User) -> Dict[str, Any]:
+    return {name: getattr(user, name) for name in CACHED_FIELDS}
+
+
+def _to_user(fields: Dict[str, Any]) -> User:
+    # Detached, read-only view of the row; routers only need the id and profile fields
+    return User(**fields)
+
+
+async def _lookup_or_provision(db, uid: str, claims: Dict[str, Any]) -> Dict[str, Any]:
+    # Imported here: app.crud modules import app.core modules at load time
+    from app.crud import async_user as crud_user
+
+    user = await crud_user.get_by_firebase_uid(db, uid)
+    if user is not None:
+        return _to_fields(user)
+
+    email = claims.get("email")
+    if email:
+        # Rows created before firebase_uid was populated: adopt them by email
+        user = await crud_user.get_by_email(db, email)
+        if user is not None:
+            fields = _to_fields(user)
+            if user.firebase_uid is None:
+                try:
+                    await crud_user.set_firebase_uid(db, user, uid)
+                    fields["firebase_uid"] = uid
+                except Exception as e:
+                    logger.warning(f"Could not link user {fields['id']} to firebase_uid: {str(e)}")
+            return fields
+
+    name = claims.get("name")
+    username = name or email or uid
+    full_name = name or (email.split("@")[0] if email else uid)
+    try:
+        user = await crud_user.create_from_firebase(
+            db, firebase_uid=uid, username=username, email=email or "",
+            full_name=full_name, hashed_pw=FIREBASE_PASSWORD_PLACEHOLDER)
+    except IntegrityError:
+        # Another worker provisioned this uid first, or the display name is taken
+        user = await crud_user.get_by_firebase_uid(db, uid)
+        if user is not None:
+            return _to_fields(user)
+        if username == (email or uid):
+            raise
+        user = await crud_user.create_from_firebase(
+            db, firebase_uid=uid, username=email or uid, email=email or "",
+            full_name=full_name, hashed_pw=FIREBASE_PASSWORD_PLACEHOLDER)
+    return _to_fields(user)
+
+
+async def _resolve_uncached(db, uid: str, claims: Dict[str, Any]) -> Dict[str, Any]:
+    fields = await identity_cache.get_shared(uid)
+    if fields is None:
+        fields = await _lookup_or_provision(db, uid, claims)
+        await identity_cache.set(uid, fields, settings.IDENTITY_CACHE_TTL_SECONDS)
+    return fields
+
+
+async def resolve_user(db, claims: Dict[str, Any]) -> User:
+    """
+    Map verified Firebase claims to the local user, provisioning it on first login
+
+    Lookups go through the two-tier identity cache (in-process, then Redis shared
+    across workers), then the indexed firebase_uid column. Concurrent first requests for
+    the same uid in a worker share one resolution; across workers the unique
+    firebase_uid constraint decides the winner and the losers re-read its row.
+
+    Args:
+        db: Async database session
+        claims: Verified ID-token claims (uid, email, name)
+
+    Returns:
+        The local user
+    """
+    uid = claims["uid"]
+    fields = identity_cache.get_local(uid)
+    if fields is not None:
+        return _to_user(fields)
+
+    pending = _inflight.get(uid)
+    if pending is not None:
+        return _to_user(await asyncio.shield(pending))
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[uid] = future
+    try:
+        fields = await _resolve_uncached(db, uid, claims)
+        future.set_result(fields)
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        # Mark the exception as retrieved when nobody else was waiting
+        future.exception()
+        raise
+    finally:
+        del _inflight[uid]
+    return _to_user(fields)
+
+
+async def forget(uid: str) -> None:
+    """Drop a uid from both cache tiers on every worker (e.g., after the local user row changed)"""
+    await identity_cache.invalidate(uid)
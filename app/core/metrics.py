@@ -0,0 +1,472 @@
+"""
+Process metrics in the Prometheus text exposition format (version 0.0.4)
+
+Counters and histograms are plain Python numbers updated without locks: almost
+every update happens on the event loop thread, and an increment lost to a race
+between executor threads only costs one sample. Values that other modules
+already track (executor lanes, cache tiers, the Redis breaker, DB pools) are not
+duplicated on the hot path; collectors read them when /metrics is scraped.
+
+Every value lives in the memory of one process. Under the multi-worker server
+(app.server) each scrape of /metrics is answered by whichever worker accepted
+the connection, so it reports that worker alone: counters appear to jump
+between scrapes and gauges cover a fraction of the load. Scrape each worker
+separately, or run a single worker per container and scale containers.
+"""
+import bisect
+import logging
+import math
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds. Requests and Firebase calls span milliseconds to seconds; Redis
+# commands and pool checkouts are expected to stay well under a millisecond
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FAST_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+# (name, labels, value) lines of one metric family
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _escape_help(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_sample(name: str, labels: Dict[str, str], value: float) -> str:
+    if not labels:
+        return f"{name} {_format_value(value)}"
+    rendered = ",".join(f'{key}="{_escape(str(val))}"' for key, val in labels.items())
+    return f"{name}{{{rendered}}} {_format_value(value)}"
+
+
+class Timer:
+    """Context manager observing the elapsed wall time into a histogram child"""
+
+    __slots__ = ("_child", "_started")
+
+    def __init__(self, child: "_HistogramChild"):
+        self._child = child
+        self._started = 0.0
+
+    def __enter__(self) -> "Timer":
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self._child.observe(time.perf_counter() - self._started)
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+
+class _GaugeChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class _HistogramChild:
+    __slots__ = ("_bounds", "_counts", "sum")
+
+    def __init__(self, bounds: Sequence[float]):
+        self._bounds = bounds
+        # Non-cumulative per bucket; the last slot is the +Inf bucket
+        self._counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self._counts[bisect.bisect_left(self._bounds, value)] += 1
+        self.sum += value
+
+    def time(self) -> Timer:
+        return Timer(self)
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        return list(self._counts), self.sum
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        # Unlabelled metrics are used directly (metric.inc(), metric.time(), ...)
+        self._default = None if self.labelnames else self._new_child()
+
+    def _new_child(self) -> Any:
+        raise NotImplementedError
+
+    def labels(self, *values: Any) -> Any:
+        """
+        The child for one combination of label values, created on first use
+
+        Args:
+            *values: One value per label name, in declaration order
+
+        Returns:
+            The child to update (keep a reference to it on hot paths)
+        """
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}")
+            # setdefault keeps the first child if two threads race here
+            child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _labelled(self) -> Iterable[Tuple[Dict[str, str], Any]]:
+        if self._default is not None:
+            yield {}, self._default
+        for key, child in list(self._children.items()):
+            yield dict(zip(self.labelnames, key)), child
+
+    def samples(self) -> Iterable[Sample]:
+        for labels, child in self._labelled():
+            yield self.name, labels, child.value
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.inc(amount)
+
+    @property
+    def value(self) -> float:
+        return self._default.value
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def _new_child(self) -> _GaugeChild:
+        return _GaugeChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._default.dec(amount)
+
+    def set(self, value: float) -> None:
+        self._default.set(value)
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._default.observe(value)
+
+    def time(self) -> Timer:
+        return self._default.time()
+
+    def samples(self) -> Iterable[Sample]:
+        for labels, child in self._labelled():
+            counts, total = child.snapshot()
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                yield f"{self.name}_bucket", {**labels, "le": _format_value(bound)}, cumulative
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, cumulative
+
+
+class Family:
+    """A metric family built at scrape time by a collector"""
+
+    def __init__(self, name: str, type_name: str, documentation: str, samples: Optional[List[Sample]] = None):
+        self.name = name
+        self.type_name = type_name
+        self.documentation = documentation
+        self._samples = samples or []
+
+    def add(self, labels: Dict[str, str], value: float) -> "Family":
+        self._samples.append((self.name, labels, value))
+        return self
+
+    def samples(self) -> Iterable[Sample]:
+        return self._samples
+
+
+_metrics: List[_Metric] = []
+_collectors: List[Callable[[], Iterable[Family]]] = []
+
+
+def _register(metric: _Metric) -> Any:
+    _metrics.append(metric)
+    return metric
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    return _register(Counter(name, documentation, labelnames))
+
+
+def gauge(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+    return _register(Gauge(name, documentation, labelnames))
+
+
+def histogram(name: str, documentation: str, labelnames: Sequence[str] = (),
+              buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+    return _register(Histogram(name, documentation, labelnames, buckets))
+
+
+def register_collector(collector: Callable[[], Iterable[Family]]) -> None:
+    """
+    Add a function producing metric families from existing state on every scrape
+
+    Args:
+        collector: Called with no arguments; must be cheap and must not block on I/O
+    """
+    _collectors.append(collector)
+
+
+HTTP_REQUEST_SECONDS = histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template",
+    ("method", "route", "status"))
+HTTP_REQUESTS_IN_FLIGHT = gauge(
+    "http_requests_in_flight", "HTTP requests currently being served")
+FIREBASE_CALL_SECONDS = histogram(
+    "firebase_call_duration_seconds", "Firebase Admin calls, including time queued on the executor",
+    ("operation",))
+DB_SESSION_SECONDS = histogram(
+    "db_session_duration_seconds", "Lifetime of request-scoped database sessions", ("engine",))
+DB_POOL_CHECKOUT_SECONDS = histogram(
+    "db_pool_checkout_wait_seconds", "Time in Engine.connect(): waiting for a pooled connection, including connects",
+    ("engine",), FAST_BUCKETS)
+DB_POOL_CHECKOUT_TIMEOUTS = counter(
+    "db_pool_checkout_timeouts_total", "Pool checkouts that gave up after pool_timeout", ("engine",))
+DB_STATEMENT_SECONDS = histogram(
+    "db_statement_duration_seconds", "SQL statements, timed around the DBAPI cursor call", (), FAST_BUCKETS)
+DB_SLOW_STATEMENTS = counter(
+    "db_slow_statements_total", "SQL statements slower than SQL_SLOW_QUERY_MS")
+DB_N_PLUS_ONE_REQUESTS = counter(
+    "db_n_plus_one_requests_total", "Requests that repeated one statement shape over SQL_N_PLUS_ONE_THRESHOLD times")
+REDIS_CALL_SECONDS = histogram(
+    "redis_call_duration_seconds", "Redis calls made through the circuit breaker", ("client",), FAST_BUCKETS)
+REDIS_CALLS = counter(
+    "redis_calls_total", "Redis calls by outcome (ok, error, unavailable, skipped)", ("client", "outcome"))
+
+
+class RequestMetricsMiddleware:
+    """
+    ASGI middleware recording per-route latency and the in-flight request gauge
+
+    Routes are labelled by their template ("/vocabulary/{vocab_id}") so label
+    cardinality stays bounded; requests that match no route share "unmatched".
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            # The router stores the matched route in the (shared) scope
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            HTTP_REQUEST_SECONDS.labels(scope["method"], route, status).observe(elapsed)
+
+
+# engine label -> Engine whose pool is reported at scrape time
+_engines: Dict[str, Any] = {}
+
+
+def _time_checkouts(engine, name: str) -> None:
+    # Engine.connect() is where every Connection (and every Session's) takes one from
+    # the pool, so timing it measures the checkout wait without reaching into the pool
+    connect = engine.connect
+    child = DB_POOL_CHECKOUT_SECONDS.labels(name)
+    timeouts = DB_POOL_CHECKOUT_TIMEOUTS.labels(name)
+
+    def timed_connect():
+        started = time.perf_counter()
+        try:
+            return connect()
+        except PoolTimeoutError:
+            timeouts.inc()
+            raise
+        finally:
+            child.observe(time.perf_counter() - started)
+
+    engine.connect = timed_connect
+
+
+def instrument_engine(engine, name: str) -> None:
+    """
+    Time connection checkouts of a (sync) Engine and report its pool on every scrape
+
+    Args:
+        engine: The Engine; pass AsyncEngine.sync_engine for async engines
+        name: Value of the "engine" label
+    """
+    _engines[name] = engine
+    _time_checkouts(engine, name)
+
+
+def _pool_families() -> Iterable[Family]:
+    checked_out = Family("db_pool_checked_out", "gauge", "Connections currently checked out of the pool")
+    capacity = Family("db_pool_capacity", "gauge", "pool_size + max_overflow (0 when unbounded)")
+    saturation = Family("db_pool_saturation", "gauge", "Checked out connections / capacity")
+    for name, engine in _engines.items():
+        pool = engine.pool
+        if not hasattr(pool, "checkedout"):
+            continue
+        in_use = pool.checkedout()
+        checked_out.add({"engine": name}, in_use)
+        size = pool.size() if hasattr(pool, "size") else 0
+        max_overflow = getattr(pool, "_max_overflow", 0)
+        limit = size + max_overflow if size and max_overflow >= 0 else 0
+        capacity.add({"engine": name}, limit)
+        if limit:
+            saturation.add({"engine": name}, in_use / limit)
+    return checked_out, capacity, saturation
+
+
+def _executor_families() -> Iterable[Family]:
+    from app.core import executor
+
+    gauges = {
+        "queue_depth": Family("executor_queue_depth", "gauge", "Calls waiting for a worker"),
+        "in_flight": Family("executor_in_flight", "gauge", "Calls admitted to the worker pool"),
+        "workers": Family("executor_workers", "gauge", "Worker threads or processes"),
+    }
+    counters = {
+        "submitted_total": Family("executor_submitted_total", "counter", "Calls handed to the worker pool"),
+        "failed_total": Family("executor_failed_total", "counter", "Calls that raised"),
+    }
+    for lane, lane_stats in executor.stats().items():
+        for key, family in {**gauges, **counters}.items():
+            family.add({"lane": lane}, lane_stats[key])
+    return list(gauges.values()) + list(counters.values())
+
+
+def _cache_families() -> Iterable[Family]:
+    from app.core import tiered_cache
+
+    hits = Family("cache_hits_total", "counter", "Cache hits by cache and tier")
+    misses = Family("cache_misses_total", "counter", "Cache misses by cache and tier")
+    evictions = Family("cache_evictions_total", "counter", "In-process entries evicted to stay within limits")
+    entries = Family("cache_entries", "gauge", "Entries held in-process")
+    size = Family("cache_bytes", "gauge", "Approximate in-process bytes")
+    for namespace, cache_stats in tiered_cache.stats()["caches"].items():
+        hits.add({"cache": namespace, "tier": "l1"}, cache_stats["hits"])
+        hits.add({"cache": namespace, "tier": "l2"}, cache_stats["l2_hits"])
+        misses.add({"cache": namespace, "tier": "l1"}, cache_stats["misses"])
+        misses.add({"cache": namespace, "tier": "l2"}, cache_stats["l2_misses"])
+        evictions.add({"cache": namespace}, cache_stats["evictions"])
+        entries.add({"cache": namespace}, cache_stats["entries"])
+        size.add({"cache": namespace}, cache_stats["bytes"])
+    return hits, misses, evictions, entries, size
+
+
+def _redis_families() -> Iterable[Family]:
+    from app.core import redis as cache
+
+    breaker = cache.breaker.stats()
+    state = Family("redis_breaker_state", "gauge", "1 for the circuit breaker's current state")
+    for name in (cache.CircuitBreaker.CLOSED, cache.CircuitBreaker.OPEN, cache.CircuitBreaker.HALF_OPEN):
+        state.add({"state": name}, 1 if breaker["state"] == name else 0)
+    return (
+        state,
+        Family("redis_breaker_opened_total", "counter", "Times the circuit breaker opened").add(
+            {}, breaker["opened_total"]),
+        Family("redis_breaker_rejected_total", "counter", "Calls skipped while the breaker was open").add(
+            {}, breaker["rejected_total"]),
+    )
+
+
+for _collector in (_pool_families, _executor_families, _cache_families, _redis_families):
+    register_collector(_collector)
+
+
+def render() -> str:
+    """
+    Every registered metric and collector in the Prometheus text format
+
+    Returns:
+        The exposition body, newline terminated
+    """
+    families: List[Any] = list(_metrics)
+    for collector in _collectors:
+        try:
+            families.extend(collector())
+        except Exception as e:
+            # A broken collector must not take the whole scrape down
+            logger.warning(f"Metrics collector {getattr(collector, '__name__', collector)} failed: {str(e)}")
+
+    lines = []
+    for family in families:
+        samples = list(family.samples())
+        if not samples:
+            continue
+        lines.append(f"# HELP {family.name} {_escape_help(family.documentation)}")
+        lines.append(f"# TYPE {family.name} {family.type_name}")
+        lines.extend(_format_sample(name, labels, value) for name, labels, value in samples)
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,71 @@
+import base64
+import binascii
+import json
+from typing import Optional, Sequence, Tuple
+
+CURSOR_VERSION = 1
+
+
+def encode_cursor(last_id: int) -> str:
+    """
+    Build the opaque cursor pointing just past a row
+
+    Args:
+        last_id: Id of the last row on the current page
+
+    Returns:
+        URL-safe cursor string
+    """
+    payload = json.dumps({"v": CURSOR_VERSION, "id": last_id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> int:
+    """
+    Recover the keyset position from a cursor; an empty cursor means the first page
+
+    Args:
+        cursor: Cursor previously returned as next_cursor, or ""
+
+    Returns:
+        The id the next page starts after (0 for the first page)
+
+    Raises:
+        ValueError: If the cursor was not produced by encode_cursor
+    """
+    if not cursor:
+        return 0
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded))
+        last_id = payload["id"] if payload.get("v") == CURSOR_VERSION else None
+    except (binascii.Error, ValueError, TypeError, KeyError, AttributeError):
+        raise ValueError("Malformed cursor")
+    if not isinstance(last_id, int) or last_id < 0:
+        raise ValueError("Malformed cursor")
+    return last_id
+
+
+def page_after(rows: Sequence[Sequence], after_id: int, limit: int) -> Tuple[Sequence, Optional[str]]:
+    """
+    Keyset page over rows already sorted by id (first column), e.g. a cached snapshot
+
+    Args:
+        rows: Id-ordered rows
+        after_id: Exclusive lower bound from decode_cursor
+        limit: Page size
+
+    Returns:
+        The page and the cursor for the following page (None on the last page)
+    """
+    # Binary search on the id column (bisect's key= needs Python 3.10)
+    start, end = 0, len(rows)
+    while start < end:
+        mid = (start + end) // 2
+        if rows[mid][0] <= after_id:
+            start = mid + 1
+        else:
+            end = mid
+    page = rows[start:start + limit]
+    has_more = start + limit < len(rows)
+    return page, (encode_cursor(page[-1][0]) if has_more and page else None)
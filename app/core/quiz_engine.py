@@ -0,0 +1,135 @@
+import random
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+QUESTION_TEMPLATE = "What is the meaning of '{word}'?"
+DEFAULT_DISTRACTORS = 3
+
+# Rejection sampling gives up after this many misses per distractor and scans instead;
+# only reachable when the pool has barely more distinct meanings than needed
+_MAX_REJECTIONS = 32
+
+_rng = random.Random()
+
+
+class MeaningPool:
+    """
+    Compact, array-backed pool of (word, meaning) pairs for one quiz
+
+    Every distinct meaning is stored once in `meanings`; entry i points at its
+    meaning through `meaning_ids[i]`, so distractors are drawn by index and two
+    words sharing a meaning can never show the same choice twice.
+    """
+
+    __slots__ = ("words", "meanings", "meaning_ids", "_index")
+
+    def __init__(self, pairs: Iterable[Tuple[str, str]]):
+        self.words: List[str] = []
+        self.meanings: List[str] = []
+        self.meaning_ids = array("I")
+        self._index: Dict[str, int] = {}
+        for word, meaning in pairs:
+            self.words.append(word)
+            self.meaning_ids.append(self._intern(meaning))
+
+    def _intern(self, meaning: str) -> int:
+        meaning_id = self._index.get(meaning)
+        if meaning_id is None:
+            meaning_id = self._index[meaning] = len(self.meanings)
+            self.meanings.append(meaning)
+        return meaning_id
+
+    def add_meanings(self, meanings: Iterable[str]) -> None:
+        """Add distractor-only meanings that have no question of their own"""
+        for meaning in meanings:
+            self._intern(meaning)
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def distractor_ids(self, correct_id: int, count: int, rng: random.Random) -> List[int]:
+        """
+        Draw up to `count` distinct meaning ids other than `correct_id`
+
+        Args:
+            correct_id: Meaning id of the right answer
+            count: Number of distractors wanted
+            rng: Random source
+
+        Returns:
+            Distinct meaning ids, fewer than `count` only if the pool runs out
+        """
+        available = len(self.meanings) - 1
+        count = min(count, available)
+        chosen: List[int] = []
+        if count <= 0:
+            return chosen
+        rejected = 0
+        while len(chosen) < count:
+            candidate = rng.randrange(len(self.meanings))
+            if candidate == correct_id or candidate in chosen:
+                rejected += 1
+                if rejected > _MAX_REJECTIONS:
+                    break
+                continue
+            chosen.append(candidate)
+        if len(chosen) < count:
+            rest = [i for i in range(len(self.meanings)) if i != correct_id and i not in chosen]
+            chosen.extend(rng.sample(rest, count - len(chosen)))
+        return chosen
+
+
+def build_pool(pairs: Iterable[Tuple[str, str]], extra_meanings: Iterable[str] = ()) -> MeaningPool:
+    """
+    Build the meaning pool once per quiz
+
+    Args:
+        pairs: (word, meaning) rows
+        extra_meanings: Additional meanings usable only as distractors
+
+    Returns:
+        A MeaningPool over those rows
+    """
+    pool = MeaningPool(pairs)
+    pool.add_meanings(extra_meanings)
+    return pool
+
+
+def generate_questions(
+    pool: MeaningPool,
+    num_questions: int,
+    num_distractors: int = DEFAULT_DISTRACTORS,
+    rng: Optional[random.Random] = None,
+    indices: Optional[Sequence[int]] = None,
+) -> List[Dict[str, Union[str, List[str]]]]:
+    """
+    Produce a batch of multiple-choice questions in one pass
+
+    Runs in O(num_questions * num_distractors) expected time regardless of pool size.
+
+    Args:
+        pool: The meaning pool to draw from
+        num_questions: Number of questions wanted (capped at the pool size)
+        num_distractors: Wrong choices per question
+        rng: Random source (defaults to the module-level generator)
+        indices: Pool entries to ask about; sampled at random when omitted
+
+    Returns:
+        Question dicts with `question`, `answer` and shuffled `choices`
+    """
+    rng = rng or _rng
+    if indices is None:
+        indices = rng.sample(range(len(pool)), min(num_questions, len(pool)))
+    meanings = pool.meanings
+    questions = []
+    for i in indices:
+        correct_id = pool.meaning_ids[i]
+        choices = [meanings[correct_id]]
+        choices.extend(meanings[d] for d in pool.distractor_ids(correct_id, num_distractors, rng))
+        rng.shuffle(choices)
+        questions.append({
+            "question": QUESTION_TEMPLATE.format(word=pool.words[i]),
+            "answer": meanings[correct_id],
+            "choices": choices,
+        })
+    return questions
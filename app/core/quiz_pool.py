@@ -0,0 +1,262 @@
+"""
+Ready-made random quizzes, built ahead of the request by a background task
+
+Each worker keeps up to QUIZ_POOL_DEPTH pre-built quizzes per (user, quiz size)
+in memory, so /quiz/generate/ is a deque pop. A quiz size gets a pool on the
+user's second request for it, so one-off sizes never cost background builds. A
+pop that leaves fewer than QUIZ_POOL_REFILL_BELOW quizzes queues a refill; an
+empty pool falls back to building the quiz on the request path. Any change to
+a user's vocabulary (on any worker, through the vocab_snapshot invalidation
+broadcast) empties that user's pools and queues fresh builds. Users who have
+not asked for a quiz in QUIZ_POOL_IDLE_SECONDS are evicted, least recently used
+first.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Optional, Sequence, Set, Tuple
+
+from app.core import metrics, quiz_engine, vocab_cache
+from app.core.config import get_settings
+from app.crud import async_vocabulary as crud_vocab
+from app.db.session import async_session_factory
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# How often the worker evicts idle users when no refill is queued
+SWEEP_INTERVAL_SECONDS = 30.0
+
+HITS = metrics.counter("quiz_pool_hits_total", "Quizzes served from the pre-built pool")
+MISSES = metrics.counter("quiz_pool_misses_total", "Quizzes built on the request path because the pool was empty")
+BUILT = metrics.counter("quiz_pool_built_total", "Quizzes built by the background worker")
+DISCARDED = metrics.counter("quiz_pool_discarded_total", "Pre-built quizzes dropped because the vocabulary changed")
+EVICTIONS = metrics.counter("quiz_pool_evictions_total", "Users evicted for inactivity or capacity")
+
+
+class _UserPool:
+    __slots__ = ("batches", "asked_once", "epoch", "last_used")
+
+    def __init__(self, now: float):
+        # quiz size -> ready quizzes, for sizes requested at least twice
+        self.batches: Dict[int, Deque[Dict[str, Any]]] = {}
+        # Sizes requested once so far, not pooled yet
+        self.asked_once: Set[int] = set()
+        # Bumped on every vocabulary change; builds started under an older epoch are dropped
+        self.epoch = 0
+        self.last_used = now
+
+
+# user_id -> pools, least recently used first
+_users: "OrderedDict[int, _UserPool]" = OrderedDict()
+_pending: Set[Tuple[int, int]] = set()
+_queue: Optional[asyncio.Queue] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_worker: Optional[asyncio.Task] = None
+
+
+async def build_batch(db, user_id: int, num_questions: int) -> Dict[str, Any]:
+    """
+    Build one random quiz: sample the vocabulary, then draw questions and distractors
+
+    Args:
+        db: Async database session
+        user_id: Owner of the vocabulary
+        num_questions: Questions wanted (fewer if the vocabulary is smaller)
+
+    Returns:
+        {"questions": [...], "total_vocabulary": n}, ready to encode
+    """
+    # Sample from the cached vocabulary snapshot, or let the database draw the
+    # question rows and distractor meanings when the vocabulary is too large to cache
+    rows = await crud_vocab.cached_rows(db, user_id)
+    sample = await crud_vocab.sample_for_quiz(db, user_id, num_questions, rows=rows)
+    # Build the meaning pool once, then draw every question and its distractors by index
+    pool = quiz_engine.build_pool(sample.questions, sample.distractors)
+    questions = quiz_engine.generate_questions(pool, len(sample.questions), indices=range(len(sample.questions)))
+    return {"questions": questions, "total_vocabulary": sample.total}
+
+
+def pop(user_id: int, num_questions: int) -> Optional[Dict[str, Any]]:
+    """
+    Take a pre-built quiz, queueing a refill when the pool runs low (or, on the
+    second request for this size, creating the pool)
+
+    Args:
+        user_id: The requesting user
+        num_questions: Quiz size requested
+
+    Returns:
+        A quiz as returned by build_batch, or None if the caller must build one
+    """
+    if _worker is None or num_questions > settings.QUIZ_POOL_MAX_QUESTIONS:
+        return None
+    now = time.monotonic()
+    user_pool = _users.get(user_id)
+    if user_pool is None:
+        user_pool = _users[user_id] = _UserPool(now)
+        while len(_users) > settings.QUIZ_POOL_MAX_USERS:
+            _users.popitem(last=False)
+            EVICTIONS.inc()
+    else:
+        _users.move_to_end(user_id)
+        user_pool.last_used = now
+
+    batches = user_pool.batches.get(num_questions)
+    if batches is None:
+        if num_questions not in user_pool.asked_once:
+            user_pool.asked_once.add(num_questions)
+            MISSES.inc()
+            return None
+        user_pool.asked_once.discard(num_questions)
+        batches = user_pool.batches[num_questions] = deque()
+    quiz = batches.popleft() if batches else None
+    if quiz is None:
+        MISSES.inc()
+    else:
+        HITS.inc()
+    if len(batches) < settings.QUIZ_POOL_REFILL_BELOW:
+        _schedule(user_id, num_questions)
+    return quiz
+
+
+def _enqueue(key: Tuple[int, int]) -> None:
+    if _queue is not None and key not in _pending:
+        _pending.add(key)
+        _queue.put_nowait(key)
+
+
+def _schedule(user_id: int, num_questions: int) -> None:
+    if _loop is None:
+        return
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is _loop:
+        _enqueue((user_id, num_questions))
+    else:
+        # Sync invalidations run on executor threads
+        _loop.call_soon_threadsafe(_enqueue, (user_id, num_questions))
+
+
+def _on_vocabulary_changed(keys: Optional[Sequence[str]], remote: bool) -> None:
+    user_ids = list(_users) if keys is None else [int(key) for key in keys]
+    for user_id in user_ids:
+        user_pool = _users.get(user_id)
+        if user_pool is None:
+            continue
+        user_pool.epoch += 1
+        for num_questions, batches in list(user_pool.batches.items()):
+            DISCARDED.inc(len(batches))
+            batches.clear()
+            _schedule(user_id, num_questions)
+
+
+vocab_cache.snapshot_cache.add_listener(_on_vocabulary_changed)
+
+
+async def _refill(user_id: int, num_questions: int) -> None:
+    user_pool = _users.get(user_id)
+    batches = user_pool.batches.get(num_questions) if user_pool is not None else None
+    if batches is None:
+        return
+    missing = settings.QUIZ_POOL_DEPTH - len(batches)
+    if missing <= 0:
+        return
+    epoch = user_pool.epoch
+    async with async_session_factory() as db:
+        built = [await build_batch(db, user_id, num_questions) for _ in range(missing)]
+    if _users.get(user_id) is not user_pool or user_pool.epoch != epoch:
+        # Evicted, or the vocabulary changed mid-build (which queued another refill)
+        DISCARDED.inc(len(built))
+        return
+    # Too small a vocabulary for a quiz: leave the pool empty so the request path reports it
+    built = [quiz for quiz in built if quiz["total_vocabulary"] >= 2]
+    batches.extend(built)
+    BUILT.inc(len(built))
+
+
+def _evict_idle() -> None:
+    cutoff = time.monotonic() - settings.QUIZ_POOL_IDLE_SECONDS
+    while _users:
+        user_id, user_pool = next(iter(_users.items()))
+        if user_pool.last_used >= cutoff:
+            break
+        del _users[user_id]
+        EVICTIONS.inc()
+
+
+async def _run() -> None:
+    last_sweep = time.monotonic()
+    while True:
+        try:
+            key = await asyncio.wait_for(_queue.get(), timeout=SWEEP_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            key = None
+        if time.monotonic() - last_sweep >= SWEEP_INTERVAL_SECONDS:
+            _evict_idle()
+            last_sweep = time.monotonic()
+        if key is None:
+            continue
+        _pending.discard(key)
+        try:
+            await _refill(*key)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Quiz pool refill failed for user {key[0]}: {str(e)}")
+
+
+def start() -> None:
+    """Start this worker's refill task (application startup)"""
+    global _queue, _loop, _worker
+    if not settings.QUIZ_POOL_ENABLED or (_worker is not None and not _worker.done()):
+        return
+    _loop = asyncio.get_running_loop()
+    _queue = asyncio.Queue()
+    _pending.clear()
+    _worker = asyncio.create_task(_run())
+
+
+async def stop() -> None:
+    """Stop the refill task and drop every pre-built quiz (application shutdown)"""
+    global _queue, _loop, _worker
+    if _worker is not None:
+        _worker.cancel()
+        try:
+            await _worker
+        except asyncio.CancelledError:
+            pass
+    _worker = _queue = _loop = None
+    _pending.clear()
+    _users.clear()
+
+
+def stats() -> Dict[str, Any]:
+    """Pool sizes and hit rate for the metrics endpoints"""
+    hits, misses = HITS.value, MISSES.value
+    return {
+        "running": _worker is not None and not _worker.done(),
+        "users": len(_users),
+        "ready": sum(len(batches) for user_pool in list(_users.values())
+                     for batches in list(user_pool.batches.values())),
+        "refills_queued": len(_pending),
+        "hits": int(hits),
+        "misses": int(misses),
+        "hit_rate": round(hits / (hits + misses), 4) if hits + misses else None,
+    }
+
+
+def _families():
+    current = stats()
+    return (
+        metrics.Family("quiz_pool_users", "gauge", "Users with a quiz pool on this worker").add({}, current["users"]),
+        metrics.Family("quiz_pool_ready", "gauge", "Pre-built quizzes ready to serve").add({}, current["ready"]),
+        metrics.Family("quiz_pool_refills_queued", "gauge", "Pools waiting for the refill task").add(
+            {}, current["refills_queued"]),
+    )
+
+
+metrics.register_collector(_families)
@@ -0,0 +1,305 @@
+"""
+Request size limits and per-route, per-identity rate limits, applied before routing
+
+RateLimitMiddleware first rejects query strings over REQUEST_MAX_QUERY_BYTES
+(414) and declared bodies over REQUEST_MAX_BODY_BYTES (413), so oversized input
+never reaches validation or a handler. Bodies without a Content-Length (chunked
+uploads) are counted as the app reads them, and reading stops with a 413 once
+they pass the limit.
+
+It then takes a token from the bucket of (route, identity): the route is the
+first RATE_LIMIT_ROUTES template matching the request, else the shared default,
+and the identity is the Firebase uid of a bearer token that token_cache has
+already verified, else the client IP (the socket peer, or the X-Forwarded-For
+address from a trusted proxy; see SERVER_FORWARDED_ALLOW_IPS). Nothing is verified
+here: a token not yet in the cache, valid or made up, costs one cache read and is
+limited by address, and the route authenticates it. An empty bucket answers 429
+with Retry-After.
+
+Buckets live in Redis and are updated by one Lua script per check, so all
+workers share them with no read-modify-write race. While Redis is unavailable
+(or with CACHE_L2_BACKEND=memory) each worker keeps its own buckets, which
+makes the effective limit per worker rather than per deployment.
+"""
+import logging
+import math
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Pattern, Tuple
+
+from starlette.responses import JSONResponse
+
+from app.core import metrics, redis as cache, tiered_cache, token_cache
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+KEY_PREFIX = "ratelimit:"
+DEFAULT_RULE = "default"
+PERIODS = {"second": 1, "minute": 60, "hour": 3600}
+
+# KEYS[1]: bucket hash (tokens, at); ARGV: capacity, refill per second, cost.
+# Redis' clock keeps workers with skewed clocks consistent. Returns
+# {allowed, tokens left, seconds until `cost` tokens are available}
+TOKEN_BUCKET_LUA = """
+if redis.replicate_commands then redis.replicate_commands() end
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'at')
+local tokens = tonumber(bucket[1]) or capacity
+local at = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - at) * rate)
+local allowed = 0
+local retry = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    retry = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'at', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate * 1000) + 1000)
+return {allowed, tostring(tokens), tostring(retry)}
+"""
+
+_script = cache.async_redis_client.register_script(TOKEN_BUCKET_LUA)
+
+CHECKS = metrics.counter("rate_limit_checks_total", "Requests checked against a rate limit",
+                         ("rule", "outcome", "store"))
+OVERSIZED = metrics.counter("http_requests_oversized_total", "Requests rejected before routing for their size",
+                            ("part",))
+
+
+@dataclass(frozen=True)
+class Limit:
+    """Bursts of up to `capacity` requests, refilled at `capacity` per `period` seconds"""
+
+    capacity: int
+    period: float
+
+    @property
+    def rate(self) -> float:
+        return self.capacity / self.period
+
+
+def parse_limit(value: str) -> Optional[Limit]:
+    """
+    Parse "N/second", "N/minute" or "N/hour"
+
+    Args:
+        value: The limit as configured
+
+    Returns:
+        The limit, or None for "" (unlimited)
+    """
+    value = value.strip()
+    if not value:
+        return None
+    count, _, unit = value.partition("/")
+    try:
+        limit = Limit(int(count), PERIODS[unit.strip().lower()])
+    except (KeyError, ValueError):
+        raise ValueError(f"Invalid rate limit {value!r}; expected e.g. 60/minute")
+    if limit.capacity < 1:
+        raise ValueError(f"Invalid rate limit {value!r}; allow at least 1 request")
+    return limit
+
+
+def _compile(route: str) -> Tuple[str, Pattern]:
+    """'GET /vocabulary/{vocab_id}' -> ('GET', pattern matching the request path)"""
+    method, _, template = route.strip().partition(" ")
+    pattern = ""
+    for literal, parameter in re.findall(r"([^{]*)(\{[^}]*\})?", template.strip()):
+        pattern += re.escape(literal)
+        if parameter:
+            pattern += ".*" if parameter.endswith(":path}") else "[^/]+"
+    return method.upper(), re.compile(pattern)
+
+
+def _matches(routes: List[Tuple[str, Pattern, str]], method: str, path: str) -> Optional[str]:
+    for route_method, pattern, name in routes:
+        if route_method == method and pattern.fullmatch(path):
+            return name
+    return None
+
+
+class _BodyTooLarge(Exception):
+    """Raised into the app from receive() once a streamed body passes REQUEST_MAX_BODY_BYTES"""
+
+
+class LocalBuckets:
+    """Token buckets of this worker only, for when Redis is unavailable; least recently used evicted first"""
+
+    def __init__(self, max_buckets: int):
+        self.max_buckets = max_buckets
+        # key -> (tokens, monotonic time of the last update)
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def take(self, key: str, limit: Limit, cost: float = 1.0) -> Tuple[bool, float, float]:
+        now = time.monotonic()
+        tokens, at = self._buckets.pop(key, (limit.capacity, now))
+        tokens = min(limit.capacity, tokens + (now - at) * limit.rate)
+        if tokens >= cost:
+            allowed, tokens, retry = True, tokens - cost, 0.0
+        else:
+            allowed, retry = False, (cost - tokens) / limit.rate
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_buckets:
+            # A forgotten bucket starts full again: eviction only ever errs towards allowing
+            self._buckets.popitem(last=False)
+        return allowed, tokens, retry
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+local_buckets = LocalBuckets(settings.RATE_LIMIT_LOCAL_MAX_BUCKETS)
+
+
+async def take(key: str, limit: Limit) -> Tuple[bool, float, float, str]:
+    """
+    Take one token from a bucket, in Redis when possible
+
+    Args:
+        key: Bucket key
+        limit: The bucket's limit
+
+    Returns:
+        (allowed, tokens left, seconds until a token is available, store used)
+    """
+    if tiered_cache.backend().name == "redis":
+        reply = await cache.call_async(lambda r: _script(keys=[key], args=[limit.capacity, limit.rate, 1], client=r))
+        if reply is not None:
+            allowed, tokens, retry = reply
+            return bool(int(allowed)), float(tokens), float(retry), "redis"
+    return (*local_buckets.take(key, limit), "local")
+
+
+def _header(scope, name: bytes) -> Optional[bytes]:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value
+    return None
+
+
+async def identity(scope) -> str:
+    """'uid:<uid>' for a bearer token with cached claims, else 'ip:<client address>'"""
+    authorization = _header(scope, b"authorization")
+    if authorization and authorization[:7].lower() == b"bearer ":
+        claims = await token_cache.cached_claims(authorization[7:].decode("latin-1").strip())
+        if claims and claims.get("uid"):
+            return f"uid:{claims['uid']}"
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+
+class RateLimitMiddleware:
+    """ASGI middleware enforcing the request size limits and RATE_LIMIT_* settings"""
+
+    def __init__(self, app):
+        self.app = app
+        self.default = parse_limit(settings.RATE_LIMIT_DEFAULT)
+        self.limits: Dict[str, Optional[Limit]] = {
+            route: parse_limit(value) for route, value in settings.RATE_LIMIT_ROUTES.items()}
+        self.routes = [(*_compile(route), route) for route in settings.RATE_LIMIT_ROUTES]
+        self.body_exempt = [(*_compile(route), route) for route in settings.REQUEST_BODY_LIMIT_EXEMPT]
+        self.exempt_paths = tuple(settings.RATE_LIMIT_EXEMPT_PATHS)
+
+    def _body_limited(self, scope) -> bool:
+        return (bool(settings.REQUEST_MAX_BODY_BYTES)
+                and _matches(self.body_exempt, scope["method"], scope["path"]) is None)
+
+    def _too_large(self) -> JSONResponse:
+        OVERSIZED.labels("body").inc()
+        return JSONResponse({"detail": f"Request body over {settings.REQUEST_MAX_BODY_BYTES} bytes"},
+                            status_code=413)
+
+    def _oversized(self, scope, length: Optional[bytes]) -> Optional[JSONResponse]:
+        if settings.REQUEST_MAX_QUERY_BYTES and len(scope["query_string"]) > settings.REQUEST_MAX_QUERY_BYTES:
+            OVERSIZED.labels("query").inc()
+            return JSONResponse({"detail": f"Query string over {settings.REQUEST_MAX_QUERY_BYTES} bytes"},
+                                status_code=414)
+        if (length and length.isdigit() and int(length) > settings.REQUEST_MAX_BODY_BYTES
+                and self._body_limited(scope)):
+            return self._too_large()
+        return None
+
+    async def _call_counting_body(self, scope, receive, send) -> None:
+        # No Content-Length to check up front: count the body as the app reads it
+        received = 0
+        exceeded = False
+        started = False
+
+        async def counting_receive():
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > settings.REQUEST_MAX_BODY_BYTES:
+                    exceeded = True
+                    raise _BodyTooLarge()
+            return message
+
+        async def guarded_send(message):
+            nonlocal started
+            if exceeded:
+                # Whatever the app made of the interrupted body (usually a 400) gives way to the 413
+                return
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        try:
+            await self.app(scope, counting_receive, guarded_send)
+        except Exception:
+            # The app may have wrapped _BodyTooLarge in an error of its own
+            if not exceeded:
+                raise
+        if exceeded and not started:
+            await self._too_large()(scope, receive, send)
+
+    async def _limited(self, scope) -> Optional[JSONResponse]:
+        if scope["path"].startswith(self.exempt_paths):
+            return None
+        rule = _matches(self.routes, scope["method"], scope["path"])
+        limit = self.limits[rule] if rule is not None else self.default
+        if limit is None:
+            return None
+        rule = rule or DEFAULT_RULE
+        allowed, _, retry, store = await take(f"{KEY_PREFIX}{rule}:{await identity(scope)}", limit)
+        CHECKS.labels(rule, "allowed" if allowed else "limited", store).inc()
+        if allowed:
+            return None
+        return JSONResponse({"detail": "Too many requests"}, status_code=429,
+                            headers={"Retry-After": str(max(1, math.ceil(retry)))})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        length = _header(scope, b"content-length")
+        response = self._oversized(scope, length)
+        if response is None and settings.RATE_LIMIT_ENABLED:
+            response = await self._limited(scope)
+        if response is not None:
+            await response(scope, receive, send)
+        elif length is None and self._body_limited(scope):
+            await self._call_counting_body(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
+
+
+def stats() -> Dict[str, Any]:
+    """Rate limiter state for the metrics endpoint"""
+    return {
+        "enabled": settings.RATE_LIMIT_ENABLED,
+        "store": "redis" if tiered_cache.backend().name == "redis" else "local",
+        "redis_breaker": cache.breaker.state,
+        "local_buckets": len(local_buckets),
+    }
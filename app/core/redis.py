@@ -1,74 +1,268 @@
 import redis
+import redis.asyncio as aioredis
+from redis.exceptions import ConnectionError as RedisConnectionError, RedisError, TimeoutError as RedisTimeoutError
+from app.core import metrics
 from app.core.config import get_settings
+import asyncio
 import json
-from typing import Any, Optional, Union
+import logging
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Union
 
+logger = logging.getLogger(__name__)
 settings = get_settings()
 
-# Initialize Redis connection
+_client_options = {
+    "decode_responses": True,  # Automatically decode responses to Python strings
+    "socket_timeout": settings.REDIS_SOCKET_TIMEOUT,
+    "socket_connect_timeout": settings.REDIS_CONNECT_TIMEOUT,
+    "health_check_interval": settings.REDIS_HEALTH_CHECK_INTERVAL,
+}
+if settings.REDIS_PASSWORD:
+    _client_options["password"] = settings.REDIS_PASSWORD
+
+# Initialize Redis connection (blocking; only call it from executor threads or scripts)
 redis_client = redis.from_url(
     settings.REDIS_URL,
-    decode_responses=True  # Automatically decode responses to Python strings
+    max_connections=settings.REDIS_MAX_CONNECTIONS,
+    **_client_options
+)
+
+# Asyncio client for request handlers. The blocking pool makes callers wait up to
+# REDIS_POOL_TIMEOUT for a free connection instead of opening unbounded new ones.
+async_pool = aioredis.BlockingConnectionPool.from_url(
+    settings.REDIS_URL,
+    max_connections=settings.REDIS_MAX_CONNECTIONS,
+    timeout=settings.REDIS_POOL_TIMEOUT,
+    **_client_options
 )
+async_redis_client = aioredis.Redis(connection_pool=async_pool)
+
+# Errors that mean Redis itself is unhealthy (as opposed to e.g. a WRONGTYPE reply)
+UNAVAILABLE_ERRORS = (RedisConnectionError, RedisTimeoutError, OSError, asyncio.TimeoutError)
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker shared by the sync and async clients
+
+    closed: calls go through. After `failure_threshold` consecutive failures the
+    breaker opens and calls are skipped (callers fall back to the database) for
+    `reset_seconds`. Then it is half-open: one probe call is let through, and its
+    outcome closes or re-opens the breaker.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected_total = 0
+        self.opened_total = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            self.rejected_total += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("Redis circuit breaker closed")
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"Redis circuit breaker opened after {self.failures} failures")
+                    self.opened_total += 1
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """Give up a probe slot when the call was abandoned before Redis answered"""
+        with self._lock:
+            self._probing = False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "opened_total": self.opened_total,
+                "rejected_total": self.rejected_total,
+            }
+
+
+breaker = CircuitBreaker(settings.REDIS_BREAKER_FAILURE_THRESHOLD, settings.REDIS_BREAKER_RESET_SECONDS)
+
+_call_seconds = {client: metrics.REDIS_CALL_SECONDS.labels(client) for client in ("sync", "async")}
+_calls = {
+    (client, outcome): metrics.REDIS_CALLS.labels(client, outcome)
+    for client in ("sync", "async")
+    for outcome in ("ok", "error", "unavailable", "skipped")
+}
+
+
+def call(operation: Callable[[redis.Redis], Any], default: Any = None) -> Any:
+    """
+    Run a command on the blocking client behind the circuit breaker, failing open
+
+    Args:
+        operation: Function taking the client (e.g. lambda r: r.get(key))
+        default: Returned when Redis is skipped or fails, or the operation raises
+
+    Returns:
+        The operation's result, or default
+    """
+    if not breaker.allow():
+        _calls["sync", "skipped"].inc()
+        return default
+    try:
+        with _call_seconds["sync"].time():
+            result = operation(redis_client)
+    except UNAVAILABLE_ERRORS as e:
+        breaker.record_failure()
+        _calls["sync", "unavailable"].inc()
+        logger.warning(f"Redis unavailable: {str(e)}")
+        return default
+    except RedisError as e:
+        breaker.record_success()
+        _calls["sync", "error"].inc()
+        logger.warning(f"Redis command failed: {str(e)}")
+        return default
+    except Exception as e:
+        # A bug in the operation says nothing about Redis: free a probe slot it held
+        breaker.release()
+        _calls["sync", "error"].inc()
+        logger.error(f"Redis operation raised {type(e).__name__}: {str(e)}")
+        return default
+    breaker.record_success()
+    _calls["sync", "ok"].inc()
+    return result
+
+
+async def call_async(operation: Callable[[aioredis.Redis], Awaitable[Any]], default: Any = None) -> Any:
+    """
+    Async counterpart of call() on the asyncio client
+
+    Args:
+        operation: Function taking the client and returning an awaitable
+                   (e.g. lambda r: r.get(key), or a pipeline's execute())
+        default: Returned when Redis is skipped or fails, or the operation raises
+
+    Returns:
+        The operation's result, or default
+    """
+    if not breaker.allow():
+        _calls["async", "skipped"].inc()
+        return default
+    try:
+        with _call_seconds["async"].time():
+            result = await operation(async_redis_client)
+    except UNAVAILABLE_ERRORS as e:
+        breaker.record_failure()
+        _calls["async", "unavailable"].inc()
+        logger.warning(f"Redis unavailable: {str(e)}")
+        return default
+    except RedisError as e:
+        breaker.record_success()
+        _calls["async", "error"].inc()
+        logger.warning(f"Redis command failed: {str(e)}")
+        return default
+    except Exception as e:
+        # A bug in the operation says nothing about Redis: free a probe slot it held
+        breaker.release()
+        _calls["async", "error"].inc()
+        logger.error(f"Redis operation raised {type(e).__name__}: {str(e)}")
+        return default
+    except asyncio.CancelledError:
+        # Free the half-open probe slot without judging Redis
+        breaker.release()
+        raise
+    breaker.record_success()
+    _calls["async", "ok"].inc()
+    return result
+
 
 def set_token_cache(user_id: str, token: str, expires_in: int) -> None:
     """
     Store a user's token in Redis cache
-    
+
     Args:
         user_id: The user's unique identifier
         token: The access token to cache
         expires_in: Time in seconds until the token expires
     """
     key = f"user_token:{user_id}"
-    redis_client.setex(key, expires_in, token)
+    call(lambda r: r.setex(key, expires_in, token))
 
 def get_token_cache(user_id: str) -> Optional[str]:
     """
     Retrieve a user's token from Redis cache
-    
+
     Args:
         user_id: The user's unique identifier
-        
+
     Returns:
-        The cached token or None if not found/expired
+        The cached token or None if not found/expired (or Redis is unavailable)
     """
     key = f"user_token:{user_id}"
-    return redis_client.get(key)
+    return call(lambda r: r.get(key))
 
 def delete_token_cache(user_id: str) -> None:
     """
     Delete a user's token from Redis cache (e.g., on logout)
-    
+
     Args:
         user_id: The user's unique identifier
     """
     key = f"user_token:{user_id}"
-    redis_client.delete(key)
+    call(lambda r: r.delete(key))
 
 def set_cache(key: str, data: Any, expires_in: int = 3600) -> None:
     """
     Store any data in Redis cache with expiration
-    
+
     Args:
         key: Cache key
         data: Data to cache (will be JSON serialized)
         expires_in: Time in seconds until the data expires (default: 1 hour)
     """
     serialized_data = json.dumps(data)
-    redis_client.setex(key, expires_in, serialized_data)
+    call(lambda r: r.setex(key, expires_in, serialized_data))
 
 def get_cache(key: str) -> Optional[Any]:
     """
     Retrieve data from Redis cache
-    
+
     Args:
         key: Cache key
-        
+
     Returns:
         The cached data (JSON deserialized) or None if not found/expired
     """
-    data = redis_client.get(key)
+    data = call(lambda r: r.get(key))
     if data:
         return json.loads(data)
     return None
@@ -76,8 +270,93 @@ def get_cache(key: str) -> Optional[Any]:
 def delete_cache(key: str) -> None:
     """
     Delete data from Redis cache
-    
+
     Args:
         key: Cache key
     """
-    redis_client.delete(key)
+    call(lambda r: r.delete(key))
+
+async def get_cache_async(key: str) -> Optional[Any]:
+    """
+    Retrieve data from Redis cache without blocking the event loop
+
+    Args:
+        key: Cache key
+
+    Returns:
+        The cached data (JSON deserialized) or None if not found/expired/unavailable
+    """
+    data = await call_async(lambda r: r.get(key))
+    return json.loads(data) if data else None
+
+async def mget_cache_async(keys: Sequence[str]) -> List[Optional[Any]]:
+    """
+    Retrieve several keys in one round trip
+
+    Args:
+        keys: Cache keys
+
+    Returns:
+        JSON-deserialized values in key order, None for misses (all None if unavailable)
+    """
+    if not keys:
+        return []
+    values = await call_async(lambda r: r.mget(list(keys)), default=[None] * len(keys))
+    return [json.loads(value) if value else None for value in values]
+
+async def set_cache_async(key: str, data: Any, expires_in: int = 3600) -> bool:
+    """
+    Store data in Redis cache with expiration
+
+    Args:
+        key: Cache key
+        data: Data to cache (will be JSON serialized)
+        expires_in: Time in seconds until the data expires (default: 1 hour)
+
+    Returns:
+        True if Redis accepted the write
+    """
+    serialized_data = json.dumps(data)
+    return bool(await call_async(lambda r: r.setex(key, expires_in, serialized_data), default=False))
+
+async def mset_cache_async(items: Dict[str, Any], expires_in: Union[int, Dict[str, int]] = 3600) -> bool:
+    """
+    Store several keys, each with its own expiry, in one pipelined round trip
+
+    Args:
+        items: key -> data (JSON serialized)
+        expires_in: One TTL in seconds for every key, or key -> TTL
+
+    Returns:
+        True if Redis accepted the writes
+    """
+    if not items:
+        return True
+
+    def operation(r: aioredis.Redis):
+        pipe = r.pipeline(transaction=False)
+        for key, data in items.items():
+            ttl = expires_in[key] if isinstance(expires_in, dict) else expires_in
+            pipe.setex(key, ttl, json.dumps(data))
+        return pipe.execute()
+
+    return await call_async(operation) is not None
+
+async def delete_cache_async(*keys: str) -> None:
+    """
+    Delete one or more keys from Redis cache
+
+    Args:
+        keys: Cache keys
+    """
+    if keys:
+        await call_async(lambda r: r.delete(*keys))
+
+async def close() -> None:
+    """Release the asyncio pool's connections (application shutdown)"""
+    await async_redis_client.aclose()
+    await async_pool.disconnect()
+
+def stats() -> Dict[str, Any]:
+    """Circuit breaker state for the metrics endpoint"""
+    return breaker.stats()
@@ -0,0 +1,308 @@
+"""
+In-process vocabulary search, for databases without trigram indexes (SQLite)
+
+Each worker lazily builds, per user, a sorted (word, id) list and a sorted
+(meaning token, id) list for prefix autocomplete, plus a trigram -> terms
+inverted index for typo-tolerant matching with pg_trgm's similarity (shared
+trigrams over the union). The trigram index is the expensive part and is only
+built by the first query that falls through to fuzzy matching. Indexes are kept
+least recently used first, at most SEARCH_INDEX_MAX_USERS of them.
+
+Writes through app.crud update this worker's index in place (add/remove) or
+drop it (forget); invalidation broadcasts from other workers drop it too, and
+the next search rebuilds it from the database.
+"""
+import heapq
+import logging
+import re
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+from app.core import metrics, vocab_cache
+from app.core.config import get_settings
+from app.crud.vocabulary_statements import normalize_key
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Match kinds, best first; a hit's rank is its kind's position
+MATCHES = ("exact", "prefix", "meaning_prefix", "fuzzy", "meaning_fuzzy")
+# Field order of search results
+COLUMNS = vocab_cache.COLUMNS + ("match", "score")
+
+_TOKEN = re.compile(r"\w+")
+
+Loader = Callable[[], Awaitable[Sequence[Sequence]]]
+
+
+def tokens(text: str) -> List[str]:
+    """Lowercase alphanumeric runs of a text"""
+    return _TOKEN.findall(text.lower())
+
+
+def trigrams(text: str) -> Set[str]:
+    """pg_trgm-style trigrams: each token padded with two spaces in front and one behind"""
+    grams = set()
+    for token in tokens(text):
+        padded = f"  {token} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _prefixed(entries: List[Tuple[str, int]], prefix: str) -> Iterator[Tuple[str, int]]:
+    for i in range(bisect_left(entries, (prefix,)), len(entries)):
+        if not entries[i][0].startswith(prefix):
+            return
+        yield entries[i]
+
+
+class UserIndex:
+    """Search structures over one user's vocabulary rows (vocab_cache.COLUMNS order)"""
+
+    __slots__ = ("rows", "words", "meaning_tokens", "word_terms", "meaning_terms", "grams", "gram_counts")
+
+    def __init__(self, rows: Sequence[Sequence] = ()):
+        self.rows: Dict[int, Tuple] = {}
+        # Sorted (normalized word, id) and (meaning token, id) for prefix lookups
+        self.words: List[Tuple[str, int]] = []
+        self.meaning_tokens: List[Tuple[str, int]] = []
+        # Term -> ids carrying it, per field
+        self.word_terms: Dict[str, Set[int]] = {}
+        self.meaning_terms: Dict[str, Set[int]] = {}
+        # Trigram -> terms (of either field) containing it, and each term's trigram count;
+        # None until the first fuzzy query
+        self.grams: Optional[Dict[str, Set[str]]] = None
+        self.gram_counts: Dict[str, int] = {}
+        for row in rows:
+            self._insert(tuple(row))
+        self.words.sort()
+        self.meaning_tokens.sort()
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def _index_grams(self, term: str) -> None:
+        grams = self.grams
+        term_grams = trigrams(term)
+        self.gram_counts[term] = len(term_grams)
+        for gram in term_grams:
+            holders = grams.get(gram)
+            if holders is None:
+                grams[gram] = {term}
+            else:
+                holders.add(term)
+
+    def _add_term(self, terms: Dict[str, Set[int]], term: str, row_id: int) -> None:
+        ids = terms.get(term)
+        if ids is None:
+            terms[term] = {row_id}
+            if self.grams is not None and term not in self.gram_counts:
+                self._index_grams(term)
+        else:
+            ids.add(row_id)
+
+    def _remove_term(self, terms: Dict[str, Set[int]], term: str, row_id: int) -> None:
+        ids = terms.get(term)
+        if ids is None:
+            return
+        ids.discard(row_id)
+        if ids:
+            return
+        del terms[term]
+        if self.grams is None or term in self.word_terms or term in self.meaning_terms:
+            return
+        del self.gram_counts[term]
+        for gram in trigrams(term):
+            holders = self.grams.get(gram)
+            if holders is not None:
+                holders.discard(term)
+                if not holders:
+                    del self.grams[gram]
+
+    def _insert(self, row: Tuple, *, keep_sorted: bool = False) -> None:
+        row_id, word, meaning = row[0], normalize_key(row[1]), row[2]
+        self.rows[row_id] = row
+        add = insort if keep_sorted else list.append
+        add(self.words, (word, row_id))
+        self._add_term(self.word_terms, word, row_id)
+        for token in set(tokens(meaning)):
+            add(self.meaning_tokens, (token, row_id))
+            self._add_term(self.meaning_terms, token, row_id)
+
+    def add(self, row: Sequence) -> None:
+        """Index one new row, keeping the sorted lists sorted"""
+        if row[0] in self.rows:
+            self.remove(row[0])
+        self._insert(tuple(row), keep_sorted=True)
+
+    def remove(self, row_id: int) -> None:
+        """Drop a row from every structure"""
+        row = self.rows.pop(row_id, None)
+        if row is None:
+            return
+        word = normalize_key(row[1])
+        self.words.pop(bisect_left(self.words, (word, row_id)))
+        self._remove_term(self.word_terms, word, row_id)
+        for token in set(tokens(row[2])):
+            self.meaning_tokens.pop(bisect_left(self.meaning_tokens, (token, row_id)))
+            self._remove_term(self.meaning_terms, token, row_id)
+
+    def _similar(self, query: str) -> Dict[str, float]:
+        """Terms at least SEARCH_FUZZY_THRESHOLD similar to the query"""
+        if self.grams is None:
+            self.grams = {}
+            for term in self.word_terms.keys() | self.meaning_terms.keys():
+                self._index_grams(term)
+        query_grams = trigrams(query)
+        shared: Dict[str, int] = {}
+        for gram in query_grams:
+            for term in self.grams.get(gram, ()):
+                shared[term] = shared.get(term, 0) + 1
+        similar = {}
+        for term, count in shared.items():
+            score = count / (len(query_grams) + self.gram_counts[term] - count)
+            if score >= settings.SEARCH_FUZZY_THRESHOLD:
+                similar[term] = score
+        return similar
+
+    def search(self, query: str, limit: int) -> List[Tuple]:
+        """
+        Rank the user's words against a query
+
+        Args:
+            query: Search text; matched against words and meanings as normalize_key keys them
+            limit: Most hits to return
+
+        Returns:
+            Up to `limit` rows in COLUMNS order: exact word matches, then word
+            prefixes, meaning token prefixes, and similar words and meanings
+        """
+        query = normalize_key(query)
+        query_tokens = tokens(query)
+        # id -> (rank, score)
+        hits: Dict[int, Tuple[int, float]] = {}
+
+        def hit(row_id: int, rank: int, score: float) -> None:
+            if row_id not in hits:
+                hits[row_id] = (rank, score)
+
+        for row_id in self.word_terms.get(query, ()):
+            hit(row_id, 0, 1.0)
+        # Every candidate of a kind is scored before any is dropped: the sorted lists are
+        # alphabetical, so stopping at `limit` would keep the first words, not the best.
+        # A later kind only runs while the earlier ones have not filled the limit
+        for word, row_id in _prefixed(self.words, query):
+            hit(row_id, 1, len(query) / len(word))
+        if query_tokens and len(hits) < limit:
+            # Prefix of any token of the meaning; longer queries must also appear verbatim
+            for token, row_id in _prefixed(self.meaning_tokens, query_tokens[0]):
+                if len(query_tokens) == 1 or query in self.rows[row_id][2].lower():
+                    hit(row_id, 2, len(query_tokens[0]) / len(token))
+        if len(query) >= settings.SEARCH_MIN_FUZZY_LENGTH and len(hits) < limit:
+            for term, score in self._similar(query).items():
+                for row_id in self.word_terms.get(term, ()):
+                    hit(row_id, 3, score)
+                for row_id in self.meaning_terms.get(term, ()):
+                    hit(row_id, 4, score)
+                    if hits[row_id][0] == 4 and score > hits[row_id][1]:
+                        hits[row_id] = (4, score)
+
+        ranked = heapq.nsmallest(limit, hits.items(),
+                                 key=lambda item: (item[1][0], -item[1][1], len(self.rows[item[0]][1]), item[0]))
+        return [(*self.rows[row_id], MATCHES[rank], round(score, 3)) for row_id, (rank, score) in ranked]
+
+
+# user_id -> index, least recently used first
+_indexes: "OrderedDict[int, UserIndex]" = OrderedDict()
+# Bumped on every change; an index built across a change is used once but not kept
+_writes = 0
+
+
+def _changed() -> None:
+    global _writes
+    _writes += 1
+
+
+async def search(user_id: int, query: str, limit: int, load: Loader) -> List[Tuple]:
+    """
+    Search a user's vocabulary, building their index first if this worker has none
+
+    Args:
+        user_id: Owner of the vocabulary
+        query: Search text
+        limit: Most hits to return
+        load: Fetches all of the user's rows in vocab_cache.COLUMNS order
+
+    Returns:
+        Ranked rows in COLUMNS order
+    """
+    index = _indexes.get(user_id)
+    if index is None:
+        writes = _writes
+        index = UserIndex(await load())
+        if writes == _writes:
+            _indexes[user_id] = index
+            while len(_indexes) > settings.SEARCH_INDEX_MAX_USERS:
+                _indexes.popitem(last=False)
+    else:
+        _indexes.move_to_end(user_id)
+    return index.search(query, limit)
+
+
+def add(user_id: int, row: Sequence) -> None:
+    """Index a word just written by this worker (no-op if the user has no index here)"""
+    _changed()
+    index = _indexes.get(user_id)
+    if index is not None:
+        index.add(row)
+
+
+def remove(user_id: int, row_id: int) -> None:
+    """Unindex a word just deleted by this worker"""
+    _changed()
+    index = _indexes.get(user_id)
+    if index is not None:
+        index.remove(row_id)
+
+
+def forget(user_id: int) -> None:
+    """Drop a user's index after a change that is not applied in place (bulk imports, sync writes)"""
+    _changed()
+    _indexes.pop(user_id, None)
+
+
+def _on_vocabulary_changed(keys: Optional[Sequence[str]], remote: bool) -> None:
+    # Local writes keep the index current themselves
+    if not remote:
+        return
+    _changed()
+    if keys is None:
+        _indexes.clear()
+        return
+    for key in keys:
+        _indexes.pop(int(key), None)
+
+
+vocab_cache.snapshot_cache.add_listener(_on_vocabulary_changed)
+
+
+def stats() -> Dict[str, Any]:
+    """Index sizes for the metrics endpoints"""
+    return {
+        "users": len(_indexes),
+        "words": sum(len(index) for index in list(_indexes.values())),
+    }
+
+
+def _families():
+    current = stats()
+    return (
+        metrics.Family("search_index_users", "gauge", "Users with a search index on this worker").add(
+            {}, current["users"]),
+        metrics.Family("search_index_words", "gauge", "Words indexed for search on this worker").add(
+            {}, current["words"]),
+    )
+
+
+metrics.register_collector(_families)
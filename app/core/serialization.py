@@ -0,0 +1,71 @@
+import json
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, Optional, Sequence
+
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # optional speed-up; the stdlib encoder produces the same JSON
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(data: Any) -> bytes:
+    """
+    Encode plain Python data (dicts, lists, str/int/float/None, datetimes) to JSON bytes
+
+    Args:
+        data: Data built from trusted internal values; nothing is validated
+
+    Returns:
+        UTF-8 JSON, compact
+    """
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, default=_default, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    """
+    JSON response that encodes its content as-is with orjson (stdlib json as fallback)
+
+    Returning one from a route skips FastAPI's response_model validation and
+    jsonable_encoder pass; keep response_model on the route for the OpenAPI schema.
+    Only use it for data the app built itself.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def rows_to_dicts(rows: Iterable[Sequence], columns: Sequence[str]) -> list:
+    """Plain row tuples (or cached lists) to JSON objects keyed by column name"""
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def rows_response(rows: Iterable[Sequence], columns: Sequence[str]) -> FastJSONResponse:
+    """
+    A JSON array of objects straight from row tuples, without ORM objects or models
+
+    Args:
+        rows: Row tuples in `columns` order
+        columns: Field name for each tuple position
+
+    Returns:
+        The encoded response
+    """
+    return FastJSONResponse(rows_to_dicts(rows, columns))
+
+
+def page_response(rows: Iterable[Sequence], columns: Sequence[str], next_cursor: Optional[str]) -> FastJSONResponse:
+    """Like rows_response, wrapped as {"items": [...], "next_cursor": ...}"""
+    body: Dict[str, Any] = {"items": rows_to_dicts(rows, columns), "next_cursor": next_cursor}
+    return FastJSONResponse(body)
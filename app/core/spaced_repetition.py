@@ -0,0 +1,77 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional
+
+# SM-2 (SuperMemo 2) parameters
+MIN_EASE = 1.3
+DEFAULT_EASE = 2.5
+PASSING_QUALITY = 3  # Answers graded below this reset the word to relearning
+MAX_QUALITY = 5
+FIRST_INTERVAL_DAYS = 1
+SECOND_INTERVAL_DAYS = 6
+
+
+@dataclass
+class ReviewState:
+    """The scheduling fields of one word, as stored in the review table"""
+    repetitions: int = 0
+    interval_days: int = 0
+    ease: float = DEFAULT_EASE
+    lapses: int = 0
+    due_at: Optional[datetime] = None
+    last_reviewed_at: Optional[datetime] = None
+
+
+def next_ease(ease: float, quality: int) -> float:
+    """
+    SM-2 ease factor update
+
+    Args:
+        ease: Current ease factor
+        quality: Answer grade from 0 (blackout) to 5 (perfect recall)
+
+    Returns:
+        The new ease factor, never below MIN_EASE
+    """
+    miss = MAX_QUALITY - quality
+    return max(MIN_EASE, ease + 0.1 - miss * (0.08 + miss * 0.02))
+
+
+def schedule(state: ReviewState, quality: int, now: datetime) -> ReviewState:
+    """
+    Apply one graded answer to a word's review state
+
+    Args:
+        state: The state before the answer
+        quality: Answer grade from 0 (blackout) to 5 (perfect recall)
+        now: When the answer was given
+
+    Returns:
+        The new state; the word is next due interval_days after now
+    """
+    if not 0 <= quality <= MAX_QUALITY:
+        raise ValueError(f"quality must be between 0 and {MAX_QUALITY}, got {quality}")
+
+    lapses = state.lapses
+    if quality >= PASSING_QUALITY:
+        if state.repetitions == 0:
+            interval = FIRST_INTERVAL_DAYS
+        elif state.repetitions == 1:
+            interval = SECOND_INTERVAL_DAYS
+        else:
+            interval = max(1, round(state.interval_days * state.ease))
+        repetitions = state.repetitions + 1
+    else:
+        if state.repetitions > 0:
+            lapses += 1
+        interval = FIRST_INTERVAL_DAYS
+        repetitions = 0
+
+    return ReviewState(
+        repetitions=repetitions,
+        interval_days=interval,
+        ease=next_ease(state.ease, quality),
+        lapses=lapses,
+        due_at=now + timedelta(days=interval),
+        last_reviewed_at=now,
+    )
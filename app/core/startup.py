@@ -0,0 +1,190 @@
+"""
+Application startup and shutdown in phases, and the readiness they drive
+
+Importing the application does no I/O; main's lifespan calls:
+
+- startup(): the phases that must finish before the server accepts connections.
+  "firebase" initializes the Firebase app, "create_all" creates missing tables
+  (only with DB_CREATE_ALL_ON_STARTUP) and "background" starts the cache
+  invalidation listener, the quiz pool and the token verifier's key refresh. It
+  then launches warm-up and returns.
+- warm-up, in the background: opens WARMUP_DB_CONNECTIONS database and
+  WARMUP_REDIS_CONNECTIONS Redis connections and loads the token signing keys
+  (unless the verifier already has them), all concurrently. The worker is ready when warm-up ends. A step that fails or
+  runs past WARMUP_TIMEOUT_SECONDS is logged and reported, but does not hold
+  readiness back: a cold pool makes the first requests slower, not wrong.
+- shutdown(): reports not ready first, so load balancers stop routing here, then
+  stops background work and closes connections. The production server calls
+  begin_drain() earlier, as soon as SIGTERM arrives (see app.server).
+"""
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from sqlalchemy import text
+
+from app.core import executor, firebase, metrics, quiz_pool, redis as cache, tiered_cache, token_verifier
+from app.core.config import get_settings
+from app.db import init_db
+from app.db.session import async_engine
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+STARTING = "starting"
+WARMING = "warming"
+READY = "ready"
+DRAINING = "draining"
+
+state = STARTING
+# Phase or warm-up step -> seconds it took
+_phases: Dict[str, float] = {}
+# Warm-up step -> why it failed
+_failures: Dict[str, str] = {}
+_started = 0.0
+_ready_after: Optional[float] = None
+_warmup: Optional[asyncio.Task] = None
+
+
+@contextmanager
+def _timed(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _phases[name] = time.perf_counter() - started
+
+
+def is_ready() -> bool:
+    return state == READY
+
+
+async def _warm_database() -> None:
+    count = settings.WARMUP_DB_CONNECTIONS
+    size = getattr(async_engine.pool, "size", None)
+    if callable(size):
+        # Connections beyond the pool size would be closed again on release
+        count = min(count, size())
+    # Check out all of them at once, so each is a separate connection
+    opened = await asyncio.gather(*(async_engine.connect().start() for _ in range(count)), return_exceptions=True)
+    connections = [conn for conn in opened if not isinstance(conn, BaseException)]
+    try:
+        await asyncio.gather(*(conn.execute(text("SELECT 1")) for conn in connections))
+    finally:
+        await asyncio.gather(*(conn.close() for conn in connections))
+    errors = [conn for conn in opened if isinstance(conn, BaseException)]
+    if errors:
+        raise errors[0]
+
+
+async def _warm_redis() -> None:
+    if tiered_cache.backend().name != "redis":
+        return
+    # Concurrent commands each take their own connection from the pool
+    replies = await asyncio.gather(*(cache.call_async(lambda r: r.ping(), default=False)
+                                     for _ in range(settings.WARMUP_REDIS_CONNECTIONS)))
+    if not all(replies):
+        raise RuntimeError("Redis did not answer PING")
+
+
+async def _warm_signing_keys() -> None:
+    await token_verifier.verifier().warm_up()
+
+
+async def _step(name: str, warm: Callable[[], Awaitable[None]]) -> None:
+    with _timed(f"warmup_{name}"):
+        try:
+            await warm()
+        except Exception as e:
+            _failures[name] = str(e) or type(e).__name__
+            logger.warning(f"Warm-up step {name} failed: {_failures[name]}")
+
+
+async def _warm_up() -> None:
+    global state, _ready_after
+    steps = {"database": _warm_database, "redis": _warm_redis, "signing_keys": _warm_signing_keys}
+    with _timed("warmup"):
+        try:
+            await asyncio.wait_for(asyncio.gather(*(_step(name, warm) for name, warm in steps.items())),
+                                   settings.WARMUP_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            # Steps still running were cancelled; the ones that finished keep their outcome
+            _failures["timeout"] = f"Gave up after {settings.WARMUP_TIMEOUT_SECONDS}s"
+            logger.warning(f"Warm-up gave up after {settings.WARMUP_TIMEOUT_SECONDS}s")
+    if state == WARMING:
+        state = READY
+        _ready_after = time.perf_counter() - _started
+        logger.info(f"Worker ready {_ready_after * 1000:.0f} ms after startup began")
+
+
+async def startup() -> None:
+    """Run the blocking startup phases, then start warm-up in the background"""
+    global state, _started, _ready_after, _warmup
+    state = STARTING
+    _started = time.perf_counter()
+    _ready_after = None
+    _phases.clear()
+    _failures.clear()
+    with _timed("firebase"):
+        firebase.init_app()
+    if settings.DB_CREATE_ALL_ON_STARTUP:
+        with _timed("create_all"):
+            await executor.run_io(init_db.init_db)
+    with _timed("background"):
+        tiered_cache.start()
+        quiz_pool.start()
+        token_verifier.verifier().start()
+    state = WARMING
+    _warmup = asyncio.create_task(_warm_up())
+
+
+def begin_drain() -> None:
+    """Report not ready from now on, while requests are still being served"""
+    global state
+    state = DRAINING
+
+
+async def shutdown() -> None:
+    """Stop reporting ready, then stop background work and close connections"""
+    global _warmup
+    begin_drain()
+    if _warmup is not None and not _warmup.done():
+        _warmup.cancel()
+        try:
+            await _warmup
+        except asyncio.CancelledError:
+            pass
+    _warmup = None
+    await token_verifier.verifier().stop()
+    await quiz_pool.stop()
+    await tiered_cache.stop()
+    await cache.close()
+    await async_engine.dispose()
+    executor.shutdown()
+
+
+def report() -> Dict[str, Any]:
+    """Readiness and startup timings for the health endpoint"""
+    return {
+        "status": state,
+        "ready_after_ms": round(_ready_after * 1000, 1) if _ready_after is not None else None,
+        "phases_ms": {name: round(seconds * 1000, 1) for name, seconds in _phases.items()},
+        "warmup_failures": dict(_failures),
+    }
+
+
+def _families():
+    phases = metrics.Family("app_startup_phase_seconds", "gauge",
+                            "Time taken by each startup phase and warm-up step")
+    for name, seconds in list(_phases.items()):
+        phases.add({"phase": name}, seconds)
+    return (
+        metrics.Family("app_ready", "gauge", "1 once startup warm-up has finished, 0 while starting or draining").add(
+            {}, 1 if is_ready() else 0),
+        phases,
+    )
+
+
+metrics.register_collector(_families)
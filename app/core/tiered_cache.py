@@ -0,0 +1,582 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Sequence, Set
+
+from app.core import redis as cache
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Rough per-entry cost of the OrderedDict slot, tuple and key object, on top of the payload
+ENTRY_OVERHEAD_BYTES = 160
+
+# Identifies this process on the invalidation channel so it can skip its own messages
+WORKER_ID = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+class LocalCache:
+    """
+    Bounded in-process LRU with per-entry TTL and approximate memory accounting
+
+    Entry sizes are the length of the value's JSON encoding (what L2 stores) plus
+    ENTRY_OVERHEAD_BYTES. Both the entry count and the byte total are capped; the
+    least recently used entries go first. `generation` changes on every discard,
+    so a caller that read L2 before an invalidation can avoid caching what it read.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.bytes = 0
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # key -> (value, expires_at, size); ordered from least to most recently used
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] <= time.time():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key: str, value: Any, size: int, ttl: Optional[float] = None,
+            generation: Optional[int] = None) -> bool:
+        """Store a value; skipped if it alone exceeds the byte budget or `generation` is stale"""
+        size += len(key) + ENTRY_OVERHEAD_BYTES
+        if size > self.max_bytes:
+            return False
+        expires_at = time.time() + min(self.ttl, ttl if ttl is not None else self.ttl)
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return False
+            self._remove(key)
+            self._entries[key] = (value, expires_at, size)
+            self.bytes += size
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+            return True
+
+    def discard(self, *keys: str) -> None:
+        with self._lock:
+            self.generation += 1
+            for key in keys:
+                self._remove(key)
+
+    def discard_where(self, predicate: Callable[[Any], bool]) -> int:
+        """Drop every entry whose value matches; O(n), meant for rare events like revocation"""
+        with self._lock:
+            self.generation += 1
+            doomed = [key for key, entry in self._entries.items() if predicate(entry[0])]
+            for key in doomed:
+                self._remove(key)
+            return len(doomed)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self.bytes = 0
+
+    def _remove(self, key: str) -> None:
+        # Caller must hold _lock
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[2]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+def _queue_bump(pipe, counter_key: str, stale_keys: Sequence[str]):
+    pipe.incr(counter_key)
+    if stale_keys:
+        pipe.delete(*stale_keys)
+    return pipe.execute()
+
+
+# KEYS[1]: index set; ARGV: member, ttl in seconds. Adds the member and only ever
+# extends the set's lifetime, so it outlives every entry it lists. EXPIRE's GT/NX
+# flags would do the same in one call but need Redis 7; TTL answers -1 for a new set
+INDEX_ADD_LUA = """
+redis.call('SADD', KEYS[1], ARGV[1])
+local ttl = tonumber(ARGV[2])
+if redis.call('TTL', KEYS[1]) < ttl then
+    redis.call('EXPIRE', KEYS[1], ttl)
+end
+return 1
+"""
+
+_index_add = cache.async_redis_client.register_script(INDEX_ADD_LUA)
+
+
+class RedisBackend:
+    """L2 on the shared Redis, through the circuit breaker; failures read as misses"""
+
+    name = "redis"
+
+    def get_sync(self, key: str) -> Optional[str]:
+        return cache.call(lambda r: r.get(key))
+
+    def set_sync(self, key: str, payload: str, ttl: int) -> None:
+        cache.call(lambda r: r.setex(key, ttl, payload))
+
+    def delete_sync(self, *keys: str) -> None:
+        if keys:
+            cache.call(lambda r: r.delete(*keys))
+
+    def publish_sync(self, channel: str, message: str) -> None:
+        cache.call(lambda r: r.publish(channel, message))
+
+    async def get(self, key: str) -> Optional[str]:
+        return await cache.call_async(lambda r: r.get(key))
+
+    async def mget(self, keys: Sequence[str]) -> Optional[List[Optional[str]]]:
+        """Values in key order, or None (not a list of misses) when L2 is unavailable"""
+        return await cache.call_async(lambda r: r.mget(list(keys)))
+
+    async def set(self, key: str, payload: str, ttl: int) -> None:
+        await cache.call_async(lambda r: r.setex(key, ttl, payload))
+
+    async def set_many(self, payloads: Dict[str, str], ttl: int) -> None:
+        """Store several keys in one pipelined round trip"""
+        def operation(r):
+            pipe = r.pipeline(transaction=False)
+            for key, payload in payloads.items():
+                pipe.setex(key, ttl, payload)
+            return pipe.execute()
+        if payloads:
+            await cache.call_async(operation)
+
+    async def delete(self, *keys: str) -> None:
+        if keys:
+            await cache.call_async(lambda r: r.delete(*keys))
+
+    async def bump(self, counter_key: str, *stale_keys: str) -> Optional[int]:
+        """Atomically increment a version counter and delete what it versions; None on failure"""
+        result = await cache.call_async(lambda r: _queue_bump(r.pipeline(transaction=True), counter_key, stale_keys))
+        return result[0] if result else None
+
+    def bump_sync(self, counter_key: str, *stale_keys: str) -> Optional[int]:
+        result = cache.call(lambda r: _queue_bump(r.pipeline(transaction=True), counter_key, stale_keys))
+        return result[0] if result else None
+
+    async def index_add(self, key: str, member: str, ttl: int) -> None:
+        await cache.call_async(lambda r: _index_add(keys=[key], args=[member, ttl], client=r))
+
+    async def index_pop(self, key: str) -> Set[str]:
+        def operation(r):
+            pipe = r.pipeline(transaction=True)
+            pipe.smembers(key)
+            pipe.delete(key)
+            return pipe.execute()
+        result = await cache.call_async(operation)
+        return set(result[0]) if result else set()
+
+    async def publish(self, channel: str, message: str) -> None:
+        await cache.call_async(lambda r: r.publish(channel, message))
+
+    async def listen(self, channel: str) -> AsyncIterator[Optional[str]]:
+        """Yield None once subscribed, then each message; raises when the connection drops"""
+        pubsub = cache.async_redis_client.pubsub()
+        try:
+            await pubsub.subscribe(channel)
+            yield None
+            while True:
+                # Explicit timeout: the client's short socket timeout would cut idle reads
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message is not None and message.get("type") == "message":
+                    yield message["data"]
+        finally:
+            await pubsub.aclose()
+
+
+class MemoryBackend:
+    """
+    In-process stand-in for Redis as L2: TTL'd strings, sets and a pub/sub fan-out.
+    For tests, benchmarks and single-worker development (CACHE_L2_BACKEND=memory).
+    """
+
+    name = "memory"
+
+    def __init__(self):
+        # key -> (value, expires_at or None)
+        self._data: Dict[str, tuple] = {}
+        # channel -> (loop, queue) per listener
+        self._subscribers: Dict[str, List[tuple]] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, key: str) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] <= time.time():
+            del self._data[key]
+            return None
+        return entry[0]
+
+    def get_sync(self, key: str) -> Optional[str]:
+        with self._lock:
+            value = self._get(key)
+            return value if isinstance(value, str) else None
+
+    def set_sync(self, key: str, payload: str, ttl: int) -> None:
+        with self._lock:
+            self._data[key] = (payload, time.time() + ttl)
+
+    def delete_sync(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def bump_sync(self, counter_key: str, *stale_keys: str) -> Optional[int]:
+        with self._lock:
+            version = int(self._get(counter_key) or 0) + 1
+            self._data[counter_key] = (str(version), None)
+            for key in stale_keys:
+                self._data.pop(key, None)
+            return version
+
+    def publish_sync(self, channel: str, message: str) -> None:
+        for loop, queue in list(self._subscribers.get(channel, ())):
+            loop.call_soon_threadsafe(queue.put_nowait, message)
+
+    async def get(self, key: str) -> Optional[str]:
+        return self.get_sync(key)
+
+    async def mget(self, keys: Sequence[str]) -> Optional[List[Optional[str]]]:
+        with self._lock:
+            return [self._get(key) for key in keys]
+
+    async def set(self, key: str, payload: str, ttl: int) -> None:
+        self.set_sync(key, payload, ttl)
+
+    async def set_many(self, payloads: Dict[str, str], ttl: int) -> None:
+        with self._lock:
+            expires_at = time.time() + ttl
+            for key, payload in payloads.items():
+                self._data[key] = (payload, expires_at)
+
+    async def delete(self, *keys: str) -> None:
+        self.delete_sync(*keys)
+
+    async def bump(self, counter_key: str, *stale_keys: str) -> Optional[int]:
+        return self.bump_sync(counter_key, *stale_keys)
+
+    async def index_add(self, key: str, member: str, ttl: int) -> None:
+        with self._lock:
+            members = self._get(key)
+            members = members if isinstance(members, set) else set()
+            members.add(member)
+            previous = self._data.get(key)
+            expires_at = time.time() + ttl
+            if previous is not None and previous[1] is not None:
+                expires_at = max(expires_at, previous[1])
+            self._data[key] = (members, expires_at)
+
+    async def index_pop(self, key: str) -> Set[str]:
+        with self._lock:
+            members = self._get(key)
+            self._data.pop(key, None)
+            return members if isinstance(members, set) else set()
+
+    async def publish(self, channel: str, message: str) -> None:
+        self.publish_sync(channel, message)
+
+    async def listen(self, channel: str) -> AsyncIterator[Optional[str]]:
+        # The loop is kept so publishers on other threads can hand messages over safely
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue())
+        self._subscribers.setdefault(channel, []).append(subscriber)
+        try:
+            yield None
+            while True:
+                yield await subscriber[1].get()
+        finally:
+            self._subscribers[channel].remove(subscriber)
+
+
+_backend = None
+# namespace -> cache, for dispatching invalidation messages
+_caches: Dict[str, "TwoTierCache"] = {}
+_listener: Optional[asyncio.Task] = None
+
+
+def backend():
+    """The process-wide L2 backend selected by CACHE_L2_BACKEND"""
+    global _backend
+    if _backend is None:
+        _backend = MemoryBackend() if settings.CACHE_L2_BACKEND == "memory" else RedisBackend()
+    return _backend
+
+
+def set_backend(new_backend) -> None:
+    """Swap the L2 backend (tests); drops every local tier since it may no longer match"""
+    global _backend
+    _backend = new_backend
+    for tiered in _caches.values():
+        tiered.clear_local()
+
+
+class TwoTierCache:
+    """
+    JSON values cached in-process (L1) in front of the shared backend (L2)
+
+    Reads hit L1 first and promote L2 hits into it. Writes go to both tiers.
+    Invalidations drop the key from both tiers here and are broadcast on
+    CACHE_INVALIDATION_CHANNEL so every other worker drops its L1 copy; L1 TTLs
+    bound staleness if a broadcast is missed.
+    """
+
+    def __init__(self, namespace: str, *, max_entries: int, max_bytes: int, local_ttl: float,
+                 shared: bool = True):
+        self.namespace = namespace
+        self.shared = shared
+        self.local = LocalCache(max_entries, max_bytes, local_ttl)
+        self.l2_hits = 0
+        self.l2_misses = 0
+        # Called with the keys dropped from L1 by an invalidation (None: everything)
+        # and whether it came from another worker
+        self._listeners: List[Callable[[Optional[Sequence[str]], bool], None]] = []
+        _caches[namespace] = self
+
+    def add_listener(self, listener: Callable[[Optional[Sequence[str]], bool], None]) -> None:
+        """
+        Get told about invalidations of this namespace, from this worker or any other
+
+        Args:
+            listener: Called with the invalidated keys (None when the whole L1 was
+                      dropped) and True if the invalidation came from another worker
+                      or may have been missed; may run on executor threads for sync
+                      invalidations
+        """
+        self._listeners.append(listener)
+
+    def discard_local(self, *keys: str, remote: bool = False) -> None:
+        """Drop keys from L1 and notify listeners"""
+        self.local.discard(*keys)
+        for listener in self._listeners:
+            listener(keys, remote)
+
+    def clear_local(self) -> None:
+        self.local.clear()
+        for listener in self._listeners:
+            listener(None, True)
+
+    def key(self, key: str) -> str:
+        """L2 key for a cache key"""
+        return f"{self.namespace}:{key}"
+
+    def get_local(self, key: str) -> Optional[Any]:
+        return self.local.get(key)
+
+    def set_local(self, key: str, value: Any, size: Optional[int] = None, ttl: Optional[float] = None,
+                  generation: Optional[int] = None) -> bool:
+        if size is None:
+            size = len(json.dumps(value, default=str))
+        return self.local.set(key, value, size, ttl, generation)
+
+    def _promote(self, key: str, payload: Optional[str], generation: int) -> Optional[Any]:
+        if payload is None:
+            self.l2_misses += 1
+            return None
+        self.l2_hits += 1
+        value = json.loads(payload)
+        self.local.set(key, value, len(payload), generation=generation)
+        return value
+
+    async def get(self, key: str) -> Optional[Any]:
+        value = self.local.get(key)
+        if value is not None:
+            return value
+        return await self.get_shared(key)
+
+    async def get_shared(self, key: str) -> Optional[Any]:
+        """L2 lookup only (the caller already missed L1); hits are promoted into L1"""
+        if not self.shared:
+            return None
+        generation = self.local.generation
+        return self._promote(key, await backend().get(self.key(key)), generation)
+
+    async def get_many(self, keys: Sequence[str]) -> Dict[str, Any]:
+        """
+        Look up several keys: L1 first, then one L2 round trip for the misses
+
+        Args:
+            keys: Cache keys
+
+        Returns:
+            key -> value for every key found in either tier; L2 hits are promoted into L1
+        """
+        found = {}
+        missing = []
+        for key in keys:
+            value = self.local.get(key)
+            if value is None:
+                missing.append(key)
+            else:
+                found[key] = value
+        if missing and self.shared:
+            generation = self.local.generation
+            payloads = await backend().mget([self.key(key) for key in missing])
+            for key, payload in zip(missing, payloads or ()):
+                value = self._promote(key, payload, generation)
+                if value is not None:
+                    found[key] = value
+        return found
+
+    def get_sync(self, key: str) -> Optional[Any]:
+        value = self.local.get(key)
+        if value is not None or not self.shared:
+            return value
+        generation = self.local.generation
+        return self._promote(key, backend().get_sync(self.key(key)), generation)
+
+    async def set(self, key: str, value: Any, ttl: int) -> None:
+        payload = json.dumps(value)
+        self.local.set(key, value, len(payload), ttl)
+        if self.shared:
+            await backend().set(self.key(key), payload, ttl)
+
+    async def set_many(self, values: Dict[str, Any], ttl: int) -> None:
+        """Write several keys to both tiers (one L2 round trip)"""
+        payloads = {}
+        for key, value in values.items():
+            payload = json.dumps(value)
+            self.local.set(key, value, len(payload), ttl)
+            payloads[self.key(key)] = payload
+        if self.shared:
+            await backend().set_many(payloads, ttl)
+
+    def set_sync(self, key: str, value: Any, ttl: int) -> None:
+        payload = json.dumps(value)
+        self.local.set(key, value, len(payload), ttl)
+        if self.shared:
+            backend().set_sync(self.key(key), payload, ttl)
+
+    async def invalidate(self, *keys: str) -> None:
+        """Drop keys from L1 and L2 and tell the other workers to drop their L1 copies"""
+        if not keys:
+            return
+        self.discard_local(*keys)
+        if self.shared:
+            await backend().delete(*[self.key(key) for key in keys])
+        await self.broadcast(*keys)
+
+    def invalidate_sync(self, *keys: str) -> None:
+        if not keys:
+            return
+        self.discard_local(*keys)
+        if self.shared:
+            backend().delete_sync(*[self.key(key) for key in keys])
+        self.broadcast_sync(*keys)
+
+    async def broadcast(self, *keys: str) -> None:
+        """Drop keys from every worker's L1 (this one included) without touching L2"""
+        self.discard_local(*keys)
+        await backend().publish(settings.CACHE_INVALIDATION_CHANNEL, self._message(keys))
+
+    def broadcast_sync(self, *keys: str) -> None:
+        self.discard_local(*keys)
+        backend().publish_sync(settings.CACHE_INVALIDATION_CHANNEL, self._message(keys))
+
+    def _message(self, keys: Iterable[str]) -> str:
+        return json.dumps({"origin": WORKER_ID, "ns": self.namespace, "keys": list(keys)})
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.local.stats(), "l2_hits": self.l2_hits, "l2_misses": self.l2_misses}
+
+
+def _dispatch(message: str) -> None:
+    try:
+        data = json.loads(message)
+    except ValueError:
+        return
+    if data.get("origin") == WORKER_ID:
+        return
+    tiered = _caches.get(data.get("ns"))
+    if tiered is not None:
+        tiered.discard_local(*[str(key) for key in data.get("keys", ())], remote=True)
+
+
+async def _listen() -> None:
+    delay = 0.5
+    resubscribing = False
+    while True:
+        try:
+            async for message in backend().listen(settings.CACHE_INVALIDATION_CHANNEL):
+                if message is None:
+                    if resubscribing:
+                        # Invalidations sent while we were disconnected are lost
+                        for tiered in _caches.values():
+                            tiered.clear_local()
+                        logger.info("Cache invalidation listener resubscribed")
+                    resubscribing = False
+                    delay = 0.5
+                    continue
+                _dispatch(message)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if not resubscribing:
+                logger.warning(f"Cache invalidation listener disconnected: {str(e)}")
+            resubscribing = True
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 30.0)
+
+
+def start() -> None:
+    """Start this worker's invalidation listener (application startup)"""
+    global _listener
+    if _listener is None or _listener.done():
+        _listener = asyncio.create_task(_listen())
+
+
+async def stop() -> None:
+    """Stop the invalidation listener (application shutdown)"""
+    global _listener
+    if _listener is not None:
+        _listener.cancel()
+        try:
+            await _listener
+        except asyncio.CancelledError:
+            pass
+        _listener = None
+
+
+def stats() -> Dict[str, Any]:
+    """Per-namespace tier statistics for the metrics endpoint"""
+    return {
+        "backend": backend().name,
+        "listening": _listener is not None and not _listener.done(),
+        "caches": {namespace: tiered.stats() for namespace, tiered in _caches.items()},
+    }
@@ -0,0 +1,174 @@
+import hashlib
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from app.core import executor, metrics, tiered_cache, token_verifier
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+CLAIMS_NAMESPACE = "token_claims"
+REVOKED_NAMESPACE = "token_revoked"
+UID_INDEX_KEY_PREFIX = "token_claims_uid:"
+# Firebase ID tokens expire an hour after issue, so a revocation outlives every token it covers
+ID_TOKEN_LIFETIME_SECONDS = 3600
+
+# digest -> claims. Other workers only learn about revocations through the
+# invalidation channel, so the local TTL bounds how long a missed message matters
+claims_cache = tiered_cache.TwoTierCache(
+    CLAIMS_NAMESPACE,
+    max_entries=settings.TOKEN_CACHE_MAX_ENTRIES,
+    max_bytes=settings.TOKEN_CACHE_MAX_BYTES,
+    local_ttl=settings.TOKEN_CACHE_LOCAL_TTL_SECONDS,
+    shared=settings.TOKEN_CACHE_USE_REDIS,
+)
+
+# digest -> why the token was rejected. Per worker only: it exists so that a client
+# retrying a bad token (or several dependencies checking it) verifies it once
+invalid_tokens = tiered_cache.LocalCache(
+    settings.TOKEN_CACHE_MAX_ENTRIES, settings.TOKEN_CACHE_MAX_BYTES // 16,
+    settings.TOKEN_CACHE_INVALID_TTL_SECONDS)
+
+# uid -> {"before": unix seconds}: tokens of that user signed in earlier are rejected.
+# Only read when a token is verified, not on claims cache hits
+revocations = tiered_cache.TwoTierCache(
+    REVOKED_NAMESPACE,
+    max_entries=settings.TOKEN_CACHE_MAX_ENTRIES,
+    max_bytes=settings.TOKEN_CACHE_MAX_BYTES // 16,
+    local_ttl=settings.TOKEN_CACHE_LOCAL_TTL_SECONDS,
+    shared=settings.TOKEN_CACHE_USE_REDIS,
+)
+
+_verify_seconds = metrics.FIREBASE_CALL_SECONDS.labels("verify_id_token")
+
+
+def token_digest(token: str) -> str:
+    """
+    Digest used as the cache key so raw tokens never sit in memory or Redis
+
+    Args:
+        token: The encoded Firebase ID token
+
+    Returns:
+        Hex encoded SHA-256 of the token
+    """
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def _ttl(claims: Dict[str, Any]) -> int:
+    return int(float(claims.get("exp", 0)) - time.time())
+
+
+def _unexpired(digest: str, claims: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    # A tier may hold claims past the token's own expiry (L1 TTLs are not aligned to exp)
+    if claims is None:
+        return None
+    if _ttl(claims) < 0:
+        claims_cache.local.discard(digest)
+        return None
+    return claims
+
+
+async def _check_revoked(claims: Dict[str, Any]) -> None:
+    uid = claims.get("uid")
+    revoked = await revocations.get(uid) if uid else None
+    if revoked is None:
+        return
+    # auth_time is the sign-in time, carried over by tokens refreshed from that sign-in
+    signed_in = float(claims.get("auth_time", claims.get("iat", 0)))
+    if signed_in < revoked["before"]:
+        raise token_verifier.TokenVerificationError("Token has been revoked")
+
+
+async def verify_id_token_async(token: str) -> Dict[str, Any]:
+    """
+    Verify a Firebase ID token, paying for the signature check once per token lifetime
+
+    In-process hits return inline without a network hop, the shared tier is read
+    through the asyncio client, and the signature check runs inline, or on the I/O
+    executor lane for a verifier that may block (firebase_admin). Tokens from a
+    sign-in older than the user's last revocation are rejected before caching, and
+    rejections are remembered for TOKEN_CACHE_INVALID_TTL_SECONDS
+
+    Args:
+        token: The encoded Firebase ID token
+
+    Returns:
+        The decoded token claims
+
+    Raises:
+        TokenVerificationError (or firebase_admin's errors with that backend) for invalid
+        or revoked tokens
+    """
+    digest = token_digest(token)
+    claims = _unexpired(digest, await claims_cache.get(digest))
+    if claims is not None:
+        return claims
+    rejected = invalid_tokens.get(digest) if settings.TOKEN_CACHE_INVALID_TTL_SECONDS > 0 else None
+    if rejected is not None:
+        raise token_verifier.TokenVerificationError(rejected)
+
+    current = token_verifier.verifier()
+    try:
+        with _verify_seconds.time():
+            claims = await executor.run_io(current.verify, token) if current.blocking else current.verify(token)
+        await _check_revoked(claims)
+    except current.invalid_errors as e:
+        if settings.TOKEN_CACHE_INVALID_TTL_SECONDS > 0:
+            invalid_tokens.set(digest, str(e), len(str(e)))
+        raise
+    ttl = _ttl(claims)
+    if ttl > 0:
+        await claims_cache.set(digest, claims, ttl)
+        uid = claims.get("uid")
+        if uid and claims_cache.shared:
+            # Lets a revocation find every cached token of the user
+            await tiered_cache.backend().index_add(UID_INDEX_KEY_PREFIX + uid, digest, ttl)
+    return claims
+
+
+async def cached_claims(token: str) -> Optional[Dict[str, Any]]:
+    """
+    Claims of a token that has already been verified (on any worker), without verifying it
+
+    A cache read only, for callers that must stay cheap under a flood of made-up
+    tokens (the rate limiter); revocations are still applied by evicting claims
+
+    Args:
+        token: The encoded Firebase ID token
+
+    Returns:
+        The cached claims, or None if the token has not been verified or has expired
+    """
+    digest = token_digest(token)
+    return _unexpired(digest, await claims_cache.get(digest))
+
+
+async def revoke_uid_async(uid: str) -> None:
+    """
+    Reject every token the user holds now (e.g., on logout), on every worker
+
+    Records the revocation time, which verification checks against the token's
+    sign-in time until any token issued before it has expired, and evicts the
+    user's cached claims so cache hits cannot skip that check
+
+    Args:
+        uid: The Firebase uid whose tokens were revoked
+    """
+    # Whole seconds like auth_time; a sign-in within the same second still passes
+    await revocations.broadcast(uid)
+    await revocations.set(uid, {"before": int(time.time())},
+                          ID_TOKEN_LIFETIME_SECONDS + settings.TOKEN_CLOCK_SKEW_SECONDS)
+    claims_cache.local.discard_where(lambda claims: claims.get("uid") == uid)
+    if claims_cache.shared:
+        digests = await tiered_cache.backend().index_pop(UID_INDEX_KEY_PREFIX + uid)
+        await claims_cache.invalidate(*digests)
+
+
+def clear() -> None:
+    """Drop every entry from the in-process tier"""
+    claims_cache.local.clear()
+    invalid_tokens.clear()
+    revocations.local.clear()
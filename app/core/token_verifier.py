@@ -0,0 +1,476 @@
+"""
+Pluggable ID token verification, selected by TOKEN_VERIFIER
+
+- "firebase" (GoogleKeySetVerifier): checks the RS256 signature and the Firebase
+  claims in-process against Google's published signing certificates. A
+  background task refreshes the certificates before their Cache-Control expiry
+  and writes them to TOKEN_KEYSET_PATH. Startup warm-up always fetches; the
+  persisted set is only used, while unexpired, if that fetch fails. A token
+  signed by an unknown key is rejected and only schedules a refresh (rate
+  limited): no request ever waits on the network.
+- "firebase_admin" (FirebaseAdminVerifier): firebase_admin.auth.verify_id_token,
+  which fetches certificates itself when its cache is cold; blocking.
+- "local_issuer" (LocalIssuer): verifies, and can issue, tokens signed with this
+  service's own RSA test key, so load tests and benchmarks need no network.
+
+Run `python -m app.core.token_verifier issue <uid>` to print a local issuer token.
+"""
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+from cryptography import x509
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwt
+from jose.exceptions import ExpiredSignatureError, JWTClaimsError, JWTError
+
+from app.core import executor, firebase, metrics
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+ALGORITHM = "RS256"
+ISSUER_PREFIX = "https://securetoken.google.com/"
+# Audience of local issuer tokens when PROJECT_ID is unset
+LOCAL_PROJECT = "toeic-local"
+# Refresh this long before the published keys expire
+KEYSET_EXPIRY_MARGIN_SECONDS = 300
+KEYSET_FETCH_TIMEOUT_SECONDS = 10.0
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+class TokenVerificationError(ValueError):
+    """The token is malformed, expired, for another project or not signed by a known key"""
+
+
+class Verifier:
+    """Interface of the verification backends"""
+
+    name = ""
+    # True if verify() may block on I/O and must run on an executor lane
+    blocking = False
+    # Errors meaning the token itself is bad (not that verification could not be done)
+    invalid_errors: Tuple[type, ...] = (TokenVerificationError,)
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        """
+        Verify an ID token
+
+        Args:
+            token: The encoded ID token
+
+        Returns:
+            The decoded claims, with "uid" set to the subject
+
+        Raises:
+            TokenVerificationError: (or the SDK's own errors for firebase_admin) if invalid
+        """
+        raise NotImplementedError
+
+    def start(self) -> None:
+        """Start background work (application startup)"""
+
+    async def stop(self) -> None:
+        """Stop background work (application shutdown)"""
+
+    async def warm_up(self) -> None:
+        """Make sure the first verification needs no network (startup warm-up)"""
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name}
+
+
+class FirebaseAdminVerifier(Verifier):
+    name = "firebase_admin"
+    blocking = True
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        from firebase_admin import auth
+        return auth.verify_id_token(token)
+
+    @property
+    def invalid_errors(self) -> Tuple[type, ...]:
+        from firebase_admin import auth
+        # ValueError: malformed tokens, which the SDK rejects before any key lookup
+        return auth.InvalidIdTokenError, ValueError
+
+    async def warm_up(self) -> None:
+        await executor.run_io(firebase.prefetch_public_keys)
+
+
+class KeySetVerifier(Verifier):
+    """RS256 verification of Firebase-shaped ID tokens against an in-memory key set"""
+
+    def __init__(self, audience: str, issuer: str):
+        self.audience = audience
+        self.issuer = issuer
+        # kid -> public key; replaced as a whole, never mutated
+        self.keys: Dict[str, rsa.RSAPublicKey] = {}
+        self.unknown_key_total = 0
+
+    def _on_unknown_key(self, kid: Optional[str]) -> None:
+        pass
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        try:
+            header = jwt.get_unverified_header(token)
+        except JWTError:
+            raise TokenVerificationError("Malformed token")
+        if header.get("alg") != ALGORITHM:
+            raise TokenVerificationError(f"Unexpected algorithm {header.get('alg')!r}")
+        kid = header.get("kid")
+        key = self.keys.get(kid)
+        if key is None:
+            self.unknown_key_total += 1
+            self._on_unknown_key(kid)
+            raise TokenVerificationError("Token signed by an unknown key")
+        skew = settings.TOKEN_CLOCK_SKEW_SECONDS
+        try:
+            claims = jwt.decode(token, key, algorithms=[ALGORITHM], audience=self.audience, issuer=self.issuer,
+                                options={"leeway": skew, "require_exp": True, "require_iat": True,
+                                         "require_sub": True})
+        except ExpiredSignatureError:
+            raise TokenVerificationError("Token expired")
+        except JWTClaimsError as e:
+            # Wrong audience or issuer, or a malformed registered claim
+            raise TokenVerificationError(str(e))
+        except JWTError as e:
+            raise TokenVerificationError(f"Invalid token: {str(e)}")
+        now = time.time()
+        subject = claims["sub"]
+        if not isinstance(subject, str) or not subject or len(subject) > 128:
+            raise TokenVerificationError("Invalid subject")
+        if claims["iat"] > now + skew or claims.get("auth_time", 0) > now + skew:
+            raise TokenVerificationError("Token issued in the future")
+        claims["uid"] = subject
+        return claims
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "keys": len(self.keys), "unknown_key_total": self.unknown_key_total}
+
+
+def _max_age(cache_control: Optional[str]) -> int:
+    match = _MAX_AGE.search(cache_control or "")
+    return int(match.group(1)) if match else settings.TOKEN_KEYSET_REFRESH_SECONDS
+
+
+def _public_keys(certificates: Dict[str, str]) -> Dict[str, rsa.RSAPublicKey]:
+    keys = {}
+    for kid, pem in certificates.items():
+        key = x509.load_pem_x509_certificate(pem.encode("utf-8")).public_key()
+        if isinstance(key, rsa.RSAPublicKey):
+            keys[kid] = key
+    return keys
+
+
+def _private_directory(path: str) -> None:
+    """Create the directory holding `path` readable by this user only, if it is missing"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), mode=0o700, exist_ok=True)
+
+
+def _check_private(f, path: str) -> None:
+    """
+    Refuse key material another local user could have written
+
+    Args:
+        f: The open file (checked through its descriptor, so it can't be swapped after the check)
+        path: Its path, for the error message
+
+    Raises:
+        PermissionError: if the file is not owned by this user or is group or world writable
+    """
+    if not hasattr(os, "getuid"):
+        return
+    status = os.fstat(f.fileno())
+    if status.st_uid != os.getuid() or status.st_mode & 0o022:
+        raise PermissionError(f"{path} must be owned by uid {os.getuid()} and writable by it alone")
+
+
+class GoogleKeySetVerifier(KeySetVerifier):
+    name = "firebase"
+
+    def __init__(self):
+        project = settings.PROJECT_ID or ""
+        super().__init__(project, ISSUER_PREFIX + project)
+        # Wall clock times of the current key set
+        self.fetched_at = 0.0
+        self.expires_at = 0.0
+        self.refreshes_total = 0
+        self.refresh_failures_total = 0
+        self._last_attempt = float("-inf")
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wanted: Optional[asyncio.Event] = None
+        self._lock: Optional[asyncio.Lock] = None
+        # (certificates, fetched_at, expires_at) from TOKEN_KEYSET_PATH, for when fetching fails
+        self._persisted = self._load()
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        if not self.audience:
+            raise TokenVerificationError("PROJECT_ID is not configured")
+        return super().verify(token)
+
+    def _install(self, certificates: Dict[str, str], fetched_at: float, expires_at: float) -> None:
+        self.keys = _public_keys(certificates)
+        self.fetched_at = fetched_at
+        self.expires_at = expires_at
+
+    def _load(self) -> Optional[Tuple[Dict[str, str], float, float]]:
+        path = settings.TOKEN_KEYSET_PATH
+        try:
+            with open(path) as f:
+                _check_private(f, path)
+                saved = json.load(f)
+            persisted = (saved["certificates"], saved["fetched_at"], saved["expires_at"])
+            _public_keys(persisted[0])
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring key set {path}: {str(e)}")
+            return None
+        return persisted
+
+    def _fall_back(self) -> None:
+        """After a failed fetch with no keys loaded, use the persisted set if it has not expired"""
+        if self.keys or self._persisted is None:
+            return
+        certificates, fetched_at, expires_at = self._persisted
+        self._persisted = None
+        if expires_at <= time.time():
+            logger.warning("Persisted token signing keys have expired; not using them")
+            return
+        self._install(certificates, fetched_at, expires_at)
+        logger.warning(f"Using {len(self.keys)} persisted token signing keys until a refresh succeeds")
+
+    def _persist(self, certificates: Dict[str, str]) -> None:
+        path = settings.TOKEN_KEYSET_PATH
+        temporary = f"{path}.{os.getpid()}.tmp"
+        try:
+            _private_directory(path)
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(temporary)
+            with open(os.open(temporary, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), "w") as f:
+                json.dump({"fetched_at": self.fetched_at, "expires_at": self.expires_at,
+                           "certificates": certificates}, f)
+            os.replace(temporary, path)
+        except OSError as e:
+            logger.warning(f"Could not persist token signing keys to {path}: {str(e)}")
+
+    async def refresh(self) -> None:
+        """Fetch the published certificates, install them and persist them"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        requested = time.time()
+        async with self._lock:
+            if self.fetched_at >= requested:
+                # Another caller refreshed while this one waited
+                return
+            self._last_attempt = time.monotonic()
+            try:
+                async with httpx.AsyncClient(timeout=KEYSET_FETCH_TIMEOUT_SECONDS) as client:
+                    response = await client.get(settings.TOKEN_KEYSET_URL)
+                    response.raise_for_status()
+                certificates = response.json()
+                now = time.time()
+                self._install(certificates, now, now + _max_age(response.headers.get("cache-control")))
+            except Exception:
+                self.refresh_failures_total += 1
+                raise
+            self.refreshes_total += 1
+            await executor.run_io(self._persist, certificates)
+            logger.info(f"Refreshed {len(self.keys)} token signing keys")
+
+    def _next_refresh_in(self) -> float:
+        if not self.keys:
+            return 0.0
+        return max(0.0, min(settings.TOKEN_KEYSET_REFRESH_SECONDS,
+                            self.expires_at - time.time() - KEYSET_EXPIRY_MARGIN_SECONDS))
+
+    def _on_unknown_key(self, kid: Optional[str]) -> None:
+        # Keys may have rotated; refresh in the background, never on this request
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wanted.set)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wanted.wait(), self._next_refresh_in())
+            except asyncio.TimeoutError:
+                pass
+            self._wanted.clear()
+            # At most one attempt per retry interval, however many unknown keys arrive
+            wait = self._last_attempt + settings.TOKEN_KEYSET_RETRY_SECONDS - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning(f"Refreshing token signing keys failed: {str(e)}")
+                self._fall_back()
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._loop = asyncio.get_running_loop()
+            self._wanted = asyncio.Event()
+            self._lock = asyncio.Lock()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._loop = None
+
+    async def warm_up(self) -> None:
+        try:
+            await self.refresh()
+        except Exception:
+            self._fall_back()
+            raise
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **super().stats(),
+            "keys_age_seconds": round(time.time() - self.fetched_at, 1) if self.fetched_at else None,
+            "keys_expire_in_seconds": round(self.expires_at - time.time(), 1) if self.expires_at else None,
+            "refreshes_total": self.refreshes_total,
+            "refresh_failures_total": self.refresh_failures_total,
+        }
+
+
+def _load_or_create_key(path: str) -> rsa.RSAPrivateKey:
+    """The issuer's private key, generated on first use and shared through `path`"""
+    try:
+        return _read_private_key(path)
+    except FileNotFoundError:
+        pass
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                            serialization.NoEncryption())
+    _private_directory(path)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with contextlib.suppress(FileNotFoundError):
+        os.unlink(temporary)
+    with open(os.open(temporary, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), "wb") as f:
+        f.write(pem)
+    try:
+        # Atomic and fails if another worker got there first; then use its key
+        os.link(temporary, path)
+    except FileExistsError:
+        key = _read_private_key(path)
+    finally:
+        os.unlink(temporary)
+    return key
+
+
+def _read_private_key(path: str) -> rsa.RSAPrivateKey:
+    with open(path, "rb") as f:
+        _check_private(f, path)
+        return serialization.load_pem_private_key(f.read(), password=None)
+
+
+class LocalIssuer(KeySetVerifier):
+    """Issues and verifies tokens shaped like Firebase ID tokens, signed with a local test key"""
+
+    name = "local_issuer"
+
+    def __init__(self):
+        project = settings.PROJECT_ID or LOCAL_PROJECT
+        super().__init__(project, ISSUER_PREFIX + project)
+        self._private_key = _load_or_create_key(settings.TOKEN_ISSUER_KEY_PATH)
+        public_key = self._private_key.public_key()
+        der = public_key.public_bytes(serialization.Encoding.DER, serialization.PublicFormat.SubjectPublicKeyInfo)
+        self.kid = hashlib.sha256(der).hexdigest()[:16]
+        self.keys = {self.kid: public_key}
+
+    def issue(self, uid: str, email: Optional[str] = None, ttl: int = 3600, **claims: Any) -> str:
+        """
+        Sign an ID token for a user
+
+        Args:
+            uid: Subject (Firebase uid)
+            email: Optional email claim
+            ttl: Seconds until the token expires
+            **claims: Extra claims
+
+        Returns:
+            The encoded token
+        """
+        now = int(time.time())
+        payload = {"iss": self.issuer, "aud": self.audience, "auth_time": now, "user_id": uid, "sub": uid,
+                   "iat": now, "exp": now + ttl, "firebase": {"identities": {}, "sign_in_provider": "custom"}}
+        if email is not None:
+            payload.update(email=email, email_verified=True)
+        payload.update(claims)
+        return jwt.encode(payload, self._private_key, algorithm=ALGORITHM, headers={"kid": self.kid})
+
+
+BACKENDS = {
+    GoogleKeySetVerifier.name: GoogleKeySetVerifier,
+    FirebaseAdminVerifier.name: FirebaseAdminVerifier,
+    LocalIssuer.name: LocalIssuer,
+}
+
+_verifier: Optional[Verifier] = None
+
+
+def verifier() -> Verifier:
+    """The process-wide verifier selected by TOKEN_VERIFIER"""
+    global _verifier
+    if _verifier is None:
+        backend = BACKENDS.get(settings.TOKEN_VERIFIER)
+        if backend is None:
+            raise ValueError(f"Unknown TOKEN_VERIFIER {settings.TOKEN_VERIFIER!r}; "
+                             f"expected one of {', '.join(BACKENDS)}")
+        _verifier = backend()
+    return _verifier
+
+
+def stats() -> Dict[str, Any]:
+    return verifier().stats()
+
+
+def _families():
+    if _verifier is None:
+        return ()
+    current = _verifier.stats()
+    families = [metrics.Family("token_verifier_keys", "gauge", "Signing keys the token verifier trusts").add(
+        {"backend": current["backend"]}, current.get("keys", 0))]
+    if "refreshes_total" in current:
+        families.append(metrics.Family("token_keyset_refreshes_total", "counter", "Signing key set refreshes").add(
+            {"outcome": "ok"}, current["refreshes_total"]).add({"outcome": "error"}, current["refresh_failures_total"]))
+        if current["keys_age_seconds"] is not None:
+            families.append(metrics.Family("token_keyset_age_seconds", "gauge",
+                                           "Seconds since the signing keys were fetched").add(
+                {}, current["keys_age_seconds"]))
+    return families
+
+
+metrics.register_collector(_families)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m app.core.token_verifier",
+                                     description="Print an ID token signed by the local issuer")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    issue = subcommands.add_parser("issue", help="Sign a token for a uid")
+    issue.add_argument("uid")
+    issue.add_argument("--email")
+    issue.add_argument("--ttl", type=int, default=3600, help="Seconds until expiry (default: 3600)")
+    args = parser.parse_args()
+    print(LocalIssuer().issue(args.uid, email=args.email, ttl=args.ttl))
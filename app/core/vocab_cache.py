@@ -0,0 +1,171 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.core import dictionary_cache, tiered_cache
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+VERSION_KEY_PREFIX = "vocab_version:"
+SNAPSHOT_NAMESPACE = "vocab_snapshot"
+
+# Rows served to callers are compact lists in this column order
+COLUMNS = ("id", "word", "meaning", "example", "created_at")
+# Stored snapshots only reference the shared dictionary entries: the user's word id,
+# the entry id, the user's own example (None: the entry's) and the creation time
+SNAPSHOT_COLUMNS = ("id", "entry_id", "example", "created_at")
+
+Loader = Callable[[Any], Awaitable[List[list]]]
+
+# user_id -> background refresh task, so a hot user triggers at most one reload per worker
+_refreshing: Dict[int, asyncio.Task] = {}
+
+# str(user_id) -> snapshot. Local copies are only dropped by invalidation broadcasts
+# (or their short TTL), so hot users are served without touching Redis at all
+snapshot_cache = tiered_cache.TwoTierCache(
+    SNAPSHOT_NAMESPACE,
+    max_entries=settings.VOCAB_CACHE_LOCAL_MAX_ENTRIES,
+    max_bytes=settings.VOCAB_CACHE_LOCAL_MAX_BYTES,
+    local_ttl=settings.VOCAB_CACHE_LOCAL_TTL_SECONDS,
+)
+
+
+def _version_key(user_id: int) -> str:
+    return f"{VERSION_KEY_PREFIX}{user_id}"
+
+
+def _snapshot_key(user_id: int) -> str:
+    return snapshot_cache.key(str(user_id))
+
+
+async def _read(user_id: int):
+    values = await tiered_cache.backend().mget([_version_key(user_id), _snapshot_key(user_id)])
+    if values is None:
+        # Redis unavailable (or the circuit breaker is open)
+        return None
+    version, payload = values
+    return int(version or 0), (json.loads(payload) if payload else None), len(payload or "")
+
+
+async def _load_and_store(user_id: int, version: int, db, load: Loader, generation: int) -> Dict[str, Any]:
+    rows = await load(db)
+    if len(rows) > settings.VOCAB_CACHE_MAX_ITEMS:
+        rows = None
+    snapshot = {
+        "v": version,
+        "fresh_until": time.time() + settings.VOCAB_CACHE_FRESH_SECONDS,
+        # None marks a vocabulary too large to snapshot; callers go to the database
+        "rows": rows,
+    }
+    payload = json.dumps(snapshot)
+    await tiered_cache.backend().set(_snapshot_key(user_id), payload, settings.VOCAB_CACHE_TTL_SECONDS)
+    # Skipped if an invalidation arrived while loading; the stale L2 copy is never served
+    # because its version no longer matches
+    snapshot_cache.set_local(str(user_id), snapshot, len(payload), generation=generation)
+    return snapshot
+
+
+async def _resolve(rows: List[list], load_entries: dictionary_cache.Loader) -> List[list]:
+    entries = await dictionary_cache.get_entries((row[1] for row in rows), load_entries)
+    resolved = []
+    for row_id, entry_id, example, created_at in rows:
+        entry = entries.get(entry_id)
+        if entry is not None:
+            resolved.append([row_id, entry[0], entry[1], entry[2] if example is None else example, created_at])
+    return resolved
+
+
+async def _refresh(user_id: int, version: int, load: Loader) -> None:
+    # Imported here: the session module pulls in the database engines
+    from app.db.session import async_session_factory
+    generation = snapshot_cache.local.generation
+    try:
+        async with async_session_factory() as db:
+            await _load_and_store(user_id, version, db, load, generation)
+    except Exception as e:
+        logger.warning(f"Vocabulary cache refresh failed for user {user_id}: {str(e)}")
+    finally:
+        _refreshing.pop(user_id, None)
+
+
+async def get_rows(user_id: int, db, load: Loader, load_entries: dictionary_cache.Loader) -> Optional[List[list]]:
+    """
+    Serve a user's vocabulary snapshot, loading it on a miss
+
+    A snapshot already held in this worker's L1 is served without a network hop;
+    writes on any worker drop it through the invalidation broadcast.
+
+    The version is read before the database is queried, so a snapshot built from
+    rows that a concurrent write has already changed is stored under the old
+    version and never served. Snapshots past their freshness window are still
+    served while one background task reloads them (stale-while-revalidate).
+
+    Snapshots hold entry ids; the words are filled in from the shared dictionary
+    cache once per snapshot and worker, so every user's rows in L1 share the
+    strings of a hot entry.
+
+    Args:
+        user_id: Owner of the vocabulary
+        db: Session used for a synchronous load on a miss
+        load: Coroutine function taking a session and returning snapshot rows
+              (at most VOCAB_CACHE_MAX_ITEMS + 1 of them, in SNAPSHOT_COLUMNS order)
+        load_entries: Fetches dictionary entries missing from the dictionary cache
+
+    Returns:
+        Rows in COLUMNS order, or None when the cache cannot serve this user (disabled,
+        unreachable, or vocabulary too large) and callers should query the database
+    """
+    if not settings.VOCAB_CACHE_ENABLED:
+        return None
+    snapshot = snapshot_cache.get_local(str(user_id))
+    if snapshot is None:
+        generation = snapshot_cache.local.generation
+        state = await _read(user_id)
+        if state is None:
+            return None
+        version, snapshot, size = state
+        if snapshot is None or snapshot.get("v") != version:
+            snapshot = await _load_and_store(user_id, version, db, load, generation)
+        else:
+            snapshot_cache.set_local(str(user_id), snapshot, size, generation=generation)
+
+    if snapshot["fresh_until"] < time.time() and user_id not in _refreshing:
+        _refreshing[user_id] = asyncio.create_task(_refresh(user_id, snapshot["v"], load))
+    if snapshot["rows"] is None:
+        return None
+    rows = snapshot.get("resolved")
+    if rows is None:
+        # Kept on the L1 copy only; L2 stores the compact form
+        rows = snapshot["resolved"] = await _resolve(snapshot["rows"], load_entries)
+    return rows
+
+
+async def invalidate(user_id: int) -> None:
+    """
+    Bump a user's vocabulary version after a write (atomic INCR + DEL) and drop
+    the snapshot from every worker's L1; snapshot_cache listeners hear about it
+
+    Args:
+        user_id: Owner of the vocabulary that changed
+    """
+    if settings.VOCAB_CACHE_ENABLED and \
+            await tiered_cache.backend().bump(_version_key(user_id), _snapshot_key(user_id)) is None:
+        logger.warning(f"Vocabulary cache invalidation failed for user {user_id}")
+    # Broadcast even with the cache disabled: snapshot_cache listeners (e.g. the quiz pool) rely on it
+    await snapshot_cache.broadcast(str(user_id))
+
+
+def invalidate_sync(user_id: int) -> None:
+    """Blocking variant of invalidate for the sync CRUD path"""
+    if settings.VOCAB_CACHE_ENABLED and \
+            tiered_cache.backend().bump_sync(_version_key(user_id), _snapshot_key(user_id)) is None:
+        logger.warning(f"Vocabulary cache invalidation failed for user {user_id}")
+    snapshot_cache.broadcast_sync(str(user_id))
+
+
+def row_to_dict(row: list) -> Dict[str, Any]:
+    return dict(zip(COLUMNS, row))
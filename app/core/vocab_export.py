@@ -0,0 +1,64 @@
+import csv
+import io
+import json
+from datetime import datetime
+from typing import AsyncIterator, Iterable, Sequence
+
+FORMAT_NDJSON = "ndjson"
+FORMAT_CSV = "csv"
+
+MEDIA_TYPES = {
+    FORMAT_NDJSON: "application/x-ndjson",
+    FORMAT_CSV: "text/csv; charset=utf-8",
+}
+
+COLUMNS = ("id", "word", "meaning", "example", "created_at")
+
+# Rows are buffered into chunks of roughly this size before being written to the socket
+CHUNK_BYTES = 64 * 1024
+
+
+def _cell(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def encode_ndjson(rows: Iterable[Sequence]) -> str:
+    return "".join(
+        json.dumps(dict(zip(COLUMNS, map(_cell, row))), ensure_ascii=False, separators=(",", ":")) + "\n"
+        for row in rows
+    )
+
+
+def encode_csv(rows: Iterable[Sequence], header: bool = False) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    if header:
+        writer.writerow(COLUMNS)
+    writer.writerows([_cell(value) for value in row] for row in rows)
+    return buffer.getvalue()
+
+
+async def encode(partitions: AsyncIterator[Sequence[Sequence]], fmt: str) -> AsyncIterator[bytes]:
+    """
+    Encode streamed row batches straight to bytes, without per-row model validation
+
+    Args:
+        partitions: Batches of (id, word, meaning, example, created_at) tuples
+        fmt: FORMAT_NDJSON or FORMAT_CSV
+
+    Returns:
+        An async iterator of encoded chunks of about CHUNK_BYTES each
+    """
+    pending = []
+    size = 0
+    if fmt == FORMAT_CSV:
+        pending.append(encode_csv((), header=True))
+    async for rows in partitions:
+        text = encode_csv(rows) if fmt == FORMAT_CSV else encode_ndjson(rows)
+        pending.append(text)
+        size += len(text)
+        if size >= CHUNK_BYTES:
+            yield "".join(pending).encode("utf-8")
+            pending, size = [], 0
+    if pending:
+        yield "".join(pending).encode("utf-8")
@@ -0,0 +1,66 @@
+"""
+Per-worker lists of each user's word ids, for uniform quiz sampling
+
+A uniform draw needs words by position. Numbering the user's ids in SQL
+(row_number) reads the index up to the highest position drawn, about the whole
+vocabulary per quiz; seeking random ids (id >= r LIMIT 1) is O(log n) per pick but
+favours words after large id gaps, and the shared user_vocabulary table
+interleaves every user's ids. Instead each worker keeps a user's sorted ids, read
+with one index-only scan per change, and a quiz picks positions in that list and
+fetches just those rows by primary key.
+
+Lists are dropped whenever the user's vocabulary changes (vocab_cache invalidation
+broadcasts, from this worker or another) and after VOCAB_IDS_TTL_SECONDS, which
+bounds how long writes made outside app.crud go unseen. Words deleted that way show
+up as short fetches; callers then forget the list and read it again.
+"""
+from array import array
+from typing import Awaitable, Callable, Iterable, Optional, Sequence
+
+from app.core import tiered_cache, vocab_cache
+from app.core.config import get_settings
+
+settings = get_settings()
+
+Loader = Callable[[], Awaitable[Iterable[int]]]
+
+# str(user_id) -> array of ids in ascending order
+_ids = tiered_cache.LocalCache(
+    max_entries=settings.VOCAB_IDS_MAX_USERS,
+    max_bytes=settings.VOCAB_IDS_MAX_BYTES,
+    ttl=settings.VOCAB_IDS_TTL_SECONDS,
+)
+
+
+async def get(user_id: int, load: Loader) -> Sequence[int]:
+    """
+    A user's word ids, loading them if this worker has none
+
+    Args:
+        user_id: Owner of the vocabulary
+        load: Fetches the user's ids in ascending order
+
+    Returns:
+        The ids; a list read across a change is returned but not kept
+    """
+    ids = _ids.get(str(user_id))
+    if ids is None:
+        generation = _ids.generation
+        ids = array("q", await load())
+        _ids.set(str(user_id), ids, ids.itemsize * len(ids), generation=generation)
+    return ids
+
+
+def forget(user_id: int) -> None:
+    """Drop a user's list, e.g. after it named a word that no longer exists"""
+    _ids.discard(str(user_id))
+
+
+def _on_vocabulary_changed(keys: Optional[Sequence[str]], remote: bool) -> None:
+    if keys is None:
+        _ids.clear()
+    else:
+        _ids.discard(*keys)
+
+
+vocab_cache.snapshot_cache.add_listener(_on_vocabulary_changed)
@@ -0,0 +1,213 @@
+import codecs
+import csv
+import json
+from typing import Any, AsyncIterator, Dict, List, Tuple, Union
+
+FORMAT_JSON = "json"
+FORMAT_NDJSON = "ndjson"
+FORMAT_CSV = "csv"
+FORMATS = (FORMAT_JSON, FORMAT_NDJSON, FORMAT_CSV)
+
+CONTENT_TYPES = {
+    "application/json": FORMAT_JSON,
+    "application/x-ndjson": FORMAT_NDJSON,
+    "application/ndjson": FORMAT_NDJSON,
+    "application/jsonlines": FORMAT_NDJSON,
+    "text/csv": FORMAT_CSV,
+    "application/csv": FORMAT_CSV,
+}
+
+CSV_COLUMNS = ("word", "meaning", "example")
+
+# A single record (JSON object, NDJSON line or CSV row) larger than this is rejected
+# instead of growing the parse buffer without bound
+MAX_RECORD_BYTES = 64 * 1024
+
+# (1-based record number, parsed record or the reason it could not be parsed)
+Record = Tuple[int, Union[Dict[str, Any], str]]
+
+
+class ImportFormatError(ValueError):
+    """The upload is not in the declared format and parsing cannot continue"""
+
+
+def detect_format(content_type: str) -> str:
+    """
+    Map a Content-Type header to an import format
+
+    Args:
+        content_type: The request's Content-Type (parameters are ignored)
+
+    Returns:
+        One of FORMATS, defaulting to JSON
+    """
+    media_type = (content_type or "").split(";", 1)[0].strip().lower()
+    return CONTENT_TYPES.get(media_type, FORMAT_JSON)
+
+
+async def _decoded(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    async for chunk in chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+async def _lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    buffer = ""
+    async for text in _decoded(chunks):
+        buffer += text
+        *complete, buffer = buffer.split("\n")
+        for line in complete:
+            yield line
+        if len(buffer) > MAX_RECORD_BYTES:
+            raise ImportFormatError(f"Line longer than {MAX_RECORD_BYTES} bytes")
+    if buffer:
+        yield buffer
+
+
+async def iter_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[Record]:
+    number = 0
+    async for line in _lines(chunks):
+        line = line.strip()
+        if not line:
+            continue
+        number += 1
+        try:
+            yield number, json.loads(line)
+        except ValueError as e:
+            yield number, f"Invalid JSON: {str(e)}"
+
+
+async def iter_csv(chunks: AsyncIterator[bytes]) -> AsyncIterator[Record]:
+    columns = None
+    number = 0
+    record = ""
+    async for line in _lines(chunks):
+        # A quoted field may contain newlines: keep joining lines until the quotes balance
+        record = f"{record}\n{line}" if record else line
+        if record.count('"') % 2:
+            if len(record) > MAX_RECORD_BYTES:
+                raise ImportFormatError(f"CSV record longer than {MAX_RECORD_BYTES} bytes")
+            continue
+        text, record = record.rstrip("\r"), ""
+        if not text.strip():
+            continue
+        row = next(csv.reader([text]))
+        if columns is None:
+            header = [cell.strip().lower() for cell in row]
+            if "word" in header and "meaning" in header:
+                columns = header
+                continue
+            # No header row: columns are positional
+            columns = list(CSV_COLUMNS)
+        number += 1
+        # Empty cells count as missing, so a blank example is stored as NULL
+        yield number, {key: value for key, value in zip(columns, row) if key and value != ""}
+    if record:
+        yield number + 1, "Unterminated quoted field"
+
+
+async def iter_json_array(chunks: AsyncIterator[bytes]) -> AsyncIterator[Record]:
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    started = False
+    number = 0
+    finished = False
+
+    async def more() -> bool:
+        nonlocal buffer, position
+        async for text in source:
+            buffer = buffer[position:] + text
+            position = 0
+            return True
+        return False
+
+    source = _decoded(chunks).__aiter__()
+    while not finished:
+        # Skip whitespace and separators up to the next value
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n":
+                position += 1
+            if position < len(buffer):
+                break
+            if not await more():
+                if not started:
+                    return
+                raise ImportFormatError("Unexpected end of JSON array")
+        char = buffer[position]
+        if not started:
+            if char != "[":
+                raise ImportFormatError("Expected a JSON array")
+            started = True
+            position += 1
+            continue
+        if char == "]":
+            finished = True
+            continue
+        if char == ",":
+            position += 1
+            continue
+        try:
+            value, end = decoder.raw_decode(buffer, position)
+        except ValueError:
+            if len(buffer) - position > MAX_RECORD_BYTES:
+                raise ImportFormatError(f"JSON value longer than {MAX_RECORD_BYTES} bytes")
+            if not await more():
+                raise ImportFormatError("Unexpected end of JSON array")
+            continue
+        # A number cut at a chunk boundary parses as a shorter number; wait for the delimiter
+        if end == len(buffer) and await more():
+            continue
+        position = end
+        number += 1
+        yield number, value
+
+
+def iter_records(chunks: AsyncIterator[bytes], fmt: str) -> AsyncIterator[Record]:
+    """
+    Parse an upload incrementally, one record at a time
+
+    Args:
+        chunks: The raw request body stream
+        fmt: One of FORMATS
+
+    Returns:
+        An async iterator of (record number, dict or parse error message)
+    """
+    if fmt == FORMAT_NDJSON:
+        return iter_ndjson(chunks)
+    if fmt == FORMAT_CSV:
+        return iter_csv(chunks)
+    return iter_json_array(chunks)
+
+
+class ImportReport:
+    """Running totals for one import; keeps at most `max_errors` error entries"""
+
+    def __init__(self, max_errors: int):
+        self.max_errors = max_errors
+        self.received = 0
+        self.inserted = 0
+        self.duplicates = 0
+        self.failed = 0
+        self.errors: List[Dict[str, Any]] = []
+
+    def error(self, row: int, message: str) -> None:
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"row": row, "error": message})
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "received": self.received,
+            "inserted": self.inserted,
+            "duplicates": self.duplicates,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+        }
@@ -0,0 +1,77 @@
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from sqlalchemy import func, update
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.models.dictionary import DictionaryEntry
+from app.models.review import Review
+from app.models.vocabulary import UserVocabulary
+from app.core import spaced_repetition
+
+# Field order of due_statement rows
+DUE_COLUMNS = ("vocabulary_id", "word", "meaning", "example", "due_at",
+               "repetitions", "interval_days", "ease", "lapses")
+# Field order of apply_answers results
+STATE_FIELDS = ("repetitions", "interval_days", "ease", "lapses", "due_at", "last_reviewed_at")
+
+def new_rows(user_id: int, vocabulary_ids: Iterable[int], due_at: datetime) -> List[Dict]:
+    """Review rows for freshly added words, due at once"""
+    return [{"vocabulary_id": vocabulary_id, "user_id": user_id, "repetitions": 0, "interval_days": 0,
+             "ease": spaced_repetition.DEFAULT_EASE, "lapses": 0, "due_at": due_at}
+            for vocabulary_id in vocabulary_ids]
+
+def due_statement(user_id: int, now: datetime, limit: int):
+    """
+    Due cards, soonest first: one range scan on (user_id, due_at) plus primary-key
+    lookups of the link and its entry per card, so the cost is O(log n + limit)
+    however many words are due
+    """
+    return (select(Review.vocabulary_id, DictionaryEntry.word, DictionaryEntry.meaning,
+                   func.coalesce(UserVocabulary.example, DictionaryEntry.example).label("example"),
+                   Review.due_at, Review.repetitions, Review.interval_days, Review.ease, Review.lapses)
+            .join(UserVocabulary, UserVocabulary.id == Review.vocabulary_id)
+            .join(DictionaryEntry, DictionaryEntry.id == UserVocabulary.entry_id)
+            .where(Review.user_id == user_id, Review.due_at <= now)
+            # Ordering by due_at alone keeps the index order usable (no sort over every due row)
+            .order_by(Review.due_at)
+            .limit(limit))
+
+async def due_cards(db: AsyncSession, user_id: int, limit: int, now: Optional[datetime] = None) -> List[tuple]:
+    """Up to `limit` due cards as plain tuples in DUE_COLUMNS order"""
+    return (await db.exec(due_statement(user_id, now or datetime.utcnow(), limit))).all()
+
+async def apply_answers(db: AsyncSession, user_id: int, answers: Sequence[Tuple[int, int]],
+                        now: Optional[datetime] = None) -> Tuple[Dict[int, spaced_repetition.ReviewState], List[int]]:
+    """
+    Grade a batch of answers and store the new schedules in one transaction
+
+    Args:
+        db: The session; committed on success
+        user_id: Owner of the cards
+        answers: (vocabulary_id, quality) pairs; repeated ids are applied in order
+        now: Review time (defaults to the current UTC time)
+
+    Returns:
+        (vocabulary_id -> new state, ids that are not the user's cards)
+    """
+    now = now or datetime.utcnow()
+    ids = list(dict.fromkeys(vocabulary_id for vocabulary_id, _ in answers))
+    # Row locks keep two concurrent batches from grading the same card from one stale state
+    current = (await db.exec(
+        select(Review.vocabulary_id, *(getattr(Review, name) for name in STATE_FIELDS))
+        .where(Review.user_id == user_id, Review.vocabulary_id.in_(ids))
+        .with_for_update())).all()
+    states = {row[0]: spaced_repetition.ReviewState(*row[1:]) for row in current}
+
+    for vocabulary_id, quality in answers:
+        state = states.get(vocabulary_id)
+        if state is not None:
+            states[vocabulary_id] = spaced_repetition.schedule(state, quality, now)
+
+    if states:
+        # ORM bulk UPDATE by primary key: one executemany round trip
+        await db.exec(update(Review), params=[
+            {"vocabulary_id": vocabulary_id, **{name: getattr(state, name) for name in STATE_FIELDS}}
+            for vocabulary_id, state in states.items()])
+    await db.commit()
+    return states, [vocabulary_id for vocabulary_id in ids if vocabulary_id not in states]
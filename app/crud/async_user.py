@@ -0,0 +1,89 @@
+from typing import Optional, Dict, Any
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.models.user import User
+from app.core.security import hash_password
+import logging
+
+logger = logging.getLogger(__name__)
+
+async def get_by_username(db: AsyncSession, username: str) -> Optional[User]:
+    return (await db.exec(select(User).where(User.username == username))).first()
+
+async def get_by_email(db: AsyncSession, email: str) -> Optional[User]:
+    try:
+        return (await db.exec(select(User).where(User.email == email))).first()
+    except Exception as e:
+        logger.error(f"Error getting user by email: {str(e)}")
+        return None
+
+async def get_by_firebase_uid(db: AsyncSession, firebase_uid: str) -> Optional[User]:
+    try:
+        return (await db.exec(select(User).where(User.firebase_uid == firebase_uid))).first()
+    except Exception as e:
+        logger.error(f"Error getting user by firebase_uid: {str(e)}")
+        return None
+
+async def create(db: AsyncSession, *, username: str, password: str, email: str, full_name: str,
+                 firebase_uid: str = None, hashed_pw: Optional[str] = None) -> User:
+    """Create a user; pass hashed_pw when the password was already hashed off the event loop"""
+    try:
+        user = User(username=username,
+                    email=email,
+                    full_name=full_name,
+                    hashed_pw=hashed_pw or hash_password(password),
+                    firebase_uid=firebase_uid)
+        db.add(user)
+        await db.commit()
+        await db.refresh(user)
+        return user
+    except Exception as e:
+        logger.error(f"Error creating user: {str(e)}")
+        await db.rollback()
+        raise
+
+async def create_from_firebase(db: AsyncSession, *, firebase_uid: str, username: str, email: str,
+                               full_name: str, hashed_pw: str) -> User:
+    """Provision the local row for a Firebase user on first login"""
+    try:
+        user = User(username=username, email=email, full_name=full_name,
+                    hashed_pw=hashed_pw, firebase_uid=firebase_uid)
+        db.add(user)
+        await db.commit()
+        await db.refresh(user)
+        return user
+    except Exception as e:
+        logger.error(f"Error provisioning user for firebase_uid {firebase_uid}: {str(e)}")
+        await db.rollback()
+        raise
+
+async def set_firebase_uid(db: AsyncSession, user: User, firebase_uid: str) -> User:
+    """Link a legacy row (created without firebase_uid) to its Firebase account"""
+    try:
+        user.firebase_uid = firebase_uid
+        db.add(user)
+        await db.commit()
+        await db.refresh(user)
+        return user
+    except Exception as e:
+        logger.error(f"Error setting firebase_uid for user {user.id}: {str(e)}")
+        await db.rollback()
+        raise
+
+async def create_without_firebase_uid(db: AsyncSession, **user_data: Dict[str, Any]) -> User:
+    """Create a user without the firebase_uid field to handle database schema issues"""
+    try:
+        user = User(
+            username=user_data.get("username"),
+            email=user_data.get("email"),
+            full_name=user_data.get("full_name"),
+            hashed_pw=user_data.get("hashed_pw")
+        )
+        db.add(user)
+        await db.commit()
+        await db.refresh(user)
+        return user
+    except Exception as e:
+        logger.error(f"Error creating user without firebase_uid: {str(e)}")
+        await db.rollback()
+        raise
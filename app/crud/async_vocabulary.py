@@ -0,0 +1,285 @@
+import random
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Optional, List, Sequence, Tuple
+from sqlalchemy import delete as sql_delete, insert, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.models.dictionary import DictionaryEntry
+from app.models.review import Review
+from app.models.vocabulary import UserVocabulary
+from app.crud import async_review, vocabulary_statements as statements
+from app.core import search_index, spaced_repetition, vocab_cache, vocab_ids
+from app.core.config import get_settings
+
+settings = get_settings()
+
+# Entry ids per lookup when resolving snapshot rows; keeps bind parameters under SQLite's limit
+ENTRY_FETCH_CHUNK = 500
+
+# Users with at most this many words (or quizzes asking for a large share of them)
+# are sampled in Python after one full fetch
+SAMPLE_FULL_FETCH_THRESHOLD = 500
+# Ids per lookup when fetching drawn rows; keeps bind parameters under SQLite's limit
+SAMPLE_ID_CHUNK = 500
+# Draws before falling back to a full fetch; a draw only comes up short when the
+# id list names words deleted since it was read
+SAMPLE_MAX_ROUNDS = 3
+
+_rng = random.Random()
+
+@dataclass
+class QuizSample:
+    """Rows drawn for one quiz: question (word, meaning) pairs plus distractor meanings"""
+    total: int
+    questions: List[Tuple[str, str]] = field(default_factory=list)
+    distractors: List[str] = field(default_factory=list)
+
+async def list_rows_for_user(db: AsyncSession, user_id: int, *, after_id: int = 0, skip: int = 0,
+                             limit: int = 100) -> List[tuple]:
+    """Listing rows as plain (id, word, meaning, example, created_at) tuples, in id order"""
+    return (await db.exec(statements.rows_statement(user_id, after_id=after_id, skip=skip, limit=limit))).all()
+
+async def snapshot_rows(db: AsyncSession, user_id: int) -> List[list]:
+    """Rows for the vocabulary cache; fetches one past the cap so oversize users are detectable"""
+    rows = await db.exec(statements.snapshot_statement(user_id, settings.VOCAB_CACHE_MAX_ITEMS + 1))
+    return [statements.to_snapshot_row(row) for row in rows]
+
+async def entry_rows(db: AsyncSession, entry_ids: Sequence[int]) -> List[tuple]:
+    """(id, word, meaning, example) of dictionary entries, for app.core.dictionary_cache"""
+    rows = []
+    for i in range(0, len(entry_ids), ENTRY_FETCH_CHUNK):
+        rows.extend(await db.exec(statements.entries_statement(entry_ids[i:i + ENTRY_FETCH_CHUNK])))
+    return rows
+
+async def cached_rows(db: AsyncSession, user_id: int) -> Optional[List[list]]:
+    """A user's vocabulary from the snapshot cache, or None if the database must be queried"""
+    return await vocab_cache.get_rows(user_id, db, lambda session: snapshot_rows(session, user_id),
+                                      lambda entry_ids: entry_rows(db, entry_ids))
+
+async def stream_rows(db: AsyncSession, user_id: int) -> AsyncIterator[Sequence[Sequence]]:
+    """Yield a user's vocabulary as batches of plain tuples through a server-side cursor"""
+    result = await db.stream(statements.export_statement(user_id),
+                             execution_options={"yield_per": settings.VOCAB_EXPORT_YIELD_PER})
+    async for partition in result.partitions():
+        yield partition
+
+async def add(db: AsyncSession, user_id: int, *, word: str, meaning: str,
+              example: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Link the user to the shared dictionary entry for (word, meaning), creating the
+    entry if it is new. Raises IntegrityError if the user already has that entry.
+
+    Returns:
+        The new word as a vocab_cache.COLUMNS dict (word and meaning as stored on the entry)
+    """
+    now = datetime.utcnow()
+    try:
+        await db.exec(statements.entry_insert(db.bind.dialect.name).values(
+            **statements.entry_values(word, meaning, example, now)))
+        entry = (await db.exec(statements.entries_by_key_statement(
+            [(statements.normalize_key(word), statements.normalize_key(meaning))]))).one()
+        link = UserVocabulary(user_id=user_id, entry_id=entry[0],
+                              example=statements.own_example(example, entry[3]), created_at=now)
+        db.add(link)
+        await db.flush()
+        row = statements.to_row(link, entry)
+        # New words are due for review at once
+        db.add(Review(vocabulary_id=link.id, user_id=user_id, due_at=now))
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise
+    await vocab_cache.invalidate(user_id)
+    search_index.add(user_id, row)
+    return vocab_cache.row_to_dict(row)
+
+# Per-connection staging table for COPY; rows are moved into the dictionary and links with ON CONFLICT
+IMPORT_STAGING_TABLE = "vocabulary_import"
+IMPORT_COLUMNS = ["user_id", "word", "meaning", "example", "created_at", "word_key", "meaning_key"]
+
+def _dialect_insert(dialect_name: str):
+    return postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+
+async def _copy_ignoring_duplicates(db: AsyncSession, rows: List[tuple]) -> int:
+    connection = await db.connection()
+    raw = await connection.get_raw_connection()
+    await db.exec(text(
+        f"CREATE TEMP TABLE IF NOT EXISTS {IMPORT_STAGING_TABLE} "
+        "(user_id integer, word varchar, meaning varchar, example varchar, created_at timestamp, "
+        "word_key varchar, meaning_key varchar) ON COMMIT DELETE ROWS"))
+    await raw.driver_connection.copy_records_to_table(IMPORT_STAGING_TABLE, records=rows, columns=IMPORT_COLUMNS)
+    entries = DictionaryEntry.__tablename__
+    await db.exec(text(
+        f"INSERT INTO {entries} (word, meaning, example, word_key, meaning_key, created_at) "
+        "SELECT DISTINCT ON (word_key, meaning_key) word, meaning, example, word_key, meaning_key, created_at "
+        f"FROM {IMPORT_STAGING_TABLE} ORDER BY word_key, meaning_key "
+        "ON CONFLICT (word_key, meaning_key) DO NOTHING"))
+    # Links keep their own example only when it differs from the entry's (vocabulary_statements.own_example),
+    # and each new link gets its review row in the same statement
+    result = await db.exec(text(
+        f"WITH inserted AS (INSERT INTO {UserVocabulary.__tablename__} "
+        "(user_id, entry_id, example, mastery_level, created_at) "
+        "SELECT s.user_id, e.id, CASE WHEN s.example IS DISTINCT FROM e.example THEN s.example END, 0, s.created_at "
+        f"FROM {IMPORT_STAGING_TABLE} s JOIN {entries} e "
+        "ON e.word_key = s.word_key AND e.meaning_key = s.meaning_key "
+        "ON CONFLICT (user_id, entry_id) DO NOTHING "
+        "RETURNING id, user_id, created_at) "
+        f"INSERT INTO {Review.__tablename__} "
+        "(vocabulary_id, user_id, repetitions, interval_days, ease, lapses, due_at) "
+        f"SELECT id, user_id, 0, 0, {spaced_repetition.DEFAULT_EASE}, 0, created_at FROM inserted"))
+    return result.rowcount
+
+async def _insert_ignoring_duplicates(db: AsyncSession, user_id: int, values: List[Dict[str, Any]],
+                                      now: datetime) -> int:
+    dialect_name = db.bind.dialect.name
+    await db.exec(statements.entry_insert(dialect_name), params=values)
+    keys = list({(value["word_key"], value["meaning_key"]) for value in values})
+    entries = {(row[4], row[5]): row for row in await db.exec(statements.entries_by_key_statement(keys))}
+    links = []
+    for value in values:
+        entry = entries[(value["word_key"], value["meaning_key"])]
+        links.append({"user_id": user_id, "entry_id": entry[0], "created_at": now,
+                      "example": statements.own_example(value["example"], entry[3])})
+    result = await db.exec(_dialect_insert(dialect_name)(UserVocabulary).on_conflict_do_nothing()
+                           .returning(UserVocabulary.id), params=links)
+    ids = result.scalars().all()
+    if ids:
+        await db.exec(insert(Review), params=async_review.new_rows(user_id, ids, now))
+    return len(ids)
+
+async def bulk_add(db: AsyncSession, user_id: int, items: List[Dict[str, Any]]) -> int:
+    """
+    Insert a batch of validated VocabIn dicts in one round trip and commit.
+    Words are linked to shared dictionary entries (created as needed); entries
+    the user already has (uq_user_vocabulary_user_id_entry_id) are skipped.
+    Uses COPY into a staging table on PostgreSQL (asyncpg) and multi-row
+    INSERT ... ON CONFLICT DO NOTHING elsewhere; inserted words get their review
+    rows in the same transaction. Drops the user's search index but does not touch
+    the vocabulary cache; the caller invalidates once per import.
+
+    Returns:
+        Number of words actually added
+    """
+    if not items:
+        return 0
+    now = datetime.utcnow()
+    values = [statements.entry_values(item["word"], item["meaning"], item.get("example"), now) for item in items]
+    if settings.VOCAB_IMPORT_USE_COPY and db.bind.dialect.driver == "asyncpg":
+        inserted = await _copy_ignoring_duplicates(db, [
+            (user_id, value["word"], value["meaning"], value["example"], now, value["word_key"], value["meaning_key"])
+            for value in values])
+    else:
+        inserted = await _insert_ignoring_duplicates(db, user_id, values, now)
+    await db.commit()
+    if inserted:
+        search_index.forget(user_id)
+    return inserted
+
+async def delete(db: AsyncSession, user_id: int, vocab_id: int):
+    """Unlink a word from the user; the shared entry stays"""
+    link = await db.get(UserVocabulary, vocab_id)
+    if not link or link.user_id != user_id:
+        return False
+    # Explicit as well as ON DELETE CASCADE: SQLite does not enforce foreign keys by default
+    await db.exec(sql_delete(Review).where(Review.vocabulary_id == vocab_id))
+    await db.delete(link); await db.commit()
+    await vocab_cache.invalidate(user_id)
+    search_index.remove(user_id, vocab_id)
+    return True
+
+async def search(db: AsyncSession, user_id: int, query: str, limit: int) -> List[tuple]:
+    """
+    Ranked autocomplete and typo-tolerant matches on word and meaning
+
+    PostgreSQL answers from its trigram indexes; other databases go through this
+    worker's in-process index (app.core.search_index), loaded on first use.
+
+    Returns:
+        Up to `limit` rows in search_index.COLUMNS order
+    """
+    query = statements.normalize_key(query)
+    if db.bind.dialect.name == "postgresql":
+        fuzzy = len(query) >= settings.SEARCH_MIN_FUZZY_LENGTH
+        rows = await db.exec(statements.search_statement(user_id, query, limit, fuzzy))
+        return [(*row[:5], search_index.MATCHES[row[5]], round(row[6], 3)) for row in rows]
+
+    async def load():
+        return (await db.exec(statements.export_statement(user_id))).all()
+    return await search_index.search(user_id, query, limit, load)
+
+def sample_small(rows: Sequence[Tuple[int, str, str]], num_questions: int, num_distractors: int,
+                 rng: random.Random = _rng) -> QuizSample:
+    """Sample from already fetched rows; only the num_questions * (1 + num_distractors) drawn are read"""
+    picked = rng.sample(range(len(rows)), min(len(rows), num_questions * (1 + num_distractors)))
+    return QuizSample(total=len(rows),
+                      questions=[(rows[i][1], rows[i][2]) for i in picked[:num_questions]],
+                      distractors=[rows[i][2] for i in picked[num_questions:]])
+
+def split_sample(total: int, found: Dict[int, Tuple[str, str]], num_questions: int,
+                 rng: random.Random = _rng) -> QuizSample:
+    """`num_questions` of the drawn rows become questions, the rest only lend their meanings"""
+    rows = list(found.values())
+    rng.shuffle(rows)
+    return QuizSample(total=total, questions=rows[:num_questions],
+                      distractors=[meaning for _, meaning in rows[num_questions:]])
+
+async def word_ids(db: AsyncSession, user_id: int) -> List[int]:
+    """A user's word ids in ascending order, for app.core.vocab_ids"""
+    return (await db.exec(statements.ids_statement(user_id))).all()
+
+async def draw_rows(db: AsyncSession, user_id: int, ids: Sequence[int], wanted: int,
+                    rng: random.Random = _rng) -> Optional[Dict[int, Tuple[str, str]]]:
+    """
+    Uniformly draw `wanted` distinct words from the user's id list
+
+    Args:
+        db: Database session
+        user_id: Owner of the vocabulary
+        ids: The user's word ids
+        wanted: Rows to draw; at most len(ids)
+        rng: Random source
+
+    Returns:
+        id -> (word, meaning) with exactly `wanted` rows, or None if some drawn
+        ids no longer exist
+    """
+    picked = rng.sample(ids, wanted)
+    found: Dict[int, Tuple[str, str]] = {}
+    for i in range(0, len(picked), SAMPLE_ID_CHUNK):
+        statement = statements.pairs_by_id_statement(user_id, picked[i:i + SAMPLE_ID_CHUNK])
+        for row_id, word, meaning in await db.exec(statement):
+            found[row_id] = (word, meaning)
+    return found if len(found) == wanted else None
+
+async def sample_for_quiz(db: AsyncSession, user_id: int, num_questions: int, num_distractors: int = 3,
+                          rng: random.Random = _rng, rows: Optional[List[list]] = None) -> QuizSample:
+    """
+    Draw quiz rows without loading the whole vocabulary
+
+    Args:
+        db: Database session
+        user_id: Owner of the vocabulary
+        num_questions: Number of question rows wanted
+        num_distractors: Distractor meanings wanted per question
+        rng: Random source
+        rows: Cached snapshot rows to sample from without touching the database
+
+    Returns:
+        A QuizSample whose `total` is the user's full vocabulary size
+    """
+    if rows is not None:
+        return sample_small(rows, num_questions, num_distractors, rng)
+    wanted = num_questions * (1 + num_distractors)
+    for _ in range(SAMPLE_MAX_ROUNDS):
+        ids = await vocab_ids.get(user_id, lambda: word_ids(db, user_id))
+        if len(ids) <= SAMPLE_FULL_FETCH_THRESHOLD or wanted >= len(ids):
+            break
+        found = await draw_rows(db, user_id, ids, wanted, rng)
+        if found is not None:
+            return split_sample(len(ids), found, num_questions, rng)
+        # Words were deleted without an invalidation reaching this worker
+        vocab_ids.forget(user_id)
+    rows = (await db.exec(statements.pairs_statement(user_id))).all()
+    return sample_small(rows, num_questions, num_distractors, rng)
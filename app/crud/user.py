@@ -23,12 +23,14 @@ def get_by_firebase_uid(db: Session, firebase_uid: str) -> Optional[User]:
         logger.error(f"Error getting user by firebase_uid: {str(e)}")
         return None
 
-def create(db: Session, *, username: str, password: str, email: str, full_name: str, firebase_uid: str = None) -> User:
+def create(db: Session, *, username: str, password: str, email: str, full_name: str, firebase_uid: str = None,
+           hashed_pw: Optional[str] = None) -> User:
+    """Create a user; pass hashed_pw when the password was already hashed off the event loop"""
     try:
         user = User(username=username,
                     email=email,
                     full_name=full_name,
-                    hashed_pw=hash_password(password),
+                    hashed_pw=hashed_pw or hash_password(password),
                     firebase_uid=firebase_uid)
         db.add(user)
         db.commit()
@@ -0,0 +1,121 @@
+"""SQL statements and row helpers for the vocabulary tables (app.crud.async_vocabulary, benchmark seeding)"""
+from datetime import datetime
+from typing import Any, Dict, Optional, Sequence, Tuple
+from sqlalchemy import case, func, literal, or_, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import select
+from app.models.dictionary import DictionaryEntry
+from app.models.vocabulary import UserVocabulary
+
+def normalize_key(text: str) -> str:
+    """Dictionary key of a word or meaning: lowercased, whitespace collapsed"""
+    return " ".join(text.split()).lower()
+
+def own_example(example: Optional[str], entry_example: Optional[str]) -> Optional[str]:
+    """What a link stores as the learner's example: only one that differs from the shared entry's"""
+    return example if example is not None and example != entry_example else None
+
+def entry_values(word: str, meaning: str, example: Optional[str], created_at: datetime) -> Dict[str, Any]:
+    return {"word": word, "meaning": meaning, "example": example, "created_at": created_at,
+            "word_key": normalize_key(word), "meaning_key": normalize_key(meaning)}
+
+def entry_insert(dialect_name: str):
+    """INSERT into dictionary_entry that leaves an existing entry with the same keys alone"""
+    dialect_insert = postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+    return dialect_insert(DictionaryEntry).on_conflict_do_nothing(index_elements=["word_key", "meaning_key"])
+
+def entries_by_key_statement(keys: Sequence[Tuple[str, str]]):
+    """(id, word, meaning, example, word_key, meaning_key) of the entries with these keys"""
+    return select(DictionaryEntry.id, DictionaryEntry.word, DictionaryEntry.meaning, DictionaryEntry.example,
+                  DictionaryEntry.word_key, DictionaryEntry.meaning_key).where(
+        tuple_(DictionaryEntry.word_key, DictionaryEntry.meaning_key).in_(keys))
+
+def entries_statement(entry_ids: Sequence[int]):
+    """(id, word, meaning, example) by entry id, for app.core.dictionary_cache"""
+    return select(DictionaryEntry.id, DictionaryEntry.word, DictionaryEntry.meaning,
+                  DictionaryEntry.example).where(DictionaryEntry.id.in_(entry_ids))
+
+def to_row(link: UserVocabulary, entry: Sequence) -> list:
+    """A link and its entry's (id, word, meaning, example, ...) as a vocab_cache.COLUMNS row"""
+    return [link.id, entry[1], entry[2], link.example if link.example is not None else entry[3], link.created_at]
+
+def _rows_select():
+    # The user's links joined to their shared entries, in vocab_cache.COLUMNS order
+    return select(UserVocabulary.id, DictionaryEntry.word, DictionaryEntry.meaning,
+                  func.coalesce(UserVocabulary.example, DictionaryEntry.example).label("example"),
+                  UserVocabulary.created_at).join(DictionaryEntry, DictionaryEntry.id == UserVocabulary.entry_id)
+
+def snapshot_statement(user_id: int, limit: int):
+    """Columns cached by app.core.vocab_cache (SNAPSHOT_COLUMNS), in id order; no join needed"""
+    return select(UserVocabulary.id, UserVocabulary.entry_id, UserVocabulary.example,
+                  UserVocabulary.created_at).where(UserVocabulary.user_id == user_id).order_by(
+        UserVocabulary.id).limit(limit)
+
+def export_statement(user_id: int):
+    """Plain columns for streaming export, in id order"""
+    return _rows_select().where(UserVocabulary.user_id == user_id).order_by(UserVocabulary.id)
+
+def rows_statement(user_id: int, *, after_id: int = 0, skip: int = 0, limit: int = 100):
+    """Listing columns as plain tuples (vocab_cache.COLUMNS order), for responses encoded without ORM objects"""
+    return _rows_select().where(UserVocabulary.user_id == user_id, UserVocabulary.id > after_id).order_by(
+        UserVocabulary.id).offset(skip).limit(limit)
+
+def to_snapshot_row(row) -> list:
+    row_id, entry_id, example, created_at = row
+    return [row_id, entry_id, example, created_at.isoformat()]
+
+def _like_prefix(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+def search_statement(user_id: int, query: str, limit: int, fuzzy: bool):
+    """
+    PostgreSQL search ranked like app.core.search_index: (id, word, meaning, example,
+    created_at, rank, score) rows, rank indexing search_index.MATCHES. The conditions
+    are on the entries' normalized keys, served by their gin_trgm_ops indexes
+    (migration 0006) and joined back to the user's links.
+
+    Args:
+        user_id: Owner of the vocabulary
+        query: Search text as normalized by normalize_key
+        limit: Most rows to return
+        fuzzy: Also match by trigram similarity (pg_trgm's % and <% operators)
+    """
+    word, meaning = DictionaryEntry.word_key, DictionaryEntry.meaning_key
+    prefix = _like_prefix(query)
+    word_prefix = word.like(prefix, escape="\\")
+    # Prefix of the meaning or of any word in it
+    meaning_prefix = or_(meaning.like(prefix, escape="\\"), meaning.like("% " + prefix, escape="\\"))
+    conditions = [word_prefix, meaning_prefix]
+    if fuzzy:
+        conditions += [word.op("%")(query), literal(query).op("<%")(meaning)]
+    rank = case((word == query, 0), (word_prefix, 1), (meaning_prefix, 2),
+                *([(word.op("%")(query), 3)] if fuzzy else []), else_=4)
+    score = func.greatest(func.similarity(word, query), func.word_similarity(query, meaning))
+    return (_rows_select().add_columns(rank.label("rank"), score.label("score"))
+            .where(UserVocabulary.user_id == user_id, or_(*conditions))
+            .order_by(rank, score.desc(), func.length(DictionaryEntry.word), UserVocabulary.id)
+            .limit(limit))
+
+# --- Sampling query layer -------------------------------------------------
+#
+# The user_vocabulary table is shared by every user, so whole-table sampling
+# (ORDER BY random(), TABLESAMPLE) either scans everything or mostly returns
+# other users' pages. Quizzes draw positions in the user's id list instead
+# (app.core.vocab_ids, read with ids_statement once per change) and fetch the
+# drawn rows by primary key, O(log n) each.
+
+def ids_statement(user_id: int):
+    """A user's word ids in ascending order, read from the (user_id, id) index alone"""
+    return select(UserVocabulary.id).where(UserVocabulary.user_id == user_id).order_by(UserVocabulary.id)
+
+def _pairs_select():
+    return select(UserVocabulary.id, DictionaryEntry.word, DictionaryEntry.meaning).join(
+        DictionaryEntry, DictionaryEntry.id == UserVocabulary.entry_id)
+
+def pairs_statement(user_id: int):
+    """Every (id, word, meaning) for a user; used for small vocabularies"""
+    return _pairs_select().where(UserVocabulary.user_id == user_id)
+
+def pairs_by_id_statement(user_id: int, ids: Sequence[int]):
+    """(id, word, meaning) of these words, skipping any the user no longer has"""
+    return _pairs_select().where(UserVocabulary.id.in_(ids), UserVocabulary.user_id == user_id)
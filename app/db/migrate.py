@@ -1,42 +1,85 @@
-import sqlite3
-import os
+"""
+Schema migrations (Alembic), runnable without the alembic executable:
+
+    python -m app.db.migrate upgrade [REVISION]      # default: head
+    python -m app.db.migrate downgrade REVISION
+    python -m app.db.migrate current
+    python -m app.db.migrate history
+    python -m app.db.migrate stamp REVISION
+    python -m app.db.migrate revision -m "message" [--autogenerate]
+    python -m app.db.migrate upgrade --sql           # print the SQL instead of running it
+
+The target database is DATABASE_URL from the app settings. On PostgreSQL, index
+revisions build with CREATE INDEX CONCURRENTLY, so upgrades are safe under live traffic.
+"""
+import argparse
+import sys
 from pathlib import Path
 
-def migrate_database():
+from alembic import command
+from alembic.config import Config
+
+ROOT = Path(__file__).resolve().parent.parent.parent
+MIGRATIONS_DIR = Path(__file__).resolve().parent / "migrations"
+
+
+def get_config() -> Config:
+    """Alembic config pointing at app/db/migrations, independent of the working directory"""
+    ini_path = ROOT / "alembic.ini"
+    config = Config(str(ini_path)) if ini_path.exists() else Config()
+    config.set_main_option("script_location", str(MIGRATIONS_DIR))
+    return config
+
+
+def migrate_database(revision: str = "head") -> None:
     """
-    Add the firebase_uid column to the user table if it doesn't exist
+    Upgrade the database to a revision
+
+    Args:
+        revision: Target revision (default: latest)
     """
-    # Get the database path
-    db_path = Path(__file__).parent.parent.parent / "db.sqlite"
-    
-    if not os.path.exists(db_path):
-        print(f"Database file not found at {db_path}")
-        return
-    
-    print(f"Migrating database at {db_path}")
-    
-    # Connect to the database
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
-    # Check if the firebase_uid column exists in the user table
-    cursor.execute("PRAGMA table_info(user)")
-    columns = cursor.fetchall()
-    column_names = [column[1] for column in columns]
-    
-    if "firebase_uid" not in column_names:
-        print("Adding firebase_uid column to user table")
-        # Add the firebase_uid column
-        cursor.execute("ALTER TABLE user ADD COLUMN firebase_uid TEXT UNIQUE")
-        conn.commit()
-        print("Column added successfully")
-    else:
-        print("firebase_uid column already exists")
-    
-    # Close the connection
-    conn.close()
-    
-    print("Migration completed")
+    command.upgrade(get_config(), revision)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.db.migrate", description="Database schema migrations")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    upgrade = commands.add_parser("upgrade", help="Upgrade to a later revision")
+    upgrade.add_argument("revision", nargs="?", default="head")
+    upgrade.add_argument("--sql", action="store_true", help="Print SQL instead of executing it")
+
+    downgrade = commands.add_parser("downgrade", help="Revert to an earlier revision")
+    downgrade.add_argument("revision")
+    downgrade.add_argument("--sql", action="store_true", help="Print SQL instead of executing it")
+
+    commands.add_parser("current", help="Show the database's current revision")
+    commands.add_parser("history", help="List revisions")
+
+    stamp = commands.add_parser("stamp", help="Record a revision without running migrations")
+    stamp.add_argument("revision")
+
+    revision = commands.add_parser("revision", help="Create a new revision file")
+    revision.add_argument("-m", "--message", required=True)
+    revision.add_argument("--autogenerate", action="store_true", help="Diff the models against the database")
+
+    args = parser.parse_args(argv)
+    config = get_config()
+
+    if args.command == "upgrade":
+        command.upgrade(config, args.revision, sql=args.sql)
+    elif args.command == "downgrade":
+        command.downgrade(config, args.revision, sql=args.sql)
+    elif args.command == "current":
+        command.current(config, verbose=True)
+    elif args.command == "history":
+        command.history(config, verbose=True)
+    elif args.command == "stamp":
+        command.stamp(config, args.revision)
+    elif args.command == "revision":
+        command.revision(config, message=args.message, autogenerate=args.autogenerate)
+    return 0
+
 
 if __name__ == "__main__":
-    migrate_database()
+    sys.exit(main())
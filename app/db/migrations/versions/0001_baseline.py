@@ -0,0 +1,56 @@
+"""Baseline schema: user and vocabulary tables
+
+Databases created by SQLModel.metadata.create_all before migrations existed already
+have these tables, so each one is only created when missing.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-16 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Offline (--sql) runs cannot inspect the database; emit the full schema
+    tables = set() if op.get_context().as_sql else set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "user" not in tables:
+        op.create_table(
+            "user",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("username", sa.String(), nullable=False),
+            sa.Column("email", sa.String(), nullable=False),
+            sa.Column("full_name", sa.String(), nullable=False),
+            sa.Column("hashed_pw", sa.String(), nullable=False),
+            sa.Column("firebase_uid", sa.String(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+        )
+        op.create_index("ix_user_username", "user", ["username"], unique=True)
+        op.create_index("ix_user_firebase_uid", "user", ["firebase_uid"], unique=True)
+
+    if "vocabulary" not in tables:
+        op.create_table(
+            "vocabulary",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("user.id"), nullable=False),
+            sa.Column("word", sa.String(), nullable=False),
+            sa.Column("meaning", sa.String(), nullable=False),
+            sa.Column("example", sa.String(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+        )
+        op.create_index("ix_vocabulary_user_id", "vocabulary", ["user_id"])
+
+
+def downgrade() -> None:
+    op.drop_table("vocabulary")
+    op.drop_table("user")
@@ -0,0 +1,37 @@
+"""Add user.firebase_uid to databases created before Firebase sign-in
+
+Replaces the old SQLite-only app/db/migrate.py script. The column is part of the
+baseline, so this is a no-op on anything created from revision 0001.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-16 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, Sequence[str], None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if op.get_context().as_sql:
+        # Offline (--sql) output starts from the baseline, which already has the column
+        return
+    columns = {column["name"] for column in sa.inspect(op.get_bind()).get_columns("user")}
+    if "firebase_uid" in columns:
+        return
+    # SQLite cannot add a UNIQUE column in place, so uniqueness comes from the index
+    op.add_column("user", sa.Column("firebase_uid", sa.String(), nullable=True))
+    op.create_index("ix_user_firebase_uid", "user", ["firebase_uid"], unique=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    # The column belongs to the baseline schema; nothing to undo
+    pass
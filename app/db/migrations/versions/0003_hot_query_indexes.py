@@ -0,0 +1,84 @@
+"""Indexes for the hot read paths and per-user word uniqueness
+
+- ix_user_email: legacy account adoption by email on first Firebase login
+- ix_vocabulary_user_id_id: keyset pagination and quiz sampling (user_id = ? AND id > ?)
+- ix_vocabulary_user_id_created_at: per-user listings by creation time
+- uq_vocabulary_user_id_lower_word: one entry per word per user, case-insensitively
+
+On PostgreSQL every index is built with CREATE INDEX CONCURRENTLY outside a
+transaction, so the rollout does not block writes on live tables. A concurrent
+build that fails leaves an INVALID index behind; it is dropped and rebuilt on the
+next run.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-16 00:00:00
+
+"""
+from typing import List, Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, Sequence[str], None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (name, table, columns, unique)
+INDEXES = (
+    ("ix_user_email", "user", ["email"], False),
+    ("ix_vocabulary_user_id_id", "vocabulary", ["user_id", "id"], False),
+    ("ix_vocabulary_user_id_created_at", "vocabulary", ["user_id", "created_at"], False),
+    ("uq_vocabulary_user_id_lower_word", "vocabulary", ["user_id", sa.text("lower(word)")], True),
+)
+
+DUPLICATE_WORDS_SQL = sa.text(
+    "SELECT count(*) FROM (SELECT 1 FROM vocabulary GROUP BY user_id, lower(word) HAVING count(*) > 1) AS dup"
+)
+
+
+def _is_postgresql() -> bool:
+    return op.get_bind().dialect.name == "postgresql"
+
+
+def _drop_invalid(name: str) -> None:
+    invalid = op.get_bind().execute(sa.text(
+        "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+        "WHERE c.relname = :name AND NOT i.indisvalid"
+    ), {"name": name}).first()
+    if invalid:
+        op.drop_index(name, postgresql_concurrently=True)
+
+
+def _check_duplicate_words() -> None:
+    duplicates = op.get_bind().execute(DUPLICATE_WORDS_SQL).scalar()
+    if duplicates:
+        raise RuntimeError(
+            f"{duplicates} (user_id, lower(word)) groups in vocabulary have more than one row; "
+            "merge or delete the duplicates before building uq_vocabulary_user_id_lower_word"
+        )
+
+
+def _create(name: str, table: str, columns: List, unique: bool) -> None:
+    # Offline (--sql) runs cannot query the database, so the pre-checks are skipped
+    online = not op.get_context().as_sql
+    if online and unique and table == "vocabulary":
+        _check_duplicate_words()
+    if online and _is_postgresql():
+        _drop_invalid(name)
+    op.create_index(name, table, columns, unique=unique, if_not_exists=True, postgresql_concurrently=True)
+
+
+def upgrade() -> None:
+    # CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        for name, table, columns, unique in INDEXES:
+            _create(name, table, columns, unique)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
@@ -0,0 +1,54 @@
+"""Spaced-repetition review state per vocabulary word
+
+Every word gets a review row, due immediately, so the due queue is a single
+range scan on ix_review_user_id_due_at. Existing words are backfilled with
+due_at = created_at (oldest words first).
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-16 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, Sequence[str], None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_SQL = sa.text(
+    "INSERT INTO review (vocabulary_id, user_id, repetitions, interval_days, ease, lapses, due_at) "
+    "SELECT v.id, v.user_id, 0, 0, 2.5, 0, v.created_at FROM vocabulary v "
+    "WHERE NOT EXISTS (SELECT 1 FROM review r WHERE r.vocabulary_id = v.id)"
+)
+
+
+def upgrade() -> None:
+    # Offline (--sql) runs cannot inspect the database; emit the full schema
+    tables = set() if op.get_context().as_sql else set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "review" not in tables:
+        op.create_table(
+            "review",
+            sa.Column("vocabulary_id", sa.Integer(),
+                      sa.ForeignKey("vocabulary.id", ondelete="CASCADE"), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("user.id"), nullable=False),
+            sa.Column("repetitions", sa.Integer(), nullable=False),
+            sa.Column("interval_days", sa.Integer(), nullable=False),
+            sa.Column("ease", sa.Float(), nullable=False),
+            sa.Column("lapses", sa.Integer(), nullable=False),
+            sa.Column("due_at", sa.DateTime(), nullable=False),
+            sa.Column("last_reviewed_at", sa.DateTime(), nullable=True),
+        )
+    op.create_index("ix_review_user_id_due_at", "review", ["user_id", "due_at"], if_not_exists=True)
+    # Also covers words added between create_all and this migration
+    op.execute(BACKFILL_SQL)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_review_user_id_due_at", table_name="review", if_exists=True)
+    op.drop_table("review")
@@ -0,0 +1,71 @@
+"""Trigram indexes for vocabulary search (PostgreSQL only)
+
+- ix_vocabulary_word_trgm: GIN on (user_id, lower(word) gin_trgm_ops)
+- ix_vocabulary_meaning_trgm: GIN on (user_id, lower(meaning) gin_trgm_ops)
+
+They serve the prefix LIKE and similarity (%, <%) conditions of
+GET /vocabulary/search; btree_gin lets user_id share the index, so a lookup
+only touches the searching user's entries. Both extensions must be available
+on the server (they ship with PostgreSQL's contrib package). Indexes are built
+CONCURRENTLY, as in 0003. Other databases search through an in-process index
+and get no schema change.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-16 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, Sequence[str], None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+EXTENSIONS = ("pg_trgm", "btree_gin")
+
+# (name, indexed expression)
+INDEXES = (
+    ("ix_vocabulary_word_trgm", "lower(word)"),
+    ("ix_vocabulary_meaning_trgm", "lower(meaning)"),
+)
+
+
+def _is_postgresql() -> bool:
+    return op.get_bind().dialect.name == "postgresql"
+
+
+def _drop_invalid(name: str) -> None:
+    invalid = op.get_bind().execute(sa.text(
+        "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+        "WHERE c.relname = :name AND NOT i.indisvalid"
+    ), {"name": name}).first()
+    if invalid:
+        op.drop_index(name, postgresql_concurrently=True)
+
+
+def upgrade() -> None:
+    if not _is_postgresql():
+        return
+    for extension in EXTENSIONS:
+        op.execute(f"CREATE EXTENSION IF NOT EXISTS {extension}")
+    # CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        for name, expression in INDEXES:
+            if not op.get_context().as_sql:
+                _drop_invalid(name)
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} "
+                       f"ON vocabulary USING gin (user_id, {expression} gin_trgm_ops)")
+
+
+def downgrade() -> None:
+    if not _is_postgresql():
+        return
+    with op.get_context().autocommit_block():
+        for name, _ in reversed(INDEXES):
+            op.drop_index(name, table_name="vocabulary", if_exists=True, postgresql_concurrently=True)
+    # The extensions stay: other objects may depend on them
@@ -0,0 +1,240 @@
+"""Shared dictionary: deduplicated dictionary_entry plus a per-user user_vocabulary link
+
+Every vocabulary row becomes a user_vocabulary link with the same id (review rows
+and API ids are unchanged) to the dictionary_entry for its normalized (word,
+meaning), stored once however many users saved it. A link keeps its own example
+only when it differs from the entry's. Rows of one user that normalize to the
+same entry (e.g. words differing only in inner whitespace) are merged into the
+oldest one, whose review state is kept.
+
+The backfill is three set-based statements (entries, links, merged rows' reviews)
+rather than a loop over rows. Keys are computed in SQL: SQLite calls this module's
+normalize_key, registered on the connection, so the migration needs a live
+connection (no --sql); PostgreSQL uses the equivalent regexp_replace and lower,
+which agree with Python for the whitespace and letters vocabulary holds in practice.
+
+On PostgreSQL the trigram search indexes move from vocabulary (0005) to the
+entries' keys. They index the shared dictionary, so they are no longer per user:
+a search finds matching entries across every user's words, then keeps the
+searcher's through the (user_id, entry_id) unique index. Short, common queries
+thus touch more index entries than before. For small vocabularies the planner
+can instead walk the user's links and filter their entries. The vocabulary table
+is dropped; downgrade rebuilds it from the links.
+
+Run this before starting application code that uses the new tables: its startup
+create_all would otherwise create an empty user_vocabulary next to the old table.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-16 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, Sequence[str], None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+vocabulary = sa.table("vocabulary", sa.column("id"))
+user_vocabulary = sa.table("user_vocabulary", sa.column("id"))
+
+# (name, table, columns, unique)
+INDEXES = (
+    ("uq_dictionary_entry_word_key_meaning_key", "dictionary_entry", ["word_key", "meaning_key"], True),
+    ("ix_user_vocabulary_user_id_id", "user_vocabulary", ["user_id", "id"], False),
+    ("ix_user_vocabulary_user_id_created_at", "user_vocabulary", ["user_id", "created_at"], False),
+    ("uq_user_vocabulary_user_id_entry_id", "user_vocabulary", ["user_id", "entry_id"], True),
+    ("ix_user_vocabulary_entry_id", "user_vocabulary", ["entry_id"], False),
+)
+# PostgreSQL trigram indexes (name, table, indexed expression)
+ENTRY_TRGM_INDEXES = (
+    ("ix_dictionary_entry_word_key_trgm", "dictionary_entry", "word_key"),
+    ("ix_dictionary_entry_meaning_key_trgm", "dictionary_entry", "meaning_key"),
+)
+VOCABULARY_TRGM_INDEXES = (
+    ("ix_vocabulary_word_trgm", "vocabulary", "user_id, lower(word)"),
+    ("ix_vocabulary_meaning_trgm", "vocabulary", "user_id, lower(meaning)"),
+)
+# Indexes of the old table (0001 and 0003)
+VOCABULARY_INDEXES = (
+    ("ix_vocabulary_user_id", ["user_id"], False),
+    ("ix_vocabulary_user_id_id", ["user_id", "id"], False),
+    ("ix_vocabulary_user_id_created_at", ["user_id", "created_at"], False),
+    ("uq_vocabulary_user_id_lower_word", ["user_id", sa.text("lower(word)")], True),
+)
+
+# Lets batch mode on SQLite address review's unnamed foreign key
+REVIEW_NAMING = {"fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s"}
+
+DUPLICATE_WORDS_SQL = sa.text(
+    "SELECT count(*) FROM (SELECT 1 FROM user_vocabulary uv JOIN dictionary_entry e ON e.id = uv.entry_id "
+    "GROUP BY uv.user_id, lower(e.word) HAVING count(*) > 1) AS dup"
+)
+# Backfill statements, formatted with the dialect's key expression ({key}). Each
+# normalized (word, meaning) becomes one entry from its oldest row's spelling and
+# example, and each user keeps their oldest row per entry as the link.
+ENTRIES_SQL = (
+    "INSERT INTO dictionary_entry (word, meaning, example, word_key, meaning_key, created_at) "
+    "SELECT v.word, v.meaning, v.example, {key}(v.word), {key}(v.meaning), v.created_at "
+    "FROM vocabulary v WHERE v.id IN (SELECT min(id) FROM vocabulary GROUP BY {key}(word), {key}(meaning)) "
+    "ON CONFLICT (word_key, meaning_key) DO NOTHING"
+)
+LINKS_SQL = (
+    "INSERT INTO user_vocabulary (id, user_id, entry_id, example, mastery_level, notes, created_at) "
+    "SELECT v.id, v.user_id, e.id, CASE WHEN v.example = e.example THEN NULL ELSE v.example END, 0, NULL, "
+    "v.created_at FROM vocabulary v "
+    "JOIN dictionary_entry e ON e.word_key = {key}(v.word) AND e.meaning_key = {key}(v.meaning) "
+    "WHERE v.id IN (SELECT min(id) FROM vocabulary GROUP BY user_id, {key}(word), {key}(meaning)) "
+    "ON CONFLICT (user_id, entry_id) DO NOTHING"
+)
+# Reviews of the rows merged into an older one
+MERGED_REVIEWS_SQL = sa.text(
+    "DELETE FROM review WHERE vocabulary_id IN (SELECT v.id FROM vocabulary v "
+    "LEFT JOIN user_vocabulary uv ON uv.id = v.id WHERE uv.id IS NULL)"
+)
+# PostgreSQL's normalize_key, as a function of this session only
+PG_KEY_FUNCTION_SQL = sa.text(
+    "CREATE OR REPLACE FUNCTION pg_temp.normalize_key(text) RETURNS text IMMUTABLE LANGUAGE sql "
+    "AS $$ SELECT lower(btrim(regexp_replace($1, '\\s+', ' ', 'g'))) $$"
+)
+RESTORE_SQL = sa.text(
+    "INSERT INTO vocabulary (id, user_id, word, meaning, example, created_at) "
+    "SELECT uv.id, uv.user_id, e.word, e.meaning, COALESCE(uv.example, e.example), uv.created_at "
+    "FROM user_vocabulary uv JOIN dictionary_entry e ON e.id = uv.entry_id"
+)
+
+
+def normalize_key(text: str) -> str:
+    # Same as app.crud.vocabulary_statements.normalize_key; keys must match what the application computes
+    return " ".join(text.split()).lower()
+
+
+def _is_postgresql() -> bool:
+    return op.get_bind().dialect.name == "postgresql"
+
+
+def _require_online(direction: str) -> None:
+    if op.get_context().as_sql:
+        raise RuntimeError(f"Revision 0006 inspects the schema and normalizes keys with a function registered "
+                           f"on the connection, so it cannot be rendered with --sql; run the {direction} "
+                           f"against the database")
+
+
+def _key_function(bind) -> str:
+    """Name of a SQL function computing normalize_key on this connection"""
+    if _is_postgresql():
+        bind.execute(PG_KEY_FUNCTION_SQL)
+        return "pg_temp.normalize_key"
+    bind.connection.driver_connection.create_function("normalize_key", 1, normalize_key, deterministic=True)
+    return "normalize_key"
+
+
+def _create_tables(tables: set) -> None:
+    if "dictionary_entry" not in tables:
+        op.create_table(
+            "dictionary_entry",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("word", sa.String(), nullable=False),
+            sa.Column("meaning", sa.String(), nullable=False),
+            sa.Column("example", sa.String(), nullable=True),
+            sa.Column("word_key", sa.String(), nullable=False),
+            sa.Column("meaning_key", sa.String(), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+        )
+    if "user_vocabulary" not in tables:
+        op.create_table(
+            "user_vocabulary",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("user.id"), nullable=False),
+            sa.Column("entry_id", sa.Integer(), sa.ForeignKey("dictionary_entry.id"), nullable=False),
+            sa.Column("example", sa.String(), nullable=True),
+            sa.Column("mastery_level", sa.Integer(), nullable=False),
+            sa.Column("notes", sa.String(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+        )
+    for name, table, columns, unique in INDEXES:
+        op.create_index(name, table, columns, unique=unique, if_not_exists=True)
+
+
+def _backfill(bind) -> None:
+    if bind.execute(sa.select(sa.func.count()).select_from(user_vocabulary)).scalar():
+        if bind.execute(sa.select(sa.func.count()).select_from(vocabulary)).scalar():
+            raise RuntimeError("Both vocabulary and user_vocabulary have rows; the application wrote to the new "
+                               "tables before this migration ran. Reconcile them by hand, then upgrade.")
+        return
+    key = _key_function(bind)
+    bind.execute(sa.text(ENTRIES_SQL.format(key=key)))
+    bind.execute(sa.text(LINKS_SQL.format(key=key)))
+    bind.execute(MERGED_REVIEWS_SQL)
+
+
+def _sync_sequence(table: str) -> None:
+    # Rows were inserted with explicit ids; move the serial past them
+    op.execute(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+               f"(SELECT COALESCE(MAX(id), 0) + 1 FROM {table}), false)")
+
+
+def _point_reviews_at(bind, table: str) -> None:
+    """Re-target review.vocabulary_id's foreign key (ON DELETE CASCADE) at `table`"""
+    old = [fk for fk in sa.inspect(bind).get_foreign_keys("review")
+           if fk["constrained_columns"] == ["vocabulary_id"]]
+    if [fk["referred_table"] for fk in old] == [table]:
+        return
+    with op.batch_alter_table("review", naming_convention=REVIEW_NAMING) as batch_op:
+        for fk in old:
+            batch_op.drop_constraint(fk["name"] or REVIEW_NAMING["fk"] % {
+                "table_name": "review", "column_0_name": "vocabulary_id",
+                "referred_table_name": fk["referred_table"]}, type_="foreignkey")
+        batch_op.create_foreign_key("fk_review_vocabulary_id", table, ["vocabulary_id"], ["id"], ondelete="CASCADE")
+
+
+def _create_trgm(indexes) -> None:
+    for name, table, expression in indexes:
+        op.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin ({expression} gin_trgm_ops)")
+
+
+def upgrade() -> None:
+    _require_online("upgrade")
+    bind = op.get_bind()
+    tables = set(sa.inspect(bind).get_table_names())
+    _create_tables(tables)
+    if "vocabulary" in tables:
+        _backfill(bind)
+        _point_reviews_at(bind, "user_vocabulary")
+        op.drop_table("vocabulary")
+    if _is_postgresql():
+        _sync_sequence("user_vocabulary")
+        # New table, no concurrent writers yet: plain (transactional) builds
+        _create_trgm(ENTRY_TRGM_INDEXES)
+
+
+def downgrade() -> None:
+    _require_online("downgrade")
+    bind = op.get_bind()
+    duplicates = bind.execute(DUPLICATE_WORDS_SQL).scalar()
+    if duplicates:
+        raise RuntimeError(f"{duplicates} (user_id, lower(word)) groups have more than one meaning; the old "
+                           "vocabulary table allows one entry per word per user. Delete the extra words first.")
+    op.create_table(
+        "vocabulary",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("user.id"), nullable=False),
+        sa.Column("word", sa.String(), nullable=False),
+        sa.Column("meaning", sa.String(), nullable=False),
+        sa.Column("example", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+    )
+    bind.execute(RESTORE_SQL)
+    for name, columns, unique in VOCABULARY_INDEXES:
+        op.create_index(name, "vocabulary", columns, unique=unique)
+    if _is_postgresql():
+        _sync_sequence("vocabulary")
+        _create_trgm(VOCABULARY_TRGM_INDEXES)
+    _point_reviews_at(bind, "vocabulary")
+    op.drop_table("user_vocabulary")
+    op.drop_table("dictionary_entry")
@@ -0,0 +1,167 @@
+"""
+Per-request SQL statement accounting
+
+Cursor events on the engines attribute every statement and its duration to the
+request being served (tracked in a contextvar by QueryStatsMiddleware). The
+middleware then flags likely N+1 patterns: the same statement shape executed
+more than SQL_N_PLUS_ONE_THRESHOLD times in one request. Statements slower than
+SQL_SLOW_QUERY_MS are logged with their normalized SQL, never their parameters.
+"""
+import logging
+import re
+import time
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core import metrics
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+_STARTED_KEY = "query_stats_started"
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"(?<![\w.$])-?\d+(?:\.\d+)?\b")
+_BIND_PARAMETER = re.compile(r"%\(\w+\)s|%s|\$\d+|(?<!:):\w+|\?")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_VALUES_ROWS = re.compile(r"(\(\?\.\.\.\))(?:\s*,\s*\(\?\.\.\.\))+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def normalize(statement: str) -> str:
+    """
+    Reduce a statement to its shape: literals and bind parameters become "?",
+    IN lists and multi-row VALUES collapse, whitespace is squeezed
+
+    Args:
+        statement: SQL as sent to the DBAPI cursor
+
+    Returns:
+        The normalized SQL, equal for statements that differ only in values
+    """
+    shape = _STRING_LITERAL.sub("?", statement)
+    shape = _BIND_PARAMETER.sub("?", shape)
+    shape = _NUMBER_LITERAL.sub("?", shape)
+    shape = _PLACEHOLDER_LIST.sub("(?...)", shape)
+    shape = _VALUES_ROWS.sub(r"\1", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+
+class RequestQueries:
+    """Statements executed on behalf of one request"""
+
+    __slots__ = ("count", "seconds", "shapes")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        # normalized SQL -> executions
+        self.shapes: Dict[str, int] = {}
+
+    def record(self, shape: str, elapsed: float) -> None:
+        self.count += 1
+        self.seconds += elapsed
+        self.shapes[shape] = self.shapes.get(shape, 0) + 1
+
+    def repeated(self, threshold: int) -> Dict[str, int]:
+        """Shapes executed more than `threshold` times"""
+        return {shape: count for shape, count in self.shapes.items() if count > threshold}
+
+
+_current: ContextVar[Optional[RequestQueries]] = ContextVar("request_queries", default=None)
+
+
+def current() -> Optional[RequestQueries]:
+    """Statement totals of the request being served, or None outside a request"""
+    return _current.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault(_STARTED_KEY, []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get(_STARTED_KEY)
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    metrics.DB_STATEMENT_SECONDS.observe(elapsed)
+
+    queries = _current.get()
+    slow = elapsed * 1000.0 >= settings.SQL_SLOW_QUERY_MS
+    if queries is None and not slow:
+        return
+    shape = normalize(statement)
+    if queries is not None:
+        queries.record(shape, elapsed)
+    if slow:
+        metrics.DB_SLOW_STATEMENTS.inc()
+        logger.warning(f"Slow SQL ({elapsed * 1000.0:.1f} ms{', executemany' if executemany else ''}): {shape}")
+
+
+def _handle_error(exception_context):
+    # after_cursor_execute does not fire for failed statements; drop their start times
+    # (ExceptionContext.cursor is not always set, so do not rely on it)
+    connection = exception_context.connection
+    if connection is not None:
+        connection.info.pop(_STARTED_KEY, None)
+
+
+def instrument(engine: Engine) -> None:
+    """
+    Attribute every statement executed through an engine to the current request
+
+    Args:
+        engine: The Engine; pass AsyncEngine.sync_engine for async engines
+    """
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+class QueryStatsMiddleware:
+    """
+    ASGI middleware opening a statement account per request
+
+    Repeated statement shapes are logged when the request finishes. With DEBUG
+    on, the totals so far are added to the response headers
+    (X-DB-Query-Count, X-DB-Query-Time-Ms); statements run after the headers
+    were sent, e.g. by streaming responses, are only in the log.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        queries = RequestQueries()
+        token = _current.set(queries)
+
+        async def send_with_totals(message):
+            if message["type"] == "http.response.start" and settings.DEBUG:
+                headers = list(message.get("headers", []))
+                headers.append((b"x-db-query-count", str(queries.count).encode("latin-1")))
+                headers.append((b"x-db-query-time-ms", f"{queries.seconds * 1000.0:.2f}".encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_totals)
+        finally:
+            _current.reset(token)
+            repeated = queries.repeated(settings.SQL_N_PLUS_ONE_THRESHOLD)
+            if repeated:
+                metrics.DB_N_PLUS_ONE_REQUESTS.inc()
+                route = getattr(scope.get("route"), "path", None) or scope["path"]
+                for shape, count in repeated.items():
+                    logger.warning(f"Possible N+1 in {scope['method']} {route}: "
+                                   f"{count} executions of: {shape}")
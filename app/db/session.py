@@ -1,5 +1,9 @@
 from sqlmodel import create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from app.core import metrics
 from app.core.config import get_settings
+from app.db import query_stats
 from sqlalchemy.pool import QueuePool
 
 settings = get_settings()
@@ -22,6 +26,47 @@ if settings.DATABASE_URL.startswith("postgresql"):
 else:
     engine = create_engine(settings.DATABASE_URL, echo=False, connect_args=connect_args)
 
+def get_async_database_url(url: str) -> str:
+    """Swap the sync driver in a database URL for its asyncio counterpart"""
+    scheme, sep, rest = url.partition("://")
+    if scheme in ("postgresql", "postgres") or scheme.startswith("postgresql+"):
+        return f"postgresql+asyncpg{sep}{rest}"
+    if scheme == "sqlite" or scheme.startswith("sqlite+"):
+        return f"sqlite+aiosqlite{sep}{rest}"
+    return url
+
+# Async engine used by the API routers; the sync engine above stays for DDL and scripts
+if settings.DATABASE_URL.startswith("postgresql"):
+    async_engine = create_async_engine(
+        get_async_database_url(settings.DATABASE_URL),
+        echo=False,
+        pool_size=5,
+        max_overflow=10,
+        pool_timeout=30,
+        pool_recycle=1800,
+        pool_pre_ping=True,
+    )
+else:
+    async_engine = create_async_engine(get_async_database_url(settings.DATABASE_URL), echo=False)
+
+# expire_on_commit=False: attribute access after commit must not trigger lazy IO outside an await
+async_session_factory = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
+# Per-request statement accounting, slow statement log
+query_stats.instrument(engine)
+query_stats.instrument(async_engine.sync_engine)
+
+# Pool checkout wait and saturation for /metrics
+metrics.instrument_engine(engine, "sync")
+metrics.instrument_engine(async_engine.sync_engine, "async")
+_sync_session_seconds = metrics.DB_SESSION_SECONDS.labels("sync")
+_async_session_seconds = metrics.DB_SESSION_SECONDS.labels("async")
+
 def get_session():
-    with Session(engine) as session:
+    with _sync_session_seconds.time(), Session(engine) as session:
         yield session
+
+async def get_async_session():
+    with _async_session_seconds.time():
+        async with async_session_factory() as session:
+            yield session
@@ -0,0 +1,20 @@
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import Index
+from sqlmodel import SQLModel, Field
+
+class DictionaryEntry(SQLModel, table=True):
+    """A word and meaning stored once, shared by every learner who saved it; never updated"""
+    __tablename__ = "dictionary_entry"
+    # Mirrors migration 0006
+    __table_args__ = (
+        Index("uq_dictionary_entry_word_key_meaning_key", "word_key", "meaning_key", unique=True),
+    )
+
+    id         : Optional[int] = Field(default=None, primary_key=True)
+    word       : str
+    meaning    : str
+    example    : Optional[str] = None  # The first learner's example
+    word_key   : str  # crud.vocabulary_statements.normalize_key(word)
+    meaning_key: str  # crud.vocabulary_statements.normalize_key(meaning)
+    created_at : datetime = Field(default_factory=datetime.utcnow)
@@ -0,0 +1,22 @@
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import Column, ForeignKey, Index, Integer
+from sqlmodel import SQLModel, Field
+
+class Review(SQLModel, table=True):
+    """Spaced-repetition (SM-2) state of one vocabulary word; created with the word and due at once"""
+    # Mirrors migrations 0004 and 0006
+    __table_args__ = (
+        # Due queue: WHERE user_id = ? AND due_at <= now ORDER BY due_at LIMIT k
+        Index("ix_review_user_id_due_at", "user_id", "due_at"),
+    )
+
+    vocabulary_id   : int      = Field(sa_column=Column(
+        Integer, ForeignKey("user_vocabulary.id", ondelete="CASCADE"), primary_key=True))
+    user_id         : int      = Field(foreign_key="user.id")
+    repetitions     : int      = 0      # Consecutive correct answers
+    interval_days   : int      = 0
+    ease            : float    = 2.5
+    lapses          : int      = 0      # Times a learned word was forgotten
+    due_at          : datetime = Field(default_factory=datetime.utcnow)
+    last_reviewed_at: Optional[datetime] = None
@@ -5,7 +5,7 @@ from sqlmodel import SQLModel, Field
 class User(SQLModel, table=True):
     id         : Optional[int] = Field(default=None, primary_key=True)
     username   : str        = Field(index=True, unique=True)
-    email      : str
+    email      : str        = Field(index=True)
     full_name  : str
     hashed_pw  : str
     firebase_uid: Optional[str] = Field(default=None, index=True, unique=True)
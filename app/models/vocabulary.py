@@ -1,11 +1,26 @@
 from datetime import datetime
 from typing import Optional
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field
 
-class Vocabulary(SQLModel, table=True):
-    id        : Optional[int] = Field(default=None, primary_key=True)
-    user_id   : int        = Field(foreign_key="user.id", index=True)
-    word      : str
-    meaning   : str
-    example   : Optional[str] = None
-    created_at: datetime   = Field(default_factory=datetime.utcnow)
+class UserVocabulary(SQLModel, table=True):
+    """A learner's saved word: a link to a shared DictionaryEntry plus the learner's own fields"""
+    __tablename__ = "user_vocabulary"
+    # Mirrors migration 0006; create_all builds these on fresh databases. The PostgreSQL
+    # trigram search indexes on dictionary_entry need extensions and exist only through migrations
+    __table_args__ = (
+        # Keyset pagination and quiz sampling: WHERE user_id = ? AND id > ? ORDER BY id
+        Index("ix_user_vocabulary_user_id_id", "user_id", "id"),
+        Index("ix_user_vocabulary_user_id_created_at", "user_id", "created_at"),
+        # One link per entry per user
+        Index("uq_user_vocabulary_user_id_entry_id", "user_id", "entry_id", unique=True),
+        Index("ix_user_vocabulary_entry_id", "entry_id"),
+    )
+
+    id           : Optional[int] = Field(default=None, primary_key=True)
+    user_id      : int           = Field(foreign_key="user.id")
+    entry_id     : int           = Field(foreign_key="dictionary_entry.id")
+    example      : Optional[str] = None  # Only when it differs from the entry's example
+    mastery_level: int           = 0
+    notes        : Optional[str] = None
+    created_at   : datetime      = Field(default_factory=datetime.utcnow)
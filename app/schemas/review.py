@@ -0,0 +1,34 @@
+from datetime import datetime
+from typing import List, Optional
+from pydantic import BaseModel, Field
+
+class DueCard(BaseModel):
+    vocabulary_id: int
+    word         : str
+    meaning      : str
+    example      : Optional[str] = None
+    due_at       : datetime
+    repetitions  : int
+    interval_days: int
+    ease         : float
+    lapses       : int
+
+class ReviewAnswer(BaseModel):
+    vocabulary_id: int
+    quality      : int = Field(..., ge=0, le=5, description="0 = no recall ... 5 = perfect recall")
+
+class ReviewAnswers(BaseModel):
+    answers: List[ReviewAnswer] = Field(..., min_length=1)
+
+class ReviewState(BaseModel):
+    vocabulary_id   : int
+    repetitions     : int
+    interval_days   : int
+    ease            : float
+    lapses          : int
+    due_at          : datetime
+    last_reviewed_at: Optional[datetime] = None
+
+class ReviewAnswersReport(BaseModel):
+    updated  : List[ReviewState]
+    not_found: List[int]
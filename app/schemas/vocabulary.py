@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 from pydantic import BaseModel
 
 class VocabIn(BaseModel):
@@ -9,4 +9,24 @@ class VocabIn(BaseModel):
 
 class VocabOut(VocabIn):
     id        : int
-    created_at: datetime
\ No newline at end of file
+    created_at: datetime
+
+class VocabSearchHit(VocabOut):
+    match: str  # exact, prefix, meaning_prefix, fuzzy or meaning_fuzzy
+    score: float
+
+class VocabPage(BaseModel):
+    items      : List[VocabOut]
+    next_cursor: Optional[str] = None
+
+class VocabImportError(BaseModel):
+    row  : int
+    error: str
+
+class VocabImportReport(BaseModel):
+    received        : int
+    inserted        : int
+    duplicates      : int = 0
+    failed          : int
+    errors          : List[VocabImportError]
+    errors_truncated: bool = False
\ No newline at end of file
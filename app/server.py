@@ -0,0 +1,194 @@
+"""
+Production server: python -m app.server
+
+Runs main:app under gunicorn with SERVER_WORKERS uvicorn worker processes (one
+per available CPU by default), on uvloop and httptools when they are installed.
+All tuning comes from the SERVER_* settings:
+
+- SERVER_PRELOAD imports the app once in the master before forking, so workers
+  share its memory copy-on-write. Importing the app does no I/O (see
+  app.core.startup), so nothing connection-bound is inherited.
+- Workers restart after SERVER_MAX_REQUESTS requests, plus up to
+  SERVER_MAX_REQUESTS_JITTER so they don't all restart together.
+- On SIGTERM a worker first reports not ready (GET /health/ready answers 503)
+  while still serving for SERVER_DRAIN_SECONDS, so load balancers can take it
+  out of rotation. It then stops accepting connections and gives in-flight
+  requests SERVER_GRACEFUL_TIMEOUT seconds before the lifespan shutdown runs. A
+  second SIGTERM or a SIGINT skips the drain.
+- With DB_CREATE_ALL_ON_STARTUP, tables are created once here instead of by
+  every worker.
+- Behind a reverse proxy, set SERVER_FORWARDED_ALLOW_IPS to the proxy's address
+  (or "*" if nothing else can reach the workers) so X-Forwarded-For gives each
+  request its client's address. Otherwise every request appears to come from the
+  proxy, and the per-IP rate limits of anonymous requests are shared by all clients.
+- Metrics are kept per worker, and GET /metrics reports only the worker that
+  answered it (see app.core.metrics).
+
+Without gunicorn (e.g. on Windows) it falls back to uvicorn's own process
+manager, which has no preload and no drain delay.
+"""
+import logging
+import math
+import os
+import signal
+import sys
+import time
+from typing import Any, Dict
+
+import uvicorn
+
+from app.core import startup
+from app.core.config import get_settings
+
+try:
+    from gunicorn.app.base import BaseApplication
+    from gunicorn.arbiter import Arbiter
+    from uvicorn_worker import UvicornWorker
+except ImportError:  # not available on Windows; see the module docstring
+    BaseApplication = None
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+APP = "main:app"
+
+
+def _installed(module: str) -> bool:
+    try:
+        __import__(module)
+    except ImportError:
+        return False
+    return True
+
+
+LOOP = "uvloop" if _installed("uvloop") else "asyncio"
+HTTP = "httptools" if _installed("httptools") else "h11"
+
+
+def worker_count() -> int:
+    """SERVER_WORKERS, or the CPUs this process may run on when it is 0"""
+    if settings.SERVER_WORKERS > 0:
+        return settings.SERVER_WORKERS
+    if hasattr(os, "sched_getaffinity"):
+        return max(1, len(os.sched_getaffinity(0)))
+    return max(1, os.cpu_count() or 1)
+
+
+class DrainingServer(uvicorn.Server):
+    """uvicorn server that keeps serving, reported not ready, for a while after SIGTERM"""
+
+    def __init__(self, config: uvicorn.Config):
+        super().__init__(config)
+        self.drain_deadline = None
+
+    def handle_exit(self, sig: int, frame) -> None:
+        if sig == signal.SIGTERM and self.drain_deadline is None and settings.SERVER_DRAIN_SECONDS > 0:
+            startup.begin_drain()
+            self.drain_deadline = time.monotonic() + settings.SERVER_DRAIN_SECONDS
+            # A max-requests restart now would close the socket on clients not yet routed away
+            self.limit_max_requests = self.config.limit_max_requests = None
+            logger.info(f"Draining for {settings.SERVER_DRAIN_SECONDS}s before shutting down")
+            return
+        super().handle_exit(sig, frame)
+
+    async def on_tick(self, counter: int) -> bool:
+        if self.drain_deadline is not None and not self.should_exit and time.monotonic() >= self.drain_deadline:
+            super().handle_exit(signal.SIGTERM, None)
+        return await super().on_tick(counter)
+
+
+if BaseApplication is not None:
+    class Worker(UvicornWorker):
+        CONFIG_KWARGS = {"loop": LOOP, "http": HTTP, "timeout_graceful_shutdown": settings.SERVER_GRACEFUL_TIMEOUT,
+                         "proxy_headers": settings.SERVER_PROXY_HEADERS}
+
+        async def _serve(self) -> None:
+            # UvicornWorker._serve with the draining server: upstream has no hook for the
+            # server class. uvicorn-worker is pinned, and tests/test_server.py fails when
+            # this copy and upstream's drift apart
+            self.config.app = self.wsgi
+            server = DrainingServer(config=self.config)
+            self._install_sigquit_handler()
+            await server.serve(sockets=self.sockets)
+            if not server.started:
+                sys.exit(Arbiter.WORKER_BOOT_ERROR)
+
+    class Application(BaseApplication):
+        """gunicorn application configured from settings instead of the command line"""
+
+        def __init__(self, options: Dict[str, Any]):
+            self.options = options
+            super().__init__()
+
+        def load_config(self) -> None:
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from main import app
+            return app
+
+
+def gunicorn_options(workers: int) -> Dict[str, Any]:
+    return {
+        "bind": f"{settings.SERVER_HOST}:{settings.SERVER_PORT}",
+        "workers": workers,
+        "worker_class": Worker,
+        "preload_app": settings.SERVER_PRELOAD,
+        "max_requests": settings.SERVER_MAX_REQUESTS,
+        "max_requests_jitter": settings.SERVER_MAX_REQUESTS_JITTER,
+        "keepalive": settings.SERVER_KEEPALIVE_SECONDS,
+        "backlog": settings.SERVER_BACKLOG,
+        "timeout": settings.SERVER_WORKER_TIMEOUT,
+        # Read by the uvicorn workers; see the module docstring
+        "forwarded_allow_ips": settings.SERVER_FORWARDED_ALLOW_IPS,
+        # The master's SIGKILL deadline must cover the drain and the workers' own grace period
+        "graceful_timeout": math.ceil(settings.SERVER_DRAIN_SECONDS) + settings.SERVER_GRACEFUL_TIMEOUT + 5,
+        "errorlog": "-",
+        "accesslog": "-" if settings.SERVER_ACCESS_LOG else None,
+    }
+
+
+def _create_tables_once() -> None:
+    from app.db import init_db
+    from app.db.session import engine
+
+    init_db.init_db()
+    # Nothing connection-bound may survive into forked workers
+    engine.dispose()
+    # Preloaded workers share this settings object; others read the environment
+    settings.DB_CREATE_ALL_ON_STARTUP = False
+    os.environ["DB_CREATE_ALL_ON_STARTUP"] = "false"
+
+
+def run() -> None:
+    workers = worker_count()
+    if settings.DB_CREATE_ALL_ON_STARTUP and workers > 1:
+        _create_tables_once()
+    logger.info(f"Starting {workers} workers on {settings.SERVER_HOST}:{settings.SERVER_PORT} "
+                f"(loop {LOOP}, http {HTTP})")
+    if BaseApplication is not None:
+        Application(gunicorn_options(workers)).run()
+        return
+    options = {
+        "host": settings.SERVER_HOST,
+        "port": settings.SERVER_PORT,
+        "loop": LOOP,
+        "http": HTTP,
+        "backlog": settings.SERVER_BACKLOG,
+        "timeout_keep_alive": settings.SERVER_KEEPALIVE_SECONDS,
+        "limit_max_requests": settings.SERVER_MAX_REQUESTS or None,
+        "timeout_graceful_shutdown": settings.SERVER_GRACEFUL_TIMEOUT,
+        "access_log": settings.SERVER_ACCESS_LOG,
+        "proxy_headers": settings.SERVER_PROXY_HEADERS,
+        "forwarded_allow_ips": settings.SERVER_FORWARDED_ALLOW_IPS,
+    }
+    if workers == 1:
+        DrainingServer(uvicorn.Config(APP, **options)).run()
+    else:
+        uvicorn.run(APP, workers=workers, **options)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    run()
@@ -0,0 +1 @@
+"""Load benchmarks for the API; see benchmarks/run.py"""
@@ -0,0 +1,67 @@
+"""
+Compare two benchmark result files scenario by scenario
+
+    python -m benchmarks.compare benchmarks/results/<before>.json benchmarks/results/<after>.json
+
+Prints throughput and latency percentiles side by side with relative change;
+positive throughput and negative latency changes are improvements.
+"""
+import argparse
+import json
+import sys
+from typing import Any, Dict, Optional, Tuple
+
+METRICS = (
+    ("req/s", lambda r: r["throughput_rps"]),
+    ("p50", lambda r: r["latency_ms"]["p50"]),
+    ("p95", lambda r: r["latency_ms"]["p95"]),
+    ("p99", lambda r: r["latency_ms"]["p99"]),
+)
+
+
+def load(path: str) -> Tuple[Dict[str, Any], Dict[Tuple[str, int], Dict[str, Any]]]:
+    with open(path) as f:
+        report = json.load(f)
+    return report, {(r["scenario"], r["concurrency"]): r for r in report["results"]}
+
+
+def change(before: float, after: float) -> Optional[float]:
+    return (after - before) / before * 100.0 if before else None
+
+
+def label(report: Dict[str, Any], path: str) -> str:
+    git = report.get("git") or {}
+    commit = git.get("commit") or path
+    return f"{commit}{'+dirty' if git.get('dirty') else ''}"
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.compare", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("before")
+    parser.add_argument("after")
+    args = parser.parse_args(argv)
+
+    before_report, before = load(args.before)
+    after_report, after = load(args.after)
+    if before_report.get("parameters") != after_report.get("parameters"):
+        print("warning: the runs used different parameters", file=sys.stderr)
+
+    print(f"{label(before_report, args.before)} -> {label(after_report, args.after)}")
+    header = f"{'scenario':<14} {'c':>4}" + "".join(f" {name:>22}" for name, _ in METRICS)
+    print(header)
+    print("-" * len(header))
+    for key in sorted(set(before) & set(after)):
+        cells = []
+        for _, metric in METRICS:
+            old, new = metric(before[key]), metric(after[key])
+            delta = change(old, new)
+            cells.append(f" {old:>8.1f} {new:>8.1f} {'' if delta is None else f'{delta:+.0f}%':>4}")
+        print(f"{key[0]:<14} {key[1]:>4}" + "".join(cells))
+    for key in sorted(set(before) ^ set(after)):
+        print(f"{key[0]:<14} {key[1]:>4}  only in {'before' if key in before else 'after'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+"""
+Stand-ins for Firebase so benchmarks measure this service, not Google's
+
+With TOKEN_VERIFIER=local_issuer, ID tokens are real RS256 tokens from the
+app's local issuer, so verification costs what it does in production. Otherwise
+the fake verify_id_token accepts "bench:<uid>" and fails anything else like a bad
+signature. An optional delay makes the fake as slow as the real network call it
+replaces.
+"""
+import functools
+import itertools
+import time
+from dataclasses import dataclass
+from typing import Any, Dict
+
+TOKEN_PREFIX = "bench:"
+
+
+@functools.lru_cache(maxsize=None)
+def token_for(uid: str) -> str:
+    """ID token the configured verifier accepts for a uid (one per uid, like a client's)"""
+    from app.core import token_verifier
+    current = token_verifier.verifier()
+    if isinstance(current, token_verifier.LocalIssuer):
+        return current.issue(uid, email=email_for(uid))
+    return f"{TOKEN_PREFIX}{uid}"
+
+
+def email_for(uid: str) -> str:
+    return f"{uid}@bench.local"
+
+
+@dataclass
+class FakeUserRecord:
+    uid: str
+    email: str
+    display_name: str
+
+
+class FakeFirebase:
+    """Replaces the firebase_admin.auth functions the app calls"""
+
+    def __init__(self, latency_ms: float = 0.0, token_ttl: int = 3600):
+        self.latency = latency_ms / 1000.0
+        self.token_ttl = token_ttl
+        self.calls: Dict[str, int] = {}
+        self._uids = itertools.count()
+
+    def _call(self, name: str) -> None:
+        self.calls[name] = self.calls.get(name, 0) + 1
+        if self.latency:
+            # The app runs these on executor threads, so a blocking sleep is faithful
+            time.sleep(self.latency)
+
+    def verify_id_token(self, token: str, *args, **kwargs) -> Dict[str, Any]:
+        self._call("verify_id_token")
+        if not token.startswith(TOKEN_PREFIX):
+            raise ValueError("Invalid token")
+        uid = token[len(TOKEN_PREFIX):]
+        return {"uid": uid, "email": email_for(uid), "exp": time.time() + self.token_ttl}
+
+    def create_user(self, email: str, password: str = None, display_name: str = None, **kwargs) -> FakeUserRecord:
+        self._call("create_user")
+        return FakeUserRecord(uid=f"registered{next(self._uids)}", email=email, display_name=display_name)
+
+    def get_user_by_email(self, email: str) -> FakeUserRecord:
+        self._call("get_user_by_email")
+        uid = email.split("@", 1)[0]
+        return FakeUserRecord(uid=uid, email=email, display_name=uid)
+
+    def get_user(self, uid: str) -> FakeUserRecord:
+        self._call("get_user")
+        return FakeUserRecord(uid=uid, email=email_for(uid), display_name=uid)
+
+    def create_custom_token(self, uid: str, *args, **kwargs) -> bytes:
+        self._call("create_custom_token")
+        return f"custom:{uid}".encode()
+
+    def revoke_refresh_tokens(self, uid: str) -> None:
+        self._call("revoke_refresh_tokens")
+
+    def install(self) -> None:
+        """Patch firebase_admin.auth in place (before or after the app is imported)"""
+        from firebase_admin import auth
+        for name in ("verify_id_token", "create_user", "get_user_by_email", "get_user",
+                     "create_custom_token", "revoke_refresh_tokens"):
+            setattr(auth, name, getattr(self, name))
@@ -0,0 +1,288 @@
+"""
+Drive the ASGI app in-process and record throughput and latency percentiles
+
+    python -m benchmarks.run                                  # defaults below
+    python -m benchmarks.run --users 50 --words 2000 --concurrency 1,16,64 --requests 1000
+    python -m benchmarks.run --scenarios list,quiz --firebase-latency-ms 40
+    python -m benchmarks.run --scenarios verify_token --token-verifier firebase_admin
+    python -m benchmarks.compare before.json after.json
+
+Everything runs in one process: a fresh SQLite database, the in-memory L2 cache
+backend instead of Redis (CACHE_L2_BACKEND=memory), ID tokens from the app's
+local issuer (TOKEN_VERIFIER=local_issuer) and a fake Firebase for everything
+else (benchmarks/fakes.py). Requests go through httpx.AsyncClient over ASGITransport,
+so the numbers cover routing, dependencies, caches, database and serialization,
+but not a real network or server. Results are JSON, written to
+benchmarks/results/<commit>.json unless --output is given.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+DEFAULT_SCENARIOS = ("list", "list_user", "quiz", "add", "verify_token", "login", "register")
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20, help="Seeded users (default: 20)")
+    parser.add_argument("--words", type=int, default=500, help="Seeded words per user (default: 500)")
+    parser.add_argument("--concurrency", default="1,8,32",
+                        help="Comma-separated in-flight request levels (default: 1,8,32)")
+    parser.add_argument("--requests", type=int, default=300, help="Measured requests per scenario and level")
+    parser.add_argument("--warmup", type=int, default=20, help="Unmeasured requests per scenario first")
+    parser.add_argument("--scenarios", default=",".join(DEFAULT_SCENARIOS),
+                        help=f"Comma-separated subset of: {', '.join(DEFAULT_SCENARIOS)}")
+    parser.add_argument("--page-size", type=int, default=100, help="limit= for the listing scenarios")
+    parser.add_argument("--quiz-questions", type=int, default=10, help="num_questions= for the quiz scenario")
+    parser.add_argument("--firebase-latency-ms", type=float, default=0.0,
+                        help="Simulated latency of every fake Firebase call")
+    parser.add_argument("--token-verifier", choices=("local_issuer", "firebase_admin"), default="local_issuer",
+                        help="local_issuer verifies real signatures; firebase_admin uses the fake "
+                             "(default: local_issuer)")
+    parser.add_argument("--seed", type=int, default=1234, help="RNG seed for users picked per request")
+    parser.add_argument("--database", help="SQLite file to use (default: a temporary file)")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/<commit>.json)")
+    return parser.parse_args(argv)
+
+
+def configure_environment(args: argparse.Namespace) -> str:
+    """Point the app settings at throwaway infrastructure; must run before importing the app"""
+    database = args.database or os.path.join(tempfile.mkdtemp(prefix="toeic-bench-"), "bench.sqlite")
+    if os.path.exists(database):
+        os.remove(database)
+    os.environ["DATABASE_URL"] = f"sqlite:///{database}"
+    os.environ["CACHE_L2_BACKEND"] = "memory"
+    os.environ["TOKEN_VERIFIER"] = args.token_verifier
+    # A few synthetic users make thousands of requests; measure the app, not the limiter
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+    return database
+
+
+def git_revision() -> Dict[str, Any]:
+    def git(*command: str) -> Optional[str]:
+        try:
+            return subprocess.run(("git",) + command, cwd=ROOT, capture_output=True, text=True,
+                                  check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+    return {
+        "commit": git("rev-parse", "--short", "HEAD"),
+        "subject": git("log", "-1", "--format=%s"),
+        "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+    }
+
+
+def seed(users: int, words: int) -> List[str]:
+    """Insert synthetic users and vocabulary directly through the sync engine"""
+    from sqlalchemy import insert
+    from app.crud import async_review
+    from app.crud.vocabulary_statements import entry_values
+    from app.db.session import engine
+    from app.models.dictionary import DictionaryEntry
+    from app.models.review import Review
+    from app.models.user import User
+    from app.models.vocabulary import UserVocabulary
+    from benchmarks.fakes import email_for
+
+    uids = [f"benchuser{i}" for i in range(users)]
+    now = datetime.utcnow()
+    with engine.begin() as connection:
+        result = connection.execute(insert(User).returning(User.id, User.firebase_uid), [
+            {"username": uid, "email": email_for(uid), "full_name": uid, "hashed_pw": "firebase_auth",
+             "firebase_uid": uid, "created_at": now} for uid in uids])
+        user_ids = [row[0] for row in result]
+        # Every user saves the same word list, as learners of one course do
+        result = connection.execute(insert(DictionaryEntry).returning(DictionaryEntry.id), [
+            entry_values(f"word{n}", f"meaning of word {n}",
+                         f"An example sentence using word {n}." if n % 3 == 0 else None, now)
+            for n in range(words)])
+        entry_ids = [row[0] for row in result]
+        for user_id in user_ids:
+            result = connection.execute(insert(UserVocabulary).returning(UserVocabulary.id), [
+                {"user_id": user_id, "entry_id": entry_id, "created_at": now} for entry_id in entry_ids])
+            # Every word has review state, as when added through the API
+            connection.execute(insert(Review), async_review.new_rows(user_id, [row[0] for row in result], now))
+    return uids
+
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    if not ordered:
+        return 0.0
+    rank = max(1, min(len(ordered), int(round(fraction * len(ordered) + 0.5))))
+    return ordered[rank - 1]
+
+
+Request = Callable[[], Dict[str, Any]]
+
+
+def build_scenarios(args: argparse.Namespace, uids: List[str]) -> Dict[str, Request]:
+    """scenario name -> function returning the next request's httpx arguments"""
+    from benchmarks.fakes import email_for, token_for
+
+    rng = random.Random(args.seed)
+    counter = itertools.count()
+
+    def user_headers() -> Dict[str, str]:
+        return {"Authorization": f"Bearer {token_for(rng.choice(uids))}"}
+
+    def add() -> Dict[str, Any]:
+        n = next(counter)
+        return {"method": "POST", "url": "/vocabulary/", "headers": user_headers(),
+                "json": {"word": f"bench-added-{n}", "meaning": f"added meaning {n}"}}
+
+    def register() -> Dict[str, Any]:
+        n = next(counter)
+        return {"method": "POST", "url": "/auth/register",
+                "json": {"username": f"registered-{n}", "password": "bench-password",
+                         "email": f"registered-{n}@bench.local", "full_name": f"Registered {n}"}}
+
+    return {
+        "list": lambda: {"method": "GET", "url": "/vocabulary/", "headers": user_headers(),
+                         "params": {"limit": args.page_size}},
+        "list_user": lambda: {"method": "GET", "url": "/vocabulary/user", "headers": user_headers(),
+                              "params": {"limit": min(args.page_size, 100)}},
+        "quiz": lambda: {"method": "GET", "url": "/quiz/generate/", "headers": user_headers(),
+                         "params": {"num_questions": args.quiz_questions}},
+        "add": add,
+        "verify_token": lambda: {"method": "POST", "url": "/auth/verify-token", "headers": user_headers()},
+        "login": lambda: {"method": "POST", "url": "/auth/login",
+                          "data": {"username": email_for(rng.choice(uids)), "password": "unused"}},
+        "register": register,
+    }
+
+
+async def measure(client, next_request: Request, total: int, concurrency: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    remaining = itertools.count()
+
+    async def worker() -> None:
+        while next(remaining) < total:
+            request = next_request()
+            started = time.perf_counter()
+            response = await client.request(**request)
+            await response.aread()
+            latencies.append((time.perf_counter() - started) * 1000.0)
+            statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    errors = sum(count for status, count in statuses.items() if not status.startswith("2"))
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "status_codes": statuses,
+        "duration_s": round(elapsed, 4),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+            "p50": round(percentile(latencies, 0.50), 3),
+            "p95": round(percentile(latencies, 0.95), 3),
+            "p99": round(percentile(latencies, 0.99), 3),
+            "max": round(latencies[-1], 3) if latencies else 0.0,
+        },
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    import httpx
+    from benchmarks.fakes import FakeFirebase
+
+    firebase = FakeFirebase(latency_ms=args.firebase_latency_ms)
+    # Imported late: settings must see the environment configured above
+    import main as app_main
+    # After the import, so real credentials from a developer .env are never used either
+    firebase.install()
+
+    levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    seeding_started = time.perf_counter()
+    # Seeding runs before the app's lifespan, which is what normally creates the tables
+    from app.db import init_db
+    init_db.init_db()
+    uids = seed(args.users, args.words)
+    seeding_s = time.perf_counter() - seeding_started
+    scenarios = build_scenarios(args, uids)
+    unknown = [name for name in names if name not in scenarios]
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(unknown)}")
+
+    results = []
+    async with app_main.app.router.lifespan_context(app_main.app):
+        transport = httpx.ASGITransport(app=app_main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for name in names:
+                if args.warmup:
+                    await measure(client, scenarios[name], args.warmup, 1)
+                for concurrency in levels:
+                    result = await measure(client, scenarios[name], args.requests, concurrency)
+                    results.append({"scenario": name, "concurrency": concurrency, **result})
+                    latency = result["latency_ms"]
+                    print(f"{name:<14} c={concurrency:<4} {result['throughput_rps']:>9.1f} req/s  "
+                          f"p50 {latency['p50']:>8.2f}  p95 {latency['p95']:>8.2f}  p99 {latency['p99']:>8.2f} ms"
+                          f"  errors {result['errors']}", file=sys.stderr)
+
+    return {
+        "schema": 1,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "git": git_revision(),
+        "environment": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "parameters": {
+            "users": args.users,
+            "words_per_user": args.words,
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "concurrency": levels,
+            "scenarios": names,
+            "page_size": args.page_size,
+            "quiz_questions": args.quiz_questions,
+            "firebase_latency_ms": args.firebase_latency_ms,
+            "token_verifier": args.token_verifier,
+            "seed": args.seed,
+        },
+        "seeding_s": round(seeding_s, 3),
+        "firebase_calls": firebase.calls,
+        "results": results,
+    }
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    configure_environment(args)
+    sys.path.insert(0, str(ROOT))
+    report = asyncio.run(run(args))
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{report['git']['commit'] or 'unversioned'}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2) + "\n")
+    print(f"Wrote {output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""
+Profile cold start: what importing the app costs, and how long until a worker is ready
+
+    python -m benchmarks.startup                       # import profile and 3 cold starts
+    python -m benchmarks.startup --top 40 --runs 5 --output startup.json
+
+The import profile comes from `python -X importtime -c "import main"` in a fresh
+interpreter: the slowest modules by cumulative and by self time, and self time
+summed per top-level package. Each cold start is another fresh interpreter that
+imports main, runs the lifespan startup and waits for readiness, reporting the
+app's own phase timings. Both use the benchmark environment (a temporary SQLite
+database, the in-memory L2 cache), so Redis and a real database are not part of
+the numbers.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+
+_IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+COLD_START = r"""
+import asyncio, json, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+from app.core import startup
+
+async def go():
+    async with main.app.router.lifespan_context(main.app):
+        serving = time.perf_counter()
+        while not startup.is_ready():
+            await asyncio.sleep(0.001)
+        ready = time.perf_counter()
+        print(json.dumps({
+            "import_ms": (imported - started) * 1000,
+            "serving_ms": (serving - started) * 1000,
+            "ready_ms": (ready - started) * 1000,
+            "phases_ms": startup.report()["phases_ms"],
+        }))
+
+asyncio.run(go())
+"""
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.startup", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=25, help="Modules listed per ranking (default: 25)")
+    parser.add_argument("--runs", type=int, default=3, help="Cold starts to time (default: 3)")
+    parser.add_argument("--output", help="Also write the report as JSON to this file")
+    return parser.parse_args(argv)
+
+
+def environment() -> Dict[str, str]:
+    """The benchmark's throwaway settings, for child interpreters"""
+    database = os.path.join(tempfile.mkdtemp(prefix="toeic-startup-"), "startup.sqlite")
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{database}", CACHE_L2_BACKEND="memory")
+    env.setdefault("SECRET_KEY", "benchmark-secret")
+    return env
+
+
+def import_profile(env: Dict[str, str]) -> List[Dict[str, Any]]:
+    """Modules imported by `import main`, with self and cumulative times in ms"""
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=ROOT, env=env,
+                               capture_output=True, text=True, check=True)
+    modules = []
+    for line in completed.stderr.splitlines():
+        match = _IMPORT_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append({"module": name, "depth": len(indent) // 2, "self_ms": int(self_us) / 1000,
+                            "cumulative_ms": int(cumulative_us) / 1000})
+    return modules
+
+
+def cold_start(env: Dict[str, str]) -> Dict[str, Any]:
+    """One fresh interpreter from launch to ready"""
+    launched = time.perf_counter()
+    completed = subprocess.run([sys.executable, "-c", COLD_START], cwd=ROOT, env=env, capture_output=True,
+                               text=True, check=True)
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["process_ms"] = (time.perf_counter() - launched) * 1000
+    return result
+
+
+def summarize(modules: List[Dict[str, Any]], starts: List[Dict[str, Any]], top: int) -> Dict[str, Any]:
+    packages: Dict[str, float] = {}
+    for module in modules:
+        package = module["module"].split(".")[0]
+        packages[package] = packages.get(package, 0.0) + module["self_ms"]
+    main = next((m for m in modules if m["module"] == "main"), None)
+    medians = {key: statistics.median(start[key] for start in starts)
+               for key in ("import_ms", "serving_ms", "ready_ms", "process_ms")} if starts else {}
+    return {
+        "import_total_ms": main["cumulative_ms"] if main else None,
+        "modules": len(modules),
+        "by_cumulative": sorted(modules, key=lambda m: -m["cumulative_ms"])[:top],
+        "by_self": sorted(modules, key=lambda m: -m["self_ms"])[:top],
+        "by_package": dict(sorted(packages.items(), key=lambda item: -item[1])[:top]),
+        "cold_start_median_ms": medians,
+        "cold_starts": starts,
+    }
+
+
+def render(report: Dict[str, Any]) -> str:
+    lines = [f"import main: {report['import_total_ms']:.1f} ms over {report['modules']} modules", "",
+             "slowest by cumulative time (ms):"]
+    lines += [f"  {m['cumulative_ms']:>9.1f}  {'  ' * m['depth']}{m['module']}" for m in report["by_cumulative"]]
+    lines += ["", "slowest by self time (ms):"]
+    lines += [f"  {m['self_ms']:>9.1f}  {m['module']}" for m in report["by_self"]]
+    lines += ["", "self time per top-level package (ms):"]
+    lines += [f"  {ms:>9.1f}  {package}" for package, ms in report["by_package"].items()]
+    medians = report["cold_start_median_ms"]
+    if medians:
+        lines += ["", f"cold start, median of {len(report['cold_starts'])} (ms): "
+                      f"imported {medians['import_ms']:.1f}, serving {medians['serving_ms']:.1f}, "
+                      f"ready {medians['ready_ms']:.1f}, process total {medians['process_ms']:.1f}",
+                  "last run's phases (ms): " + ", ".join(
+                      f"{name} {ms}" for name, ms in report["cold_starts"][-1]["phases_ms"].items())]
+    return "\n".join(lines)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    env = environment()
+    modules = import_profile(env)
+    starts = [cold_start(env) for _ in range(args.runs)]
+    report = summarize(modules, starts, args.top)
+    print(render(report), file=sys.stderr)
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2) + "\n")
+        print(f"Wrote {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,24 +1,74 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.routers import auth, vocabulary, quiz
-from app.db import init_db
+from fastapi.responses import JSONResponse
+from app.api.routers import auth, vocabulary, quiz, review
+from app.db import query_stats
+from app.core import executor, metrics, quiz_pool, rate_limit, redis as cache, startup, tiered_cache
 
-init_db.init_db()
+# No I/O at import time: tables, Firebase and connection warm-up happen in the lifespan
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await startup.startup()
+    yield
+    await startup.shutdown()
 
-app = FastAPI(title="TOEIC Learning API")
+app = FastAPI(title="TOEIC Learning API", lifespan=lifespan)
 
+# Inside CORS, so 429/413/414 responses still carry the CORS headers browsers need
+app.add_middleware(rate_limit.RateLimitMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Offset-mode vocabulary listings point at their next page in these
+    expose_headers=["X-Next-Cursor", "Link"],
 )
+app.add_middleware(query_stats.QueryStatsMiddleware)
+# Added last so it wraps everything, including CORS preflight responses
+app.add_middleware(metrics.RequestMetricsMiddleware)
 
 app.include_router(auth.router)
 app.include_router(vocabulary.router)
 app.include_router(quiz.router)
+app.include_router(review.router)
 
+@app.get("/health/live", tags=["health"])
+def liveness():
+    return {"status": "ok"}
+
+@app.get("/health/ready", tags=["health"])
+def readiness():
+    """503 until startup warm-up has finished, and again once shutdown begins"""
+    return JSONResponse(startup.report(), status_code=200 if startup.is_ready() else 503)
+
+@app.get("/metrics", tags=["metrics"], include_in_schema=False)
+def prometheus_metrics():
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/metrics/executor", tags=["metrics"])
+def executor_metrics():
+    return executor.stats()
+
+@app.get("/metrics/redis", tags=["metrics"])
+def redis_metrics():
+    return cache.stats()
+
+@app.get("/metrics/cache", tags=["metrics"])
+def cache_metrics():
+    return tiered_cache.stats()
+
+@app.get("/metrics/quiz-pool", tags=["metrics"])
+def quiz_pool_metrics():
+    return quiz_pool.stats()
+
+@app.get("/metrics/rate-limit", tags=["metrics"])
+def rate_limit_metrics():
+    return rate_limit.stats()
+
+# Single-process development server; production runs python -m app.server
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=7860)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=7860)
@@ -0,0 +1,31 @@
+"""
+Shared test setup
+
+Settings are read once, on first import of app.core.config, so the environment
+is pinned here before any test module imports the application: no .env secrets,
+SQLite instead of PostgreSQL, the in-process cache backend instead of Redis, and
+tokens from the local issuer with a throwaway key.
+"""
+import asyncio
+import os
+import random
+import tempfile
+
+import pytest
+
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("DATABASE_URL", "sqlite:///./test.sqlite")
+os.environ.setdefault("CACHE_L2_BACKEND", "memory")
+os.environ.setdefault("TOKEN_VERIFIER", "local_issuer")
+os.environ.setdefault("TOKEN_ISSUER_KEY_PATH", os.path.join(tempfile.mkdtemp(), "issuer.pem"))
+
+
+@pytest.fixture
+def run():
+    """Run a coroutine to completion (the suite does not depend on an asyncio plugin)"""
+    return asyncio.run
+
+
+@pytest.fixture
+def rng():
+    return random.Random(1234)
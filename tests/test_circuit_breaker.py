@@ -0,0 +1,106 @@
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError, ResponseError
+
+from app.core import redis as cache
+from app.core.redis import CircuitBreaker
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    return clock
+
+
+@pytest.fixture
+def breaker(monkeypatch, clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=5)
+    monkeypatch.setattr(cache, "breaker", breaker)
+    return breaker
+
+
+def test_opens_after_consecutive_failures(breaker):
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()  # resets the streak
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow() and not breaker.allow()
+    assert breaker.stats()["rejected_total"] == 2
+    assert breaker.stats()["opened_total"] == 1
+
+
+def test_half_open_lets_one_probe_through(breaker, clock):
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now += 4.9
+    assert not breaker.allow()
+    clock.now += 0.1
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()  # the probe is still out
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+
+
+def test_failed_probe_reopens(breaker, clock):
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now += 5
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    clock.now += 5
+    assert breaker.allow()
+
+
+def test_released_probe_can_be_retried(breaker, clock):
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now += 5
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+
+
+def _raise(error):
+    def operation(client):
+        raise error
+    return operation
+
+
+def test_call_judges_only_unavailability(breaker):
+    assert cache.call(_raise(RedisConnectionError("down")), default="d") == "d"
+    assert breaker.failures == 1
+    # A command error means Redis answered
+    assert cache.call(_raise(ResponseError("WRONGTYPE")), default="d") == "d"
+    assert breaker.failures == 0
+    assert cache.call(lambda client: "value") == "value"
+
+
+def test_call_frees_the_probe_when_the_operation_raises(breaker, clock, run):
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now += 5
+    assert cache.call(_raise(KeyError("bug")), default="d") == "d"
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+    async def operation(client):
+        raise TypeError("bug")
+    assert run(cache.call_async(operation, default="d")) == "d"
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert cache.call(lambda client: "value") == "value"
+    assert breaker.state == CircuitBreaker.CLOSED
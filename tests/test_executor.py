@@ -0,0 +1,45 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.core.executor import Lane
+
+
+def test_cancelled_caller_keeps_its_slot_until_the_call_ends(run):
+    lane = Lane("test", lambda: ThreadPoolExecutor(max_workers=1), workers=1, max_pending=1)
+    release = threading.Event()
+
+    async def go():
+        first = asyncio.ensure_future(lane.run(release.wait))
+        await asyncio.sleep(0.05)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        # The call is still running on the worker: it holds the only slot
+        assert lane.stats()["in_flight"] == 1
+        second = asyncio.ensure_future(lane.run(lambda: "second"))
+        await asyncio.sleep(0.05)
+        assert lane.stats()["waiting"] == 1 and not second.done()
+        release.set()
+        assert await asyncio.wait_for(second, 5) == "second"
+        return lane.stats()
+
+    try:
+        stats = run(go())
+    finally:
+        release.set()
+        lane.shutdown()
+    assert (stats["in_flight"], stats["completed_total"], stats["failed_total"]) == (0, 2, 0)
+
+
+def test_failures_are_counted_and_raised(run):
+    lane = Lane("test", lambda: ThreadPoolExecutor(max_workers=1), workers=1, max_pending=1)
+    try:
+        with pytest.raises(ZeroDivisionError):
+            run(lane.run(lambda: 1 / 0))
+        assert run(lane.run(lambda: 2)) == 2
+    finally:
+        lane.shutdown()
+    assert (lane.in_flight, lane.completed_total, lane.failed_total) == (0, 2, 1)
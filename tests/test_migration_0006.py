@@ -0,0 +1,98 @@
+"""Revision 0006 on SQLite: backfill into the shared dictionary, then back"""
+import os
+import sqlite3
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+
+USERS = [(1, "ann", "ann@x.com", "Ann", "x", "2026-01-01 00:00:00"),
+         (2, "bob", "bob@x.com", "Bob", "x", "2026-01-01 00:00:00")]
+# (id, user_id, word, meaning, example, created_at)
+VOCABULARY = [
+    (1, 1, "Apple", "a fruit", "An apple a day", "2026-01-02 00:00:00"),
+    (2, 2, "apple ", "A  fruit", "Green apples", "2026-01-03 00:00:00"),
+    (3, 1, "ice cream", "dessert", None, "2026-01-04 00:00:00"),
+    # Same entry as 3 once normalized: merged into the older row
+    (4, 1, "ice  cream", "dessert", None, "2026-01-05 00:00:00"),
+    (5, 2, "dog", "an animal", None, "2026-01-06 00:00:00"),
+]
+REVIEWS = [(vocabulary_id, user_id, 1, 1, 2.5, 0, "2026-02-01 00:00:00", None)
+           for vocabulary_id, user_id, *_ in VOCABULARY if vocabulary_id != 5]
+
+
+def migrate(database: Path, *args):
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{database}", "SECRET_KEY": "test-secret"}
+    result = subprocess.run([sys.executable, "-m", "app.db.migrate", *args], cwd=ROOT, env=env,
+                            capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = tmp_path / "migration.sqlite"
+    migrate(path, "upgrade", "0005")
+    with sqlite3.connect(path) as connection:
+        connection.executemany(
+            'INSERT INTO "user" (id, username, email, full_name, hashed_pw, created_at) VALUES (?, ?, ?, ?, ?, ?)',
+            USERS)
+        connection.executemany("INSERT INTO vocabulary VALUES (?, ?, ?, ?, ?, ?)", VOCABULARY)
+        connection.executemany("INSERT INTO review VALUES (?, ?, ?, ?, ?, ?, ?, ?)", REVIEWS)
+    return path
+
+
+def tables(connection):
+    return {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def test_upgrade_and_downgrade(database):
+    migrate(database, "upgrade", "0006")
+    with sqlite3.connect(database) as connection:
+        assert "vocabulary" not in tables(connection)
+        entries = {row[1:]: row[0] for row in connection.execute(
+            "SELECT id, word_key, meaning_key FROM dictionary_entry")}
+        assert set(entries) == {("apple", "a fruit"), ("ice cream", "dessert"), ("dog", "an animal")}
+        # Links keep the vocabulary ids; an example only where it differs from the entry's
+        links = connection.execute(
+            "SELECT id, user_id, entry_id, example FROM user_vocabulary ORDER BY id").fetchall()
+        assert links == [
+            (1, 1, entries["apple", "a fruit"], None),
+            (2, 2, entries["apple", "a fruit"], "Green apples"),
+            (3, 1, entries["ice cream", "dessert"], None),
+            (5, 2, entries["dog", "an animal"], None),
+        ]
+        # The entry takes the oldest row's spelling and example
+        assert connection.execute("SELECT word, meaning, example FROM dictionary_entry WHERE id = ?",
+                                  (entries["apple", "a fruit"],)).fetchone() == ("Apple", "a fruit", "An apple a day")
+        # The merged row's review goes with it
+        assert [row[0] for row in connection.execute("SELECT vocabulary_id FROM review ORDER BY 1")] == [1, 2, 3]
+        foreign_keys = connection.execute("PRAGMA foreign_key_list(review)").fetchall()
+        assert [(fk[2], fk[3]) for fk in foreign_keys if fk[3] == "vocabulary_id"] == [("user_vocabulary", "vocabulary_id")]
+
+    migrate(database, "downgrade", "0005")
+    with sqlite3.connect(database) as connection:
+        assert {"dictionary_entry", "user_vocabulary"}.isdisjoint(tables(connection))
+        assert connection.execute(
+            "SELECT id, user_id, word, meaning, example FROM vocabulary ORDER BY id").fetchall() == [
+            (1, 1, "Apple", "a fruit", "An apple a day"),
+            (2, 2, "Apple", "a fruit", "Green apples"),
+            (3, 1, "ice cream", "dessert", None),
+            (5, 2, "dog", "an animal", None),
+        ]
+        assert [row[0] for row in connection.execute("SELECT vocabulary_id FROM review ORDER BY 1")] == [1, 2, 3]
+        foreign_keys = connection.execute("PRAGMA foreign_key_list(review)").fetchall()
+        assert [(fk[2], fk[3]) for fk in foreign_keys if fk[3] == "vocabulary_id"] == [("vocabulary", "vocabulary_id")]
+
+
+def test_upgrade_on_an_empty_database(tmp_path):
+    path = tmp_path / "empty.sqlite"
+    migrate(path, "upgrade", "head")
+    with sqlite3.connect(path) as connection:
+        assert {"dictionary_entry", "user_vocabulary"} <= tables(connection)
+        assert "vocabulary" not in tables(connection)
+    migrate(path, "downgrade", "0005")
+    with sqlite3.connect(path) as connection:
+        assert "vocabulary" in tables(connection)
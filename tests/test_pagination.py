@@ -0,0 +1,81 @@
+import base64
+import json
+
+import pytest
+from starlette.requests import Request
+
+from app.api.routers.vocabulary import _offset_response
+from app.core.pagination import decode_cursor, encode_cursor, page_after
+
+
+def test_cursor_round_trip():
+    for last_id in (0, 1, 41, 2 ** 40):
+        cursor = encode_cursor(last_id)
+        assert "=" not in cursor
+        assert decode_cursor(cursor) == last_id
+
+
+def test_empty_cursor_is_first_page():
+    assert decode_cursor("") == 0
+
+
+@pytest.mark.parametrize("cursor", [
+    "not a cursor",
+    "e30",  # {}
+    encode_cursor(5)[:-2],
+    base64.urlsafe_b64encode(b'{"v":2,"id":5}').decode(),
+    base64.urlsafe_b64encode(b'{"v":1,"id":-1}').decode(),
+    base64.urlsafe_b64encode(b'{"v":1,"id":"5"}').decode(),
+    base64.urlsafe_b64encode(b'[1]').decode(),
+])
+def test_malformed_cursor(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+ROWS = [(row_id, f"w{row_id}") for row_id in (2, 3, 5, 8, 13, 21, 34)]
+
+
+def test_page_after_walks_every_row_once():
+    seen, cursor = [], ""
+    while True:
+        page, cursor = page_after(ROWS, decode_cursor(cursor), 3)
+        seen.extend(page)
+        if cursor is None:
+            break
+    assert seen == ROWS
+
+
+def test_page_after_starts_past_ids_not_in_the_rows():
+    page, cursor = page_after(ROWS, 4, 2)
+    assert [row[0] for row in page] == [5, 8]
+    assert decode_cursor(cursor) == 8
+
+
+def test_last_page_has_no_cursor():
+    page, cursor = page_after(ROWS, 13, 10)
+    assert [row[0] for row in page] == [21, 34]
+    assert cursor is None
+    # Exactly filling the page is still the last page
+    assert page_after(ROWS, 13, 2) == (ROWS[5:], None)
+
+
+def test_page_after_past_the_end_and_empty_rows():
+    assert page_after(ROWS, 34, 5) == ([], None)
+    assert page_after([], 0, 5) == ([], None)
+
+
+def _listing_request(query: bytes):
+    return Request({"type": "http", "method": "GET", "scheme": "http", "server": ("api", 80),
+                    "path": "/vocabulary/", "query_string": query, "headers": [(b"host", b"api")]})
+
+
+def test_truncated_offset_listing_names_the_next_page():
+    rows = [(row_id, f"w{row_id}", "m", None, "2024-01-01T00:00:00") for row_id in (8, 13, 21)]
+    response = _offset_response(_listing_request(b"skip=3&limit=2"), rows, 2)
+    assert [item["id"] for item in json.loads(response.body)] == [8, 13]
+    assert decode_cursor(response.headers["X-Next-Cursor"]) == 13
+    assert response.headers["Link"] == f'<http://api/vocabulary/?limit=2&cursor={encode_cursor(13)}>; rel="next"'
+
+    last = _offset_response(_listing_request(b"skip=5&limit=2"), rows[2:], 2)
+    assert "X-Next-Cursor" not in last.headers and "Link" not in last.headers
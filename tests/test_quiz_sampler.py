@@ -0,0 +1,123 @@
+from collections import Counter
+
+import pytest
+from sqlalchemy import delete, insert
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core import vocab_ids
+from app.crud import async_vocabulary as crud_vocab
+from app.models.dictionary import DictionaryEntry
+from app.models.user import User
+from app.models.vocabulary import UserVocabulary
+
+# 1000 contiguous ids and one far away: id gaps must not change a word's odds
+SPARSE_IDS = list(range(1, 1001)) + [5_000_000]
+
+
+def sample(run, ids, *calls):
+    """Load one user's vocabulary with these ids into a fresh database, then run each call(db)"""
+    async def go():
+        vocab_ids.forget(1)
+        engine = create_async_engine("sqlite+aiosqlite://")
+        async with engine.begin() as connection:
+            await connection.run_sync(SQLModel.metadata.create_all)
+            await connection.execute(insert(User), [
+                {"id": 1, "email": "a@x.com", "username": "a", "full_name": "a", "hashed_pw": "x"}])
+            if ids:
+                await connection.execute(insert(DictionaryEntry), [
+                    {"id": i, "word": f"w{i}", "meaning": f"m{i}", "word_key": f"w{i}", "meaning_key": f"m{i}"}
+                    for i in ids])
+                await connection.execute(insert(UserVocabulary), [{"id": i, "user_id": 1, "entry_id": i} for i in ids])
+        try:
+            async with AsyncSession(engine) as db:
+                return [await call(db) for call in calls]
+        finally:
+            await engine.dispose()
+    return run(go())
+
+
+def test_sparse_ids_still_give_the_requested_size(run, rng):
+    [quiz] = sample(run, SPARSE_IDS, lambda db: crud_vocab.sample_for_quiz(db, 1, 10, rng=rng))
+    assert quiz.total == len(SPARSE_IDS)
+    assert len(quiz.questions) == 10 and len(quiz.distractors) == 30
+    meanings = [meaning for _, meaning in quiz.questions] + quiz.distractors
+    assert len(set(meanings)) == 40
+
+
+def test_every_word_is_equally_likely(run, rng, monkeypatch):
+    # Take the id-list path with a vocabulary small enough to count every word's picks
+    monkeypatch.setattr(crud_vocab, "SAMPLE_FULL_FETCH_THRESHOLD", 10)
+    ids = list(range(1, 31)) + [1_000_000 + i for i in range(10)]
+    rounds = 1000
+
+    async def picks(db):
+        counts = Counter()
+        for _ in range(rounds):
+            quiz = await crud_vocab.sample_for_quiz(db, 1, 2, rng=rng)
+            assert len(quiz.questions) == 2 and len(quiz.distractors) == 6
+            counts.update(meaning for _, meaning in quiz.questions)
+            counts.update(quiz.distractors)
+        return counts
+
+    [counts] = sample(run, ids, picks)
+    expected = rounds * 8 / len(ids)  # 200; the binomial deviation is about 13
+    assert set(counts) == {f"m{i}" for i in ids}
+    assert all(abs(count - expected) < 6 * 13 for count in counts.values())
+    far = sum(counts[f"m{i}"] for i in ids[30:])
+    assert far == pytest.approx(rounds * 8 / 4, rel=0.1)
+
+
+def test_quiz_as_large_as_the_vocabulary(run, rng, monkeypatch):
+    monkeypatch.setattr(crud_vocab, "SAMPLE_FULL_FETCH_THRESHOLD", 10)
+    ids = [i * 1000 for i in range(1, 21)]
+    [quiz] = sample(run, ids, lambda db: crud_vocab.sample_for_quiz(db, 1, 30, rng=rng))
+    assert quiz.total == 20
+    assert sorted(word for word, _ in quiz.questions) == sorted(f"w{i}" for i in ids)
+
+
+def test_words_deleted_behind_the_id_list_are_never_drawn(run, rng, monkeypatch):
+    monkeypatch.setattr(crud_vocab, "SAMPLE_FULL_FETCH_THRESHOLD", 10)
+
+    async def quizzes(db):
+        await crud_vocab.sample_for_quiz(db, 1, 3, rng=rng)
+        # Not through app.crud, so this worker's id list still names word 1
+        await db.exec(delete(UserVocabulary).where(UserVocabulary.id == 1))
+        await db.commit()
+        return [await crud_vocab.sample_for_quiz(db, 1, 3, rng=rng) for _ in range(20)]
+
+    [drawn] = sample(run, list(range(1, 21)), quizzes)
+    for quiz in drawn:
+        assert len(quiz.questions) == 3 and len(quiz.distractors) == 9
+        assert "m1" not in quiz.distractors + [meaning for _, meaning in quiz.questions]
+    # Drawing word 1 showed the list was stale; it has been read again since
+    assert drawn[-1].total == 19
+
+
+def test_small_vocabulary_asks_about_every_word(run, rng):
+    [quiz] = sample(run, [3, 9, 27], lambda db: crud_vocab.sample_for_quiz(db, 1, 5, rng=rng))
+    assert quiz.total == 3
+    assert sorted(quiz.questions) == [("w27", "m27"), ("w3", "m3"), ("w9", "m9")]
+    # The questions' own meanings are the only distractors left
+    assert quiz.distractors == []
+
+
+def test_empty_vocabulary(run, rng):
+    [quiz] = sample(run, [], lambda db: crud_vocab.sample_for_quiz(db, 1, 5, rng=rng))
+    assert (quiz.total, quiz.questions, quiz.distractors) == (0, [], [])
+
+
+def test_cached_rows_skip_the_database(rng):
+    rows = [[1, "w1", "m1"], [2, "w2", "m2"], [3, "w3", "m3"]]
+    quiz = crud_vocab.sample_small(rows, 2, 3, rng)
+    assert quiz.total == 3 and len(quiz.questions) == 2
+    assert set(quiz.questions) <= {("w1", "m1"), ("w2", "m2"), ("w3", "m3")}
+
+
+def test_cached_rows_lend_only_the_distractors_needed(rng):
+    rows = [[i, f"w{i}", f"m{i}"] for i in range(1000)]
+    quiz = crud_vocab.sample_small(rows, 5, 3, rng)
+    assert quiz.total == 1000 and len(quiz.questions) == 5 and len(quiz.distractors) == 15
+    meanings = [meaning for _, meaning in quiz.questions] + quiz.distractors
+    assert len(set(meanings)) == 20
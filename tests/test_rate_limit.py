@@ -0,0 +1,122 @@
+import time
+
+import httpx
+import pytest
+
+from app.core import rate_limit
+from app.core.rate_limit import Limit, LocalBuckets, parse_limit
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit.time, "monotonic", clock)
+    return clock
+
+
+def test_parse_limit():
+    assert parse_limit("60/minute") == Limit(60, 60)
+    assert parse_limit(" 5 / Second ") == Limit(5, 1)
+    assert parse_limit("") is None
+    for value in ("60", "60/day", "x/minute", "0/hour"):
+        with pytest.raises(ValueError):
+            parse_limit(value)
+
+
+def test_burst_then_refill(clock):
+    buckets, limit = LocalBuckets(10), Limit(3, 1)  # 3 per second
+    assert [buckets.take("k", limit)[0] for _ in range(3)] == [True, True, True]
+    allowed, tokens, retry = buckets.take("k", limit)
+    assert not allowed and tokens == 0
+    assert retry == pytest.approx(1 / 3)
+
+    clock.now += 0.5
+    allowed, tokens, retry = buckets.take("k", limit)
+    assert allowed and retry == 0
+    assert tokens == pytest.approx(0.5)
+
+
+def test_refill_is_capped_at_capacity(clock):
+    buckets, limit = LocalBuckets(10), Limit(2, 60)
+    buckets.take("k", limit)
+    clock.now += 3600
+    assert buckets.take("k", limit)[1] == pytest.approx(1)
+
+
+def test_cost_and_retry(clock):
+    buckets, limit = LocalBuckets(10), Limit(4, 2)  # 2 tokens per second
+    assert buckets.take("k", limit, cost=3)[:2] == (True, 1)
+    allowed, tokens, retry = buckets.take("k", limit, cost=2)
+    assert not allowed and tokens == pytest.approx(1)
+    assert retry == pytest.approx(0.5)
+
+
+def test_buckets_are_independent_and_lru_evicted(clock):
+    buckets, limit = LocalBuckets(2), Limit(1, 60)
+    assert buckets.take("a", limit)[0]
+    assert buckets.take("b", limit)[0]
+    assert not buckets.take("a", limit)[0]  # "a" is now the most recently used
+    assert buckets.take("c", limit)[0]      # evicts "b"
+    assert len(buckets) == 2
+    # An evicted bucket starts full again
+    assert buckets.take("b", limit)[0]
+    assert not buckets.take("c", limit)[0]
+
+
+async def _echo_length(scope, receive, send):
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            break
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": str(len(body)).encode()})
+
+
+def post(run, path, chunks):
+    async def stream():
+        for chunk in chunks:
+            yield chunk
+
+    async def go():
+        transport = httpx.ASGITransport(app=rate_limit.RateLimitMiddleware(_echo_length))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(path, content=stream())
+    return run(go())
+
+
+def test_chunked_body_limit(run, monkeypatch):
+    monkeypatch.setattr(rate_limit.settings, "RATE_LIMIT_ENABLED", False)
+    monkeypatch.setattr(rate_limit.settings, "REQUEST_MAX_BODY_BYTES", 1000)
+    response = post(run, "/vocabulary/", [b"x" * 400] * 2)
+    assert (response.status_code, response.text) == (200, "800")
+    assert post(run, "/vocabulary/", [b"x" * 400] * 3).status_code == 413
+    # Streaming routes are exempt
+    assert post(run, "/vocabulary/import", [b"x" * 400] * 3).text == "1200"
+
+
+def test_identity_never_verifies_tokens(run, monkeypatch):
+    async def verify(token):
+        raise AssertionError("the rate limiter must not verify tokens")
+    monkeypatch.setattr(rate_limit.token_cache, "verify_id_token_async", verify)
+
+    def scope(token):
+        return {"headers": [(b"authorization", b"Bearer " + token)], "client": ("10.0.0.7", 40000)}
+
+    # Unknown tokens, valid or not, share their address's bucket
+    assert run(rate_limit.identity(scope(b"made-up"))) == "ip:10.0.0.7"
+    claims = {"uid": "u1", "exp": time.time() + 600}
+    try:
+        run(rate_limit.token_cache.claims_cache.set(rate_limit.token_cache.token_digest("verified"), claims, 600))
+        assert run(rate_limit.identity(scope(b"verified"))) == "uid:u1"
+    finally:
+        rate_limit.token_cache.clear()
@@ -0,0 +1,38 @@
+from datetime import datetime
+
+from app.core.search_index import UserIndex
+
+CREATED = datetime(2026, 1, 1)
+
+
+def index(*words):
+    return UserIndex([(row_id, word, meaning, None, CREATED) for row_id, (word, meaning) in enumerate(words, 1)])
+
+
+def matches(hits):
+    return [(hit[1], hit[-2]) for hit in hits]
+
+
+def test_limit_keeps_the_best_prefix_matches():
+    words = index(("caaaaaaaaaa", "a"), ("caaab", "b"), ("cat", "c"), ("cab", "d"), ("cabbage", "e"))
+    assert matches(words.search("ca", 2)) == [("cat", "prefix"), ("cab", "prefix")]
+    assert words.search("ca", 1)[0][-1] == 0.667
+
+
+def test_limit_keeps_the_best_meaning_prefix_matches():
+    words = index(("x", "walking on wheels"), ("y", "wa"), ("z", "wait"))
+    assert [hit[1] for hit in words.search("wa", 2)] == ["y", "z"]
+
+
+def test_words_are_keyed_like_the_query():
+    words = index(("cab  bage", "veg"), ("Cab Bages", "vegs"))
+    assert matches(words.search("cab bage", 5)) == [("cab  bage", "exact"), ("Cab Bages", "prefix")]
+    words.remove(1)
+    assert matches(words.search("CAB   bage", 5)) == [("Cab Bages", "prefix")]
+
+
+def test_added_words_are_searchable():
+    words = index(("apple", "a fruit"))
+    words.add((7, "Ice  Cream", "dessert", None, CREATED))
+    assert matches(words.search("ice cream", 5)) == [("Ice  Cream", "exact")]
+    assert matches(words.search("ice crem", 5)) == [("Ice  Cream", "fuzzy")]
@@ -0,0 +1,22 @@
+import inspect
+import textwrap
+
+import pytest
+
+uvicorn_worker = pytest.importorskip("uvicorn_worker")
+
+from app import server  # noqa: E402
+
+
+def _body(method) -> list:
+    """Source lines of a method after its signature, dedented and without comments"""
+    lines = textwrap.dedent(inspect.getsource(method)).splitlines()[1:]
+    return [line for line in lines if line.strip() and not line.strip().startswith("#")]
+
+
+def test_worker_serve_is_upstreams_with_the_draining_server():
+    # Worker._serve overrides a private method by copying it; an upgrade that changes
+    # upstream's version must be reviewed and the copy updated (then the pin moved)
+    upstream = _body(uvicorn_worker.UvicornWorker._serve)
+    ours = [line.replace("DrainingServer(", "Server(") for line in _body(server.Worker._serve)]
+    assert ours == upstream
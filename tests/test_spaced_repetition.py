@@ -0,0 +1,49 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.spaced_repetition import DEFAULT_EASE, MIN_EASE, ReviewState, next_ease, schedule
+
+NOW = datetime(2026, 1, 1, 12, 0)
+
+
+def test_passing_answers_grow_the_interval():
+    state = schedule(ReviewState(), 4, NOW)
+    assert (state.repetitions, state.interval_days) == (1, 1)
+    state = schedule(state, 4, NOW)
+    assert (state.repetitions, state.interval_days) == (2, 6)
+    ease = state.ease
+    state = schedule(state, 4, NOW)
+    assert (state.repetitions, state.interval_days) == (3, round(6 * ease))
+    assert state.due_at == NOW + timedelta(days=state.interval_days)
+    assert state.last_reviewed_at == NOW
+
+
+def test_ease_update():
+    assert next_ease(DEFAULT_EASE, 5) == pytest.approx(DEFAULT_EASE + 0.1)
+    assert next_ease(DEFAULT_EASE, 4) == pytest.approx(DEFAULT_EASE)
+    assert next_ease(DEFAULT_EASE, 3) == pytest.approx(DEFAULT_EASE - 0.14)
+    assert next_ease(DEFAULT_EASE, 0) == pytest.approx(DEFAULT_EASE - 0.8)
+    assert next_ease(MIN_EASE, 0) == MIN_EASE
+
+
+def test_failed_answer_resets_and_counts_a_lapse():
+    learned = ReviewState(repetitions=4, interval_days=30, ease=2.2)
+    state = schedule(learned, 2, NOW)
+    assert (state.repetitions, state.interval_days, state.lapses) == (0, 1, 1)
+    assert state.ease == pytest.approx(next_ease(2.2, 2))
+    # Failing a word that was never learned is not a lapse
+    assert schedule(ReviewState(), 1, NOW).lapses == 0
+
+
+def test_ease_never_drops_below_minimum():
+    state = ReviewState()
+    for _ in range(10):
+        state = schedule(state, 0, NOW)
+    assert state.ease == MIN_EASE
+
+
+@pytest.mark.parametrize("quality", [-1, 6])
+def test_quality_out_of_range(quality):
+    with pytest.raises(ValueError):
+        schedule(ReviewState(), quality, NOW)
@@ -0,0 +1,66 @@
+import time
+
+import pytest
+
+from app.core import tiered_cache, token_cache, token_verifier
+from app.core.tiered_cache import MemoryBackend
+from app.core.token_verifier import TokenVerificationError
+
+
+@pytest.fixture
+def issuer(monkeypatch):
+    tiered_cache.set_backend(MemoryBackend())
+    token_cache.clear()
+    issuer = token_verifier.verifier()
+    assert isinstance(issuer, token_verifier.LocalIssuer)
+    calls = []
+    verify = issuer.verify
+
+    def counting_verify(token):
+        calls.append(token)
+        return verify(token)
+    monkeypatch.setattr(issuer, "verify", counting_verify)
+    issuer.calls = calls
+    yield issuer
+    token_cache.clear()
+
+
+def test_claims_are_verified_once(issuer, run):
+    token = issuer.issue("ann", email="ann@x.com")
+    assert run(token_cache.verify_id_token_async(token))["uid"] == "ann"
+    assert run(token_cache.verify_id_token_async(token))["email"] == "ann@x.com"
+    assert len(issuer.calls) == 1
+
+
+def test_revocation_rejects_earlier_sign_ins(issuer, run):
+    signed_in = int(time.time()) - 60
+    old = issuer.issue("ann", auth_time=signed_in)
+    other = issuer.issue("bob", auth_time=signed_in)
+    run(token_cache.verify_id_token_async(old))
+    run(token_cache.revoke_uid_async("ann"))
+
+    with pytest.raises(TokenVerificationError):
+        run(token_cache.verify_id_token_async(old))
+    # Also once this worker's tiers are cold: the revocation lives in the shared tier
+    token_cache.clear()
+    with pytest.raises(TokenVerificationError):
+        run(token_cache.verify_id_token_async(old))
+
+    fresh = issuer.issue("ann", auth_time=int(time.time()) + 1)
+    assert run(token_cache.verify_id_token_async(fresh))["uid"] == "ann"
+    assert run(token_cache.verify_id_token_async(other))["uid"] == "bob"
+
+
+def test_rejected_tokens_are_remembered(issuer, run, monkeypatch):
+    expired = issuer.issue("ann", ttl=-60)
+    for _ in range(2):
+        with pytest.raises(TokenVerificationError):
+            run(token_cache.verify_id_token_async(expired))
+    assert len(issuer.calls) == 1
+
+    monkeypatch.setattr(token_cache.settings, "TOKEN_CACHE_INVALID_TTL_SECONDS", 0)
+    with pytest.raises(TokenVerificationError):
+        run(token_cache.verify_id_token_async("not-a-token"))
+    with pytest.raises(TokenVerificationError):
+        run(token_cache.verify_id_token_async("not-a-token"))
+    assert len(issuer.calls) == 3
@@ -0,0 +1,91 @@
+import json
+
+import pytest
+
+from app.core.vocab_import import (FORMAT_CSV, FORMAT_JSON, FORMAT_NDJSON, MAX_RECORD_BYTES, ImportFormatError,
+                                   detect_format, iter_records)
+
+
+async def _stream(parts):
+    for part in parts:
+        yield part.encode("utf-8") if isinstance(part, str) else part
+
+
+def parse(run, fmt, *parts):
+    async def collect():
+        return [record async for record in iter_records(_stream(parts), fmt)]
+    return run(collect())
+
+
+def test_detect_format():
+    assert detect_format("text/csv; charset=utf-8") == FORMAT_CSV
+    assert detect_format("application/x-ndjson") == FORMAT_NDJSON
+    assert detect_format("application/json") == FORMAT_JSON
+    assert detect_format("") == FORMAT_JSON
+
+
+def test_json_numbers_cut_at_chunk_boundaries(run):
+    assert parse(run, FORMAT_JSON, "[12", "34, 5", "6", "7]") == [(1, 1234), (2, 567)]
+    # The array's last number, cut right before the closing bracket
+    assert parse(run, FORMAT_JSON, "[1, 2", "0]") == [(1, 1), (2, 20)]
+
+
+def test_json_any_chunking_parses_like_json_loads(run):
+    document = json.dumps([{"word": "naïve", "meaning": "innocent", "n": 12.5e3},
+                           {"word": "cafe", "meaning": "coffee \"shop\"", "example": None}, 42])
+    expected = list(enumerate(json.loads(document), 1))
+    raw = document.encode("utf-8")
+    # One byte per chunk also splits the multi-byte character
+    assert parse(run, FORMAT_JSON, *[raw[i:i + 1] for i in range(len(raw))]) == expected
+    assert parse(run, FORMAT_JSON, raw[:17], raw[17:40], raw[40:]) == expected
+
+
+def test_json_errors(run):
+    assert parse(run, FORMAT_JSON, "") == []
+    with pytest.raises(ImportFormatError):
+        parse(run, FORMAT_JSON, '{"word": "a"}')
+    with pytest.raises(ImportFormatError):
+        parse(run, FORMAT_JSON, '[{"word": "a"}, {"word"')
+
+
+def test_json_oversized_value(run):
+    chunk = "x" * 4096
+    parts = ['[{"word": "', *[chunk] * (MAX_RECORD_BYTES // len(chunk) + 2), '"}]']
+    with pytest.raises(ImportFormatError):
+        parse(run, FORMAT_JSON, *parts)
+
+
+def test_csv_quoted_newlines_across_chunks(run):
+    records = parse(run, FORMAT_CSV, 'word,meaning,example\r\nrun,"to move\n', 'quickly","He said ""go""\r\n',
+                    'and ran"\r\nwalk,to move slowly,\n')
+    assert records == [
+        (1, {"word": "run", "meaning": "to move\nquickly", "example": 'He said "go"\r\nand ran'}),
+        (2, {"word": "walk", "meaning": "to move slowly"}),
+    ]
+
+
+def test_csv_without_header_is_positional(run):
+    assert parse(run, FORMAT_CSV, "apple,a fruit\n") == [(1, {"word": "apple", "meaning": "a fruit"})]
+
+
+def test_csv_unterminated_quote(run):
+    assert parse(run, FORMAT_CSV, 'word,meaning\nok,fine\nbad,"never closed\n') == [
+        (1, {"word": "ok", "meaning": "fine"}), (2, "Unterminated quoted field")]
+
+
+def test_csv_oversized_record(run):
+    line = "y" * 1000 + "\n"
+    with pytest.raises(ImportFormatError):
+        parse(run, FORMAT_CSV, 'word,meaning\nbig,"', *[line] * (MAX_RECORD_BYTES // len(line) + 2))
+
+
+def test_ndjson_records_and_errors(run):
+    records = parse(run, FORMAT_NDJSON, '{"word": "a", "mea', 'ning": "b"}\n\n', "not json\n", '{"word": "c"}')
+    assert records[0] == (1, {"word": "a", "meaning": "b"})
+    assert records[1][0] == 2 and records[1][1].startswith("Invalid JSON")
+    assert records[2] == (3, {"word": "c"})
+
+
+def test_ndjson_oversized_line(run):
+    with pytest.raises(ImportFormatError):
+        parse(run, FORMAT_NDJSON, '{"word": "', "z" * (MAX_RECORD_BYTES + 1))